@@ -0,0 +1,135 @@
+"""
+Per-user business access maps.
+
+A user can reach a business by owning it or by being an active member of
+its staff. Both sets are resolved together in one query per shard and memoized on
+the user instance, so repeated checks within a request are free, and in
+the shared cache, so later requests skip the query too. Business and
+StaffProfile changes invalidate the cached map of every user they affect;
+ACCESS_MAP_CACHE_TIMEOUT bounds how long any missed invalidation can last.
+
+Invalidations only reach other processes through a shared cache (see
+CACHES in settings); with a process-local backend, core.W001 warns that
+revoked access would outlive the change in every other worker.
+"""
+import uuid
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+
+from core.sharding import get_shards
+
+ACCESS_MAP_KEY = "accounts:access-map:{user_id}"
+
+
+class AccessMap:
+    """
+    The businesses a user owns and the businesses they staff.
+    """
+
+    def __init__(self, owned=(), staffed=()):
+        self.owned = frozenset(owned)
+        self.staffed = frozenset(staffed)
+
+    @property
+    def business_ids(self):
+        return self.owned | self.staffed
+
+    def allows(self, business_id):
+        """
+        Returns True if the business is owned or staffed by the user.
+        """
+        try:
+            business_id = uuid.UUID(str(business_id))
+        except ValueError:
+            return False
+        return business_id in self.owned or business_id in self.staffed
+
+    def to_cache(self):
+        return {
+            'owned': [str(business_id) for business_id in self.owned],
+            'staffed': [str(business_id) for business_id in self.staffed],
+        }
+
+    @classmethod
+    def from_cache(cls, data):
+        return cls(
+            owned=(uuid.UUID(business_id) for business_id in data['owned']),
+            staffed=(uuid.UUID(business_id) for business_id in data['staffed']),
+        )
+
+
+def load_access_map(user):
+    """
+    Builds a user's access map from the database, one query per shard.
+    """
+    Business = apps.get_model('businesses', 'Business')
+    owned, staffed = set(), set()
+    for alias in get_shards():
+        rows = Business.objects.using(alias).accessible_to(user).values_list('id', 'owner_id')
+        for business_id, owner_id in rows:
+            if owner_id == user.pk:
+                owned.add(business_id)
+            else:
+                staffed.add(business_id)
+    return AccessMap(owned, staffed)
+
+
+def get_access_map(user):
+    """
+    Returns a user's access map, memoized on the user and in the shared cache.
+
+    Args:
+        user (CustomUser): User to resolve access for
+
+    Returns:
+        AccessMap: Owned and staffed business ids; empty for anonymous users
+    """
+    if not user.is_authenticated:
+        return AccessMap()
+    access_map = getattr(user, '_access_map', None)
+    if access_map is not None:
+        return access_map
+
+    key = ACCESS_MAP_KEY.format(user_id=user.pk)
+    data = cache.get(key)
+    if data is not None:
+        access_map = AccessMap.from_cache(data)
+    else:
+        access_map = load_access_map(user)
+        cache.set(key, access_map.to_cache(), timeout=settings.ACCESS_MAP_CACHE_TIMEOUT)
+    user._access_map = access_map
+    return access_map
+
+
+def invalidate_access_map(user_id):
+    """
+    Drops a user's cached access map so the next check reloads it.
+    """
+    cache.delete(ACCESS_MAP_KEY.format(user_id=user_id))
+
+
+def invalidate_access_maps(user_ids):
+    """
+    Drops the cached access maps of many users in one cache call.
+    """
+    cache.delete_many([ACCESS_MAP_KEY.format(user_id=user_id) for user_id in user_ids])
+
+
+def filter_accessible(queryset, user, field='business'):
+    """
+    Restricts a queryset to rows belonging to businesses the user can access.
+
+    Args:
+        queryset (QuerySet): Rows to filter
+        user: Request user; anything with get_access_map()
+        field (str): Lookup path from the queryset's model to its business,
+            or 'pk' when filtering businesses themselves
+
+    Returns:
+        QuerySet: Filtered queryset; empty for anonymous users
+    """
+    if not user.is_authenticated:
+        return queryset.none()
+    return queryset.filter(**{f'{field}__in': user.get_access_map().business_ids})
@@ -0,0 +1,26 @@
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .revocation import revocations
+from .tokens import ClaimsUser
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that trusts the token's signed claims.
+
+    Instead of loading the user row on every request it returns a
+    ClaimsUser built from the token, after checking the in-memory
+    revocation list, so authenticating a request runs no queries.
+    """
+
+    def get_user(self, validated_token):
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken("Token contained no recognizable user identification")
+        if 'role' not in validated_token or 'owned' not in validated_token:
+            # Issued before access claims were added; the client must refresh
+            raise InvalidToken("Token has no access claims")
+        if revocations.is_revoked(validated_token):
+            raise AuthenticationFailed("Token has been revoked.", "token_revoked")
+        return ClaimsUser(validated_token)
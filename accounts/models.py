@@ -1,6 +1,21 @@
+import hashlib
+import secrets
 import uuid
+from django.apps import apps
+from django.conf import settings
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.crypto import constant_time_compare
+
+from core.sharding import get_shards
+
+
+def hash_verification_token(token):
+    # Only token hashes are stored, so a leaked database row cannot verify an email
+    return hashlib.sha256(token.encode()).hexdigest()
+
 
 class CustomUser(AbstractUser):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -13,7 +28,7 @@ class CustomUser(AbstractUser):
     ]
     role = models.CharField(max_length=10, choices=ROLE_CHOICES, default="STAFF")
     is_email_verified = models.BooleanField(default=False)
-    email_verification_token = models.CharField(max_length=255, null=True, blank=True)
+    email_verification_token = models.CharField(max_length=255, null=True, blank=True, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -21,14 +36,49 @@ class CustomUser(AbstractUser):
     REQUIRED_FIELDS = []
 
     def send_verification_email(self):
-        # Sends email verification
-        pass
+        # Issues a new verification token and queues the email; returns the raw token
+        token = secrets.token_urlsafe(32)
+        self.email_verification_token = hash_verification_token(token)
+        self.save(update_fields=['email_verification_token'])
+        OutboundEmail = apps.get_model('core', 'OutboundEmail')
+        body = render_to_string('emails/verify_email.txt', {
+            'user': self,
+            'verification_url': settings.SITE_URL + reverse('verify_email', args=[token]),
+        })
+        OutboundEmail.enqueue('VERIFICATION', self.email, "Verify your email address", body)
+        return token
     
     def verify_email(self, token):
         # validates and marks emails as verified
-        pass
+        if not self.email_verification_token:
+            return False
+        if not constant_time_compare(self.email_verification_token, hash_verification_token(token)):
+            return False
+        self.is_email_verified = True
+        self.email_verification_token = None
+        self.save(update_fields=['is_email_verified', 'email_verification_token'])
+        return True
+
+    def get_access_map(self):
+        # Returns owned and staffed business ids, memoized per instance and in the cache
+        from .access import get_access_map
+        return get_access_map(self)
 
     def has_business_access(self, business_id):
         # Checks ownership or staff relationship
-        pass
+        return self.get_access_map().allows(business_id)
+
+    def get_staff_membership(self):
+        # Returns (staff_profile_id, business_id) of the active staff profile, or None
+        StaffProfile = apps.get_model('staff', 'StaffProfile')
+        for alias in get_shards():
+            membership = (
+                StaffProfile.objects.using(alias)
+                .filter(user=self, is_active=True)
+                .values_list('id', 'business_id')
+                .first()
+            )
+            if membership is not None:
+                return membership
+        return None
 
@@ -0,0 +1,128 @@
+"""
+Revocation of stateless JWTs.
+
+Revoked token ids (jti) and per-user "not before" times are kept in one
+shared-cache entry. A user's tokens can be revoked outright (password
+change, deactivation) or only their access tokens, when their claims
+change and a refresh is enough to pick up the new ones.
+
+The cache must be shared by all processes (see CACHES in settings; the
+core.W001 check warns about process-local backends), or a revocation
+never leaves the process that made it.
+
+Each process holds a copy in memory and refreshes it at most every
+JWT_REVOCATION_REFRESH_SECONDS, so checking a request costs a few dict
+lookups. A revocation takes effect immediately in the
+process that made it and within the refresh interval everywhere else.
+
+Updates are a read-modify-write of the shared entry, serialized by a
+lock taken with the cache's atomic add(), so concurrent revocations (a
+password change and a logout, say) cannot overwrite each other. Entries
+are dropped once every token they could match has expired, which keeps
+the list small.
+"""
+import contextlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework_simplejwt.settings import api_settings
+
+REVOCATIONS_KEY = "auth:jwt-revocations"
+REVOCATIONS_LOCK_KEY = "auth:jwt-revocations:lock"
+# A lock left by a crashed process expires after this long
+LOCK_TIMEOUT_SECONDS = 5
+
+
+class RevocationList:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = {'tokens': {}, 'users': {}, 'access': {}}
+        self._loaded_at = None
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self._loaded_at is not None and now - self._loaded_at < settings.JWT_REVOCATION_REFRESH_SECONDS:
+            return
+        shared = cache.get(REVOCATIONS_KEY) or {}
+        with self._lock:
+            self._state = {name: shared.get(name, {}) for name in ('tokens', 'users', 'access')}
+            self._loaded_at = now
+
+    @contextlib.contextmanager
+    def _locked(self):
+        deadline = time.monotonic() + LOCK_TIMEOUT_SECONDS * 2
+        while not cache.add(REVOCATIONS_LOCK_KEY, True, timeout=LOCK_TIMEOUT_SECONDS):
+            if time.monotonic() > deadline:
+                raise RuntimeError("Timed out waiting for the JWT revocation list lock")
+            time.sleep(0.01)
+        try:
+            yield
+        finally:
+            cache.delete(REVOCATIONS_LOCK_KEY)
+
+    def _update(self, name, entries):
+        with self._locked():
+            state = self._merge(name, entries)
+        with self._lock:
+            self._state = state
+            self._loaded_at = time.monotonic()
+
+    def _merge(self, name, entries):
+        now = time.time()
+        max_age = api_settings.REFRESH_TOKEN_LIFETIME.total_seconds()
+        shared = cache.get(REVOCATIONS_KEY) or {}
+        state = {
+            'tokens': {jti: exp for jti, exp in shared.get('tokens', {}).items() if exp > now},
+            'users': {user_id: nbf for user_id, nbf in shared.get('users', {}).items() if nbf > now - max_age},
+            'access': {user_id: nbf for user_id, nbf in shared.get('access', {}).items() if nbf > now - max_age},
+        }
+        state[name].update(entries)
+        cache.set(REVOCATIONS_KEY, state, timeout=None)
+        return state
+
+    def is_revoked(self, token):
+        """
+        Returns True if the token was revoked, directly or through its user.
+        """
+        self._refresh()
+        state = self._state
+        if token.get(api_settings.JTI_CLAIM) in state['tokens']:
+            return True
+        user_id = str(token.get(api_settings.USER_ID_CLAIM))
+        # claims_at is the sub-second time the claims were loaded; iat is whole seconds
+        issued_at = token.get('claims_at', token.get('iat', 0))
+        not_before = state['users'].get(user_id)
+        if not_before is not None and issued_at < not_before:
+            return True
+        if token.get(api_settings.TOKEN_TYPE_CLAIM) == 'access':
+            not_before = state['access'].get(user_id)
+            return not_before is not None and issued_at < not_before
+        return False
+
+    def revoke_token(self, token):
+        self._update('tokens', {token[api_settings.JTI_CLAIM]: token['exp']})
+
+    def revoke_user(self, user_id):
+        """
+        Revokes every token, access and refresh, issued to a user up to now.
+        """
+        self._update('users', {str(user_id): time.time()})
+
+    def revoke_user_access(self, user_id):
+        """
+        Revokes a user's access tokens issued up to now, forcing a refresh.
+        """
+        self.revoke_users_access([user_id])
+
+    def revoke_users_access(self, user_ids):
+        """
+        Revokes the access tokens of many users with one shared-cache write.
+        """
+        now = time.time()
+        self._update('access', {str(user_id): now for user_id in user_ids})
+
+
+revocations = RevocationList()
@@ -0,0 +1,60 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from businesses.models import Business
+from staff.models import StaffProfile
+
+from .access import invalidate_access_map
+from .revocation import revocations
+
+# Saves touching these fields end all of a user's sessions
+CREDENTIAL_FIELDS = {'is_active', 'password'}
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def revoke_tokens_on_user_change(sender, instance, created, update_fields, **kwargs):
+    if created:
+        return
+    if update_fields is None or CREDENTIAL_FIELDS & set(update_fields):
+        revocations.revoke_user(instance.pk)
+    elif 'role' in update_fields:
+        revocations.revoke_user_access(instance.pk)
+
+
+@receiver(post_save, sender=StaffProfile)
+@receiver(post_delete, sender=StaffProfile)
+def revoke_access_on_staff_change(sender, instance, **kwargs):
+    # Claims name the staff profile and its business; refreshing reissues them
+    invalidate_access_map(instance.user_id)
+    revocations.revoke_user_access(instance.user_id)
+
+
+@receiver(pre_save, sender=Business)
+def record_previous_owner(sender, instance, update_fields, **kwargs):
+    if instance._state.adding:
+        instance._previous_owner_id = None
+    elif update_fields is not None and 'owner' not in update_fields:
+        instance._previous_owner_id = instance.owner_id
+    else:
+        instance._previous_owner_id = (
+            Business.objects.using(instance._state.db).filter(pk=instance.pk).values_list('owner_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Business)
+def revoke_access_on_owner_change(sender, instance, created, **kwargs):
+    # Other saves leave every user's business access unchanged
+    previous_owner_id = getattr(instance, '_previous_owner_id', None)
+    if not created and previous_owner_id == instance.owner_id:
+        return
+    for user_id in (previous_owner_id, instance.owner_id):
+        if user_id is not None:
+            invalidate_access_map(user_id)
+            revocations.revoke_user_access(user_id)
+
+
+@receiver(post_delete, sender=Business)
+def revoke_access_on_business_deleted(sender, instance, **kwargs):
+    invalidate_access_map(instance.owner_id)
+    revocations.revoke_user_access(instance.owner_id)
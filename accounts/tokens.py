@@ -0,0 +1,99 @@
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .access import AccessMap
+from .revocation import revocations
+
+
+def add_access_claims(token, user):
+    """
+    Embeds the claims needed to authorize API requests without a user query.
+
+    Adds the user's role, the businesses they own or staff, and their
+    active staff profile (with its business), if any.
+    """
+    token['claims_at'] = time.time()
+    token['role'] = user.role
+    token.payload.update(user.get_access_map().to_cache())
+    membership = user.get_staff_membership()
+    token['staff_profile_id'] = str(membership[0]) if membership else None
+    token['staff_business_id'] = str(membership[1]) if membership else None
+
+
+class ClaimsRefreshToken(RefreshToken):
+    """
+    Refresh token whose access tokens carry freshly loaded access claims.
+
+    Claims are loaded when the pair is issued and again on every refresh,
+    so a refreshed access token reflects current ownership and staffing.
+    """
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        add_access_claims(token, user)
+        return token
+
+    @property
+    def access_token(self):
+        access = super().access_token
+        user = get_user_model().objects.filter(
+            **{api_settings.USER_ID_FIELD: self[api_settings.USER_ID_CLAIM]}
+        ).first()
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed("No active account found for the given token.", "no_active_account")
+        add_access_claims(access, user)
+        return access
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = ClaimsRefreshToken
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = ClaimsRefreshToken
+
+    def validate(self, attrs):
+        if revocations.is_revoked(self.token_class(attrs['refresh'])):
+            raise AuthenticationFailed("Token has been revoked.", "token_revoked")
+        return super().validate(attrs)
+
+
+class ClaimsUser(TokenUser):
+    """
+    Stateless user backed by the claims of a validated access token.
+
+    Answers the authorization questions API views ask, such as
+    has_business_access(), from the token alone.
+    """
+
+    @cached_property
+    def role(self):
+        return self.token.get('role')
+
+    @cached_property
+    def access_map(self):
+        return AccessMap.from_cache(self.token.payload)
+
+    def get_access_map(self):
+        # Returns owned and staffed business ids from the token claims
+        return self.access_map
+
+    def has_business_access(self, business_id):
+        # Checks ownership or staff relationship from the token claims
+        return self.access_map.allows(business_id)
+
+    def get_staff_membership(self):
+        # Returns (staff_profile_id, business_id) from the token claims, or None
+        staff_profile_id = self.token.get('staff_profile_id')
+        if not staff_profile_id:
+            return None
+        return uuid.UUID(staff_profile_id), uuid.UUID(self.token['staff_business_id'])
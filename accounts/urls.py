@@ -1,6 +1,7 @@
 from django.urls import path
-from .views import SignUpView
+from .views import SignUpView, VerifyEmailView
 
 urlpatterns = [
     path("signup/", SignUpView.as_view(), name="signup"),
-]
\ No newline at end of file
+    path("verify/<str:token>/", VerifyEmailView.as_view(), name="verify_email"),
+]
@@ -1,9 +1,27 @@
 from django.contrib.auth.forms import UserCreationForm
 from django.urls import reverse_lazy
-from django.views.generic import CreateView
+from django.views.generic import CreateView, TemplateView
 from .forms import CustomUserCreationForm
+from .models import CustomUser, hash_verification_token
 
 class SignUpView(CreateView):
     form_class = CustomUserCreationForm
     success_url = reverse_lazy("login")
-    template_name = "registration/signup.html"
\ No newline at end of file
+    template_name = "registration/signup.html"
+
+    def form_valid(self, form):
+        response = super().form_valid(form)
+        # Only queues the email; the outbox worker delivers it
+        self.object.send_verification_email()
+        return response
+
+
+class VerifyEmailView(TemplateView):
+    template_name = "registration/verify_email.html"
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        token = kwargs['token']
+        user = CustomUser.objects.filter(email_verification_token=hash_verification_token(token)).first()
+        context['verified'] = user is not None and user.verify_email(token)
+        return context
@@ -1,3 +1,48 @@
 from django.contrib import admin
 
-# Register your models here.
+from core.pagination import EstimatedCountPaginator
+
+from .models import HourlyTipSummary, TipSummary
+
+
+@admin.register(TipSummary)
+class TipSummaryAdmin(admin.ModelAdmin):
+    list_display = (
+        "__str__",
+        "total_tips",
+        "tip_count",
+        "currency",
+    )
+    list_filter = ("currency",)
+    list_select_related = ("business", "location", "staff_profile")
+    ordering = ("-date",)
+    raw_id_fields = ("business", "location", "staff_profile")
+    readonly_fields = ("created_at",)
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_display()
+
+
+@admin.register(HourlyTipSummary)
+class HourlyTipSummaryAdmin(admin.ModelAdmin):
+    list_display = (
+        "__str__",
+        "location",
+        "total_tips",
+        "tip_count",
+        "currency",
+    )
+    list_filter = ("currency",)
+    list_select_related = ("location", "staff_profile")
+    ordering = ("-hour",)
+    raw_id_fields = ("business", "location", "staff_profile")
+    readonly_fields = ("updated_at",)
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_display()
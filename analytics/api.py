@@ -0,0 +1,179 @@
+import datetime
+
+from django.utils import timezone
+from django.utils.functional import cached_property
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.views import APIView
+
+from businesses.models import Business
+from core.api import ConditionalCacheMixin, get_date_param, get_requested_fields, get_uuid_param
+from core.currencies import SUPPORTED_CURRENCIES
+from core.sharding import shard_for_business, use_shard
+from staff.models import StaffProfile
+
+from .cache import get_summary_version
+from .fx import RateUnavailable
+from .models import TipSummary
+from .queries import get_business_dashboard, get_hourly_totals, get_staff_totals
+from .serializers import CurrencyTotalSerializer, HourlyTotalSerializer, StaffTotalSerializer, TipSummarySerializer
+
+# Longest date range a single request may cover
+MAX_RANGE_DAYS = 731
+
+
+class BusinessAnalyticsView(ConditionalCacheMixin, APIView):
+    """
+    Base for owner-only analytics over one business and a date range.
+    """
+
+    permission_classes = [IsAuthenticated]
+    default_range_days = 28
+
+    def get_data_version(self):
+        business_id = self.kwargs['business_id']
+        user = self.request.user
+        if user.role != 'OWNER' or not user.has_business_access(business_id):
+            raise PermissionDenied
+        return get_summary_version(business_id)
+
+    def get_cache_variant(self):
+        # The default range ends today, so the URL alone does not fix it
+        return '{}:{}'.format(*self.date_range)
+
+    @cached_property
+    def date_range(self):
+        """
+        The requested (start, end) dates; by default the default_range_days
+        up to today in the business's timezone.
+        """
+        tz = Business.objects.only('timezone').get(pk=self.kwargs['business_id']).tzinfo
+        today = timezone.localdate(timezone=tz)
+        end = get_date_param(self.request, 'end', today)
+        start = get_date_param(self.request, 'start', end - datetime.timedelta(days=self.default_range_days - 1))
+        if start > end:
+            raise ValidationError({'start': "Must not be after end."})
+        if (end - start).days >= MAX_RANGE_DAYS:
+            raise ValidationError({'start': f"Ranges are limited to {MAX_RANGE_DAYS} days."})
+        return start, end
+
+
+class DashboardView(BusinessAnalyticsView):
+    """
+    Dashboard trends for a business; ``fields`` selects top-level keys.
+
+    Amounts are in the business's home currency, or ``currency`` if given.
+    """
+
+    def get_response_data(self, request, business_id):
+        start, end = self.date_range
+        currency = request.query_params.get('currency', '').upper() or None
+        # Checked before it becomes part of the cache key
+        if currency is not None and currency not in SUPPORTED_CURRENCIES:
+            raise ValidationError({'currency': f"Must be one of {', '.join(sorted(SUPPORTED_CURRENCIES))}."})
+        try:
+            dashboard = get_business_dashboard(business_id, start, end, currency=currency)
+        except RateUnavailable as e:
+            raise ValidationError({'currency': str(e)})
+        fields = get_requested_fields(request)
+        if fields:
+            dashboard = {key: value for key, value in dashboard.items() if key in fields}
+        return dashboard
+
+
+class StaffTotalsView(BusinessAnalyticsView):
+    """
+    Tip totals per staff member, optionally for one ``location``.
+
+    Rows are grouped by currency and ranked by total within each; totals
+    in different currencies are not comparable.
+    """
+
+    def get_response_data(self, request, business_id):
+        start, end = self.date_range
+        location_id = get_uuid_param(request, 'location')
+        totals = get_staff_totals(business_id, start, end, location_id=location_id)
+        names = dict(
+            StaffProfile.objects
+            .filter(pk__in={staff_profile_id for staff_profile_id, _ in totals})
+            .values_list('id', 'display_name')
+        )
+        rows = [
+            {
+                'staff_profile': staff_profile_id,
+                'display_name': names.get(staff_profile_id, ''),
+                'currency': currency,
+                **total,
+            }
+            for (staff_profile_id, currency), total in totals.items()
+        ]
+        rows.sort(key=lambda row: (row['currency'], -row['total_tips']))
+        return StaffTotalSerializer(rows, many=True, context={'request': request}).data
+
+
+class SummarySeriesView(BusinessAnalyticsView):
+    """
+    Daily TipSummary rows at one ``level``: business, location or staff.
+    """
+
+    LEVEL_FILTERS = {
+        'business': {'location__isnull': True, 'staff_profile__isnull': True},
+        'location': {'location__isnull': False, 'staff_profile__isnull': True},
+        'staff': {'staff_profile__isnull': False},
+    }
+
+    def get_response_data(self, request, business_id):
+        start, end = self.date_range
+        level = request.query_params.get('level', 'business')
+        if level not in self.LEVEL_FILTERS:
+            raise ValidationError({'level': f"Must be one of {', '.join(self.LEVEL_FILTERS)}."})
+        summaries = (
+            TipSummary.objects
+            .filter(business_id=business_id, date__range=(start, end), **self.LEVEL_FILTERS[level])
+            .order_by('date')
+        )
+        return TipSummarySerializer(summaries, many=True, context={'request': request}).data
+
+
+class MyTipsTodayView(ConditionalCacheMixin, APIView):
+    """
+    Today's tips for the requesting staff member, in total and per hour.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get_data_version(self):
+        self.membership = self.request.user.get_staff_membership()
+        if self.membership is None:
+            raise PermissionDenied("Only staff members have their own tips.")
+        return get_summary_version(self.membership[1])
+
+    def get_cache_variant(self):
+        # "Today" is the business's day, which the URL does not change with
+        business_id = self.membership[1]
+        with use_shard(shard_for_business(business_id)):
+            self.tz = Business.objects.only('timezone').get(pk=business_id).tzinfo
+        self.today = timezone.localdate(timezone=self.tz)
+        return str(self.today)
+
+    def get_response_data(self, request):
+        today = self.today
+        start = datetime.datetime.combine(today, datetime.time.min, tzinfo=self.tz)
+        staff_profile_id, business_id = self.membership
+        with use_shard(shard_for_business(business_id)):
+            hours = get_hourly_totals(
+                business_id,
+                start,
+                start + datetime.timedelta(days=1),
+                staff_profile_id=staff_profile_id,
+            )
+        totals = {}
+        for row in hours:
+            total = totals.setdefault(row['currency'], {'currency': row['currency'], 'total_tips': 0, 'tip_count': 0})
+            total['total_tips'] += row['total_tips']
+            total['tip_count'] += row['tip_count']
+        return {
+            'date': today,
+            'totals': CurrencyTotalSerializer(totals.values(), many=True).data,
+            'hours': HourlyTotalSerializer(hours, many=True).data,
+        }
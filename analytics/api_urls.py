@@ -0,0 +1,9 @@
+from django.urls import path
+from .api import DashboardView, MyTipsTodayView, StaffTotalsView, SummarySeriesView
+
+urlpatterns = [
+    path("me/tips/today/", MyTipsTodayView.as_view(), name="api_my_tips_today"),
+    path("businesses/<uuid:business_id>/dashboard/", DashboardView.as_view(), name="api_dashboard"),
+    path("businesses/<uuid:business_id>/staff-totals/", StaffTotalsView.as_view(), name="api_staff_totals"),
+    path("businesses/<uuid:business_id>/summaries/", SummarySeriesView.as_view(), name="api_summaries"),
+]
@@ -0,0 +1,39 @@
+import time
+
+from django.core.cache import cache
+
+SUMMARY_VERSION_KEY = "analytics:summary-version:{business_id}"
+
+
+def get_summary_version(business_id):
+    """
+    Returns the current summary version for a business.
+
+    The version is a millisecond timestamp of the last change to the
+    business's summary data. It is used in cache keys so that cached
+    dashboards expire as soon as the underlying summaries change. If the
+    version has been evicted from the cache a new one is issued, which
+    only ever causes a cache miss, never a stale read.
+
+    Returns:
+        int: Current version for the business
+    """
+    key = SUMMARY_VERSION_KEY.format(business_id=business_id)
+    version = cache.get(key)
+    if version is None:
+        version = time.time_ns() // 1_000_000
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_summary_version(business_id):
+    """
+    Marks all cached summary data for a business as stale.
+
+    Returns:
+        int: The new version
+    """
+    version = time.time_ns() // 1_000_000
+    cache.set(SUMMARY_VERSION_KEY.format(business_id=business_id), version, timeout=None)
+    return version
@@ -0,0 +1,171 @@
+"""
+Currency conversion for reports.
+
+Summary rows are kept per currency; a report in one currency converts
+the aggregated rows, so the cost is one multiplication per summary row
+and one rate lookup per (currency, day) present, however many tips the
+rows cover.
+
+Daily rates are read from FX_RATES_FILE, a CSV with a header row and
+``date,currency,rate`` columns, where rate is the number of units of
+``currency`` that one FX_BASE_CURRENCY buys on that date (the layout of
+the ECB reference rates). The table is loaded once per process and
+reloaded when the file changes. Days without a rate (weekends, holidays)
+use the latest earlier rate no older than FX_RATE_MAX_AGE_DAYS.
+"""
+import csv
+import datetime
+import os
+import threading
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+
+from core.currencies import SUPPORTED_CURRENCIES
+
+
+class RateUnavailable(Exception):
+    pass
+
+
+class UnsupportedCurrency(RateUnavailable):
+    pass
+
+
+class RateTable:
+    """
+    Daily exchange rates against a base currency.
+    """
+
+    def __init__(self, base, rates, version=0):
+        """
+        Args:
+            base (str): Currency every rate is quoted against
+            rates (dict): Currency -> {date: rate per unit of base}
+            version (int): Changes whenever the rates do; used in cache keys
+        """
+        self.base = base
+        self.version = version
+        self._rates = {}
+        for currency, by_date in rates.items():
+            dates = sorted(by_date)
+            self._rates[currency] = (
+                np.array([d.toordinal() for d in dates], dtype=np.int64),
+                np.array([by_date[d] for d in dates], dtype=np.float64),
+            )
+
+    @classmethod
+    def from_csv(cls, path, base, version=0):
+        rates = {}
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                currency = row['currency'].strip().upper()
+                date = datetime.date.fromisoformat(row['date'].strip())
+                rates.setdefault(currency, {})[date] = float(row['rate'])
+        return cls(base, rates, version)
+
+    def rates_on(self, currency, ordinals):
+        """
+        Returns the rate of ``currency`` on each day, as units per unit of base.
+
+        Args:
+            currency (str): Currency to look up
+            ordinals (np.ndarray): Days as date ordinals
+
+        Raises:
+            RateUnavailable: If any day has no rate within FX_RATE_MAX_AGE_DAYS
+        """
+        if currency == self.base:
+            return np.ones(len(ordinals))
+        if currency not in self._rates:
+            raise RateUnavailable(f"No exchange rates for {currency}")
+        dates, rates = self._rates[currency]
+        positions = np.searchsorted(dates, ordinals, side='right') - 1
+        found = positions >= 0
+        stale = ~found | (ordinals - dates[np.maximum(positions, 0)] > settings.FX_RATE_MAX_AGE_DAYS)
+        if stale.any():
+            day = datetime.date.fromordinal(int(ordinals[stale][0]))
+            raise RateUnavailable(f"No exchange rate for {currency} on {day}")
+        return rates[positions]
+
+    def factors(self, source, target, ordinals):
+        """
+        Returns per-day multipliers converting amounts from source to target.
+        """
+        ordinals = np.asarray(ordinals, dtype=np.int64)
+        if source == target:
+            return np.ones(len(ordinals))
+        return self.rates_on(target, ordinals) / self.rates_on(source, ordinals)
+
+    def convert(self, amount, source, target, date):
+        """
+        Converts a single Decimal amount, rounded to the minor unit.
+        """
+        if source == target:
+            return amount
+        factor = self.factors(source, target, [date.toordinal()])[0]
+        return (amount * Decimal(repr(float(factor)))).quantize(Decimal('0.01'))
+
+
+_table = None
+_table_lock = threading.Lock()
+
+
+def get_rate_table():
+    """
+    Returns this process's RateTable, reloading FX_RATES_FILE if it changed.
+
+    Without a rates file the table is empty and only same-currency
+    conversions succeed.
+    """
+    global _table
+    path = settings.FX_RATES_FILE
+    try:
+        version = os.stat(path).st_mtime_ns if path else 0
+    except FileNotFoundError:
+        version = 0
+    table = _table
+    if table is None or table.version != version:
+        with _table_lock:
+            if _table is None or _table.version != version:
+                if version:
+                    _table = RateTable.from_csv(path, settings.FX_BASE_CURRENCY, version)
+                else:
+                    _table = RateTable(settings.FX_BASE_CURRENCY, {})
+            table = _table
+    return table
+
+
+def convert_pence(pence, currencies, ordinals, target, table=None):
+    """
+    Converts aggregated amounts in several currencies into one.
+
+    Looks up one factor array per distinct currency and multiplies all of
+    that currency's rows at once.
+
+    Args:
+        pence (np.ndarray): Amounts in each row's minor unit
+        currencies (list): Currency code of each row
+        ordinals (np.ndarray): Date ordinal of each row
+        target (str): Currency to convert to
+        table (RateTable, optional): Rates to use; defaults to get_rate_table()
+
+    Returns:
+        np.ndarray: Amounts in the target currency's minor unit, as int64
+
+    Raises:
+        UnsupportedCurrency: If a currency's minor unit is not a hundredth
+        RateUnavailable: If a needed rate is missing
+    """
+    currencies = np.asarray(currencies, dtype=object)
+    for currency in sorted(set(currencies.tolist()) | {target}):
+        if currency not in SUPPORTED_CURRENCIES:
+            raise UnsupportedCurrency(f"{currency} is not a supported currency")
+    converted = np.asarray(pence, dtype=np.int64).copy()
+    for currency in set(currencies.tolist()) - {target}:
+        table = table or get_rate_table()
+        mask = currencies == currency
+        factors = table.factors(currency, target, ordinals[mask])
+        converted[mask] = np.rint(converted[mask] * factors).astype(np.int64)
+    return converted
@@ -0,0 +1,164 @@
+"""
+Staff leaderboards by tips for today, this week and this month.
+
+Each board keeps every staff member's total in a dict and the ranking in
+a SortedList of (-pence, staff_profile_id), so applying a tip, looking up
+a rank and reading the top K are all O(log n).
+
+Boards live in process memory. They are updated as tips succeed in this
+process and rebuilt from the summary tables when first used and every
+LEADERBOARD_RECONCILE_SECONDS afterwards, which also picks up tips
+processed by other workers. Periods are days in the business's timezone,
+the days get_staff_totals() reports.
+"""
+import datetime
+import threading
+import time
+
+from django.conf import settings
+from django.utils import timezone
+from sortedcontainers import SortedList
+
+from .queries import get_staff_totals
+
+PERIODS = ('today', 'week', 'month')
+
+
+def get_period_start(period, today):
+    """
+    Returns the first day of the period containing ``today``.
+    """
+    if period == 'today':
+        return today
+    if period == 'week':
+        return today - datetime.timedelta(days=today.weekday())
+    if period == 'month':
+        return today.replace(day=1)
+    raise ValueError(f"Unknown leaderboard period: {period}")
+
+
+class Leaderboard:
+    """
+    Ranked staff totals for one business or location, period and currency.
+    """
+
+    def __init__(self, start):
+        self.start = start
+        self.scores = {}
+        self.ranking = SortedList()
+        self.reconciled_at = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, staff_profile_id, pence):
+        with self._lock:
+            old = self.scores.get(staff_profile_id)
+            if old is not None:
+                self.ranking.remove((-old, staff_profile_id))
+            new = (old or 0) + pence
+            self.scores[staff_profile_id] = new
+            self.ranking.add((-new, staff_profile_id))
+
+    def replace(self, scores):
+        ranking = SortedList((-pence, staff_profile_id) for staff_profile_id, pence in scores.items())
+        with self._lock:
+            self.scores = dict(scores)
+            self.ranking = ranking
+            self.reconciled_at = time.monotonic()
+
+    def rank(self, staff_profile_id):
+        """
+        Returns the 1-based rank of a staff member, or None if they have no tips.
+        """
+        with self._lock:
+            pence = self.scores.get(staff_profile_id)
+            if pence is None:
+                return None
+            return self.ranking.index((-pence, staff_profile_id)) + 1
+
+    def top(self, k):
+        """
+        Returns the top ``k`` entries as (staff_profile_id, pence) pairs.
+        """
+        with self._lock:
+            return [(staff_profile_id, -pence) for pence, staff_profile_id in self.ranking.islice(0, k)]
+
+
+class LeaderboardRegistry:
+    """
+    Process-wide set of leaderboards keyed by (scope, period, currency).
+
+    A scope is ('business', id) or ('location', business_id, id).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._boards = {}
+
+    def get(self, scope, period, currency, tz):
+        """
+        Returns an up-to-date board, reconciling it from the database if needed.
+
+        ``tz`` is the business's timezone, which decides the current period.
+        """
+        today = timezone.localdate(timezone=tz)
+        start = get_period_start(period, today)
+        key = (scope, period, currency)
+        with self._lock:
+            board = self._boards.get(key)
+            if board is not None and board.start == start and (
+                time.monotonic() - board.reconciled_at < settings.LEADERBOARD_RECONCILE_SECONDS
+            ):
+                return board
+
+        board = Leaderboard(start)
+        board.replace(_load_scores(scope, start, today, currency))
+        with self._lock:
+            self._boards[key] = board
+        return board
+
+    def apply_tip(self, scope, staff_profile_id, currency, pence, day):
+        """
+        Adds a tip to every loaded board for the scope whose period includes
+        ``day``, the tip's date in the business's timezone.
+        """
+        with self._lock:
+            for period in PERIODS:
+                board = self._boards.get((scope, period, currency))
+                if board is not None and board.start == get_period_start(period, day):
+                    board.add(staff_profile_id, pence)
+
+
+def _load_scores(scope, start, end, currency):
+    business_id = scope[1]
+    location_id = scope[2] if scope[0] == 'location' else None
+    totals = get_staff_totals(business_id, start, end, location_id=location_id)
+    return {
+        staff_profile_id: int(total['total_tips'] * 100)
+        for (staff_profile_id, total_currency), total in totals.items()
+        if total_currency == currency
+    }
+
+
+leaderboards = LeaderboardRegistry()
+
+
+def get_leaderboard(business_id, period, currency, tz, location_id=None):
+    """
+    Returns the leaderboard for a business, or one of its locations.
+
+    Args:
+        business_id (UUID): Business to rank staff for
+        period (str): One of 'today', 'week' or 'month'
+        currency (str): Only tips in this currency are ranked
+        tz (tzinfo): The business's timezone, which bounds the periods
+        location_id (UUID, optional): Rank tips taken at this location only
+
+    Returns:
+        Leaderboard: Board supporting rank() and top()
+    """
+    if location_id is None:
+        scope = ('business', business_id)
+    else:
+        scope = ('location', business_id, location_id)
+    return leaderboards.get(scope, period, currency, tz)
+
@@ -0,0 +1,26 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from analytics.rollups import compact_hourly_summaries
+from core.sharding import for_each_shard
+
+
+class Command(BaseCommand):
+    help = "Compacts hourly tip rollups older than the retention window into daily TipSummary rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retention-days',
+            type=int,
+            default=settings.ANALYTICS_HOURLY_RETENTION_DAYS,
+            help="Keep hourly rows for this many whole days (default: %(default)s)",
+        )
+
+    def handle(self, *args, **options):
+        cutoff_date = timezone.localdate() - datetime.timedelta(days=options['retention_days'])
+        cutoff = timezone.make_aware(datetime.datetime.combine(cutoff_date, datetime.time.min))
+        compacted = sum(for_each_shard(compact_hourly_summaries)(cutoff))
+        self.stdout.write(f"Compacted {compacted} hourly rows from before {cutoff_date}.")
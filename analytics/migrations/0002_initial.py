@@ -0,0 +1,44 @@
+# Generated by Django 5.2.9 on 2026-10-19 17:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ("analytics", "0001_initial"),
+        ("staff", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="tipsummary",
+            name="staff_profile",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="tip_summaries",
+                to="staff.staffprofile",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="tipsummary",
+            index=models.Index(
+                fields=["business", "date"], name="analytics_t_busines_cf42cc_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="tipsummary",
+            index=models.Index(
+                fields=["staff_profile", "date"], name="analytics_t_staff_p_cb9c2f_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="tipsummary",
+            index=models.Index(fields=["date"], name="analytics_t_date_56dcb9_idx"),
+        ),
+    ]
@@ -0,0 +1,103 @@
+# Generated by Django 5.2.9 on 2026-10-19 17:28
+
+import django.core.validators
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("analytics", "0002_initial"),
+        ("businesses", "0001_initial"),
+        ("staff", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="HourlyTipSummary",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                (
+                    "hour",
+                    models.DateTimeField(
+                        help_text="Start of the hour covered by this row"
+                    ),
+                ),
+                (
+                    "total_tips",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=12,
+                        validators=[django.core.validators.MinValueValidator(0)],
+                    ),
+                ),
+                (
+                    "tip_count",
+                    models.IntegerField(
+                        default=0,
+                        validators=[django.core.validators.MinValueValidator(0)],
+                    ),
+                ),
+                ("currency", models.CharField(default="GBP", max_length=3)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "business",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="hourly_tip_summaries",
+                        to="businesses.business",
+                    ),
+                ),
+                (
+                    "location",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="hourly_tip_summaries",
+                        to="businesses.location",
+                    ),
+                ),
+                (
+                    "staff_profile",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="hourly_tip_summaries",
+                        to="staff.staffprofile",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Hourly Tip Summary",
+                "verbose_name_plural": "Hourly Tip Summaries",
+                "indexes": [
+                    models.Index(
+                        fields=["business", "hour"],
+                        name="analytics_h_busines_1e51d9_idx",
+                    ),
+                    models.Index(
+                        fields=["location", "hour"],
+                        name="analytics_h_locatio_5daa8b_idx",
+                    ),
+                    models.Index(fields=["hour"], name="analytics_h_hour_c1b105_idx"),
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("staff_profile", "location", "hour", "currency"),
+                        name="unique_hourly_tip_summary",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("analytics", "0003_hourlytipsummary"),
+        ("businesses", "0004_cross_shard_user_fks"),
+        ("staff", "0003_tronc"),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name="hourlytipsummary",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("location__isnull", True)),
+                fields=("staff_profile", "hour", "currency"),
+                name="unique_hourly_tip_summary_no_location",
+            ),
+        ),
+    ]
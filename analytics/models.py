@@ -1,7 +1,26 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
 from django.core.validators import MinValueValidator
+from django.utils import timezone
 import uuid
 
+from core.querysets import DisplayQuerySet, ShardedQuerySet
+
+
+class TipSummaryQuerySet(ShardedQuerySet, DisplayQuerySet):
+    display_related = {
+        'business': ('name',),
+        'location': ('name', 'city'),
+        'staff_profile': ('display_name',),
+    }
+
+
+class HourlyTipSummaryQuerySet(ShardedQuerySet, DisplayQuerySet):
+    display_related = {
+        'location': ('name', 'city'),
+        'staff_profile': ('display_name',),
+    }
+
 class TipSummary(models.Model):
     """
     Pre-aggregated daily statistics for performance
@@ -9,9 +28,9 @@ class TipSummary(models.Model):
     
     # Fields
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    business = models.ForeignKey('Business', on_delete=models.CASCADE, related_name='tip_summaries')
-    location = models.ForeignKey('Location', on_delete=models.CASCADE, null=True, blank=True, related_name='tip_summaries')
-    staff_profile = models.ForeignKey('StaffProfile', on_delete=models.CASCADE, null=True, blank=True, related_name='tip_summaries')
+    business = models.ForeignKey('businesses.Business', on_delete=models.CASCADE, related_name='tip_summaries')
+    location = models.ForeignKey('businesses.Location', on_delete=models.CASCADE, null=True, blank=True, related_name='tip_summaries')
+    staff_profile = models.ForeignKey('staff.StaffProfile', on_delete=models.CASCADE, null=True, blank=True, related_name='tip_summaries')
     date = models.DateField(db_index=True)
     total_tips = models.DecimalField(
         max_digits=12, 
@@ -22,6 +41,8 @@ class TipSummary(models.Model):
     currency = models.CharField(max_length=3, default='GBP')
     created_at = models.DateTimeField(auto_now_add=True)
     
+    objects = TipSummaryQuerySet.as_manager()
+    
     class Meta:
         verbose_name = 'Tip Summary'
         verbose_name_plural = 'Tip Summaries'
@@ -53,4 +74,98 @@ class TipSummary(models.Model):
         Returns:
             dict: Dictionary containing updated values {'total_tips': Decimal, 'tip_count': int}
         """
-        pass
\ No newline at end of file
+        pass
+
+class HourlyTipSummary(models.Model):
+    """
+    Pre-aggregated hourly statistics per staff member and location.
+
+    Maintained incrementally as tips succeed, and compacted into daily
+    TipSummary rows once older than ANALYTICS_HOURLY_RETENTION_DAYS.
+    """
+
+    # Fields
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    business = models.ForeignKey('businesses.Business', on_delete=models.CASCADE, related_name='hourly_tip_summaries')
+    location = models.ForeignKey('businesses.Location', on_delete=models.CASCADE, null=True, blank=True, related_name='hourly_tip_summaries')
+    staff_profile = models.ForeignKey('staff.StaffProfile', on_delete=models.CASCADE, related_name='hourly_tip_summaries')
+    hour = models.DateTimeField(help_text="Start of the hour covered by this row")
+    total_tips = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+        validators=[MinValueValidator(0)]
+    )
+    tip_count = models.IntegerField(default=0, validators=[MinValueValidator(0)])
+    currency = models.CharField(max_length=3, default='GBP')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = HourlyTipSummaryQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Hourly Tip Summary'
+        verbose_name_plural = 'Hourly Tip Summaries'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['staff_profile', 'location', 'hour', 'currency'],
+                name='unique_hourly_tip_summary',
+            ),
+            # NULLs are distinct in the constraint above, so tips without a
+            # location need their own
+            models.UniqueConstraint(
+                fields=['staff_profile', 'hour', 'currency'],
+                condition=models.Q(location__isnull=True),
+                name='unique_hourly_tip_summary_no_location',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['business', 'hour']),
+            models.Index(fields=['location', 'hour']),
+            models.Index(fields=['hour']),
+        ]
+
+    def __str__(self):
+        return f"Tips for {self.staff_profile.display_name} at {self.hour:%Y-%m-%d %H:00}"
+
+    @classmethod
+    def record_tip(cls, tip):
+        """
+        Adds a succeeded tip to its hourly row.
+
+        Creates the row for the tip's (staff, location, hour, currency) the
+        first time it is needed and increments it afterwards with a single
+        UPDATE, so concurrent tips never lose updates.
+
+        Args:
+            tip (Tip): A tip with payment_status SUCCEEDED
+
+        Returns:
+            None
+        """
+        hour = tip.succeeded_at.replace(minute=0, second=0, microsecond=0)
+        lookup = {
+            'staff_profile_id': tip.staff_profile_id,
+            'location_id': tip.location_id,
+            'hour': hour,
+            'currency': tip.currency,
+        }
+        increment = {
+            'total_tips': F('total_tips') + tip.amount,
+            'tip_count': F('tip_count') + 1,
+            'updated_at': timezone.now(),
+        }
+        # The tip's shard holds its summaries
+        objects = cls.objects.db_manager(tip._state.db)
+        if objects.filter(**lookup).update(**increment):
+            return
+        try:
+            with transaction.atomic(using=tip._state.db):
+                objects.create(
+                    business_id=tip.staff_profile.business_id,
+                    total_tips=tip.amount,
+                    tip_count=1,
+                    **lookup,
+                )
+        except IntegrityError:
+            # Another worker created the row first
+            objects.filter(**lookup).update(**increment)
@@ -0,0 +1,420 @@
+"""
+Columnar dashboard queries over TipSummary.
+
+A business's summary rows for a date range are loaded in one query (plus
+one for days not yet compacted from hourly rows) into NumPy arrays, and
+every dashboard figure (daily series, rolling averages, day-of-week
+heatmap, position comparison, location ranking) is computed from those
+arrays without further database access. Results are cached by
+(business, range, summary version).
+
+Summary rows come in three levels of detail:
+- business rows: location and staff_profile are both empty
+- location rows: location is set, staff_profile is empty
+- staff rows: staff_profile is set
+
+Each figure reads from a single level so that amounts are never counted
+twice. Amounts are handled as integer pence.
+
+Rows are kept per currency. The frame converts each row into the
+report's currency (the business's home currency by default) on load,
+with one vectorised rate lookup per currency present (see analytics.fx).
+"""
+import datetime
+from collections import defaultdict
+from decimal import Decimal
+
+import numpy as np
+from django.core.cache import cache
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+
+from businesses.models import Business
+from staff.models import StaffProfile
+
+from .cache import get_summary_version
+from .fx import convert_pence, get_rate_table
+from .models import HourlyTipSummary, TipSummary
+
+DASHBOARD_CACHE_KEY = "analytics:dashboard:{business_id}:{start}:{end}:{currency}:{version}:{fx}"
+DASHBOARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+ROLLING_WINDOWS = (7, 28)
+PERCENTILES = (25, 50, 75, 90)
+WEEKDAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+POSITIONS = [code for code, _ in StaffProfile.POSITION_CHOICES]
+
+
+def _codes(values):
+    """
+    Factorizes a sequence of ids into integer codes.
+
+    Returns:
+        tuple: (np.ndarray of codes with -1 for None, list of distinct ids)
+    """
+    index = {}
+    uniques = []
+    codes = np.empty(len(values), dtype=np.int64)
+    for i, value in enumerate(values):
+        if value is None:
+            codes[i] = -1
+            continue
+        code = index.get(value)
+        if code is None:
+            code = index[value] = len(uniques)
+            uniques.append(value)
+        codes[i] = code
+    return codes, uniques
+
+
+def _money(pence):
+    return Decimal(int(round(pence))).scaleb(-2)
+
+
+def _business_tz(business_id):
+    return Business.objects.only('timezone').get(pk=business_id).tzinfo
+
+
+def _day_bounds(start, end, tz):
+    """
+    Returns the aware datetimes bounding the days from start to end (inclusive) in ``tz``.
+    """
+    return (
+        datetime.datetime.combine(start, datetime.time.min, tzinfo=tz),
+        datetime.datetime.combine(end + datetime.timedelta(days=1), datetime.time.min, tzinfo=tz),
+    )
+
+
+def _hourly_rows(business_id, start, end):
+    """
+    Returns uncompacted hourly rows as daily staff, location and business rows.
+
+    Days are the business's local days, as in compacted TipSummary rows.
+    """
+    tz = _business_tz(business_id)
+    lower, upper = _day_bounds(start, end, tz)
+    staff_rows = list(
+        HourlyTipSummary.objects
+        .filter(business_id=business_id, hour__gte=lower, hour__lt=upper)
+        .annotate(date=TruncDate('hour', tzinfo=tz))
+        .values_list('date', 'location_id', 'staff_profile_id', 'staff_profile__position', 'currency')
+        .annotate(total=Sum('total_tips'), count=Sum('tip_count'))
+        .order_by()
+    )
+    rollup = defaultdict(lambda: [Decimal('0'), 0])
+    for date, location_id, _, _, currency, total, count in staff_rows:
+        keys = [(date, None, currency)]
+        if location_id is not None:
+            keys.append((date, location_id, currency))
+        for key in keys:
+            rollup[key][0] += total
+            rollup[key][1] += count
+    return staff_rows + [
+        (date, location_id, None, None, currency, total, count)
+        for (date, location_id, currency), (total, count) in rollup.items()
+    ]
+
+
+class SummaryFrame:
+    """
+    Column arrays of TipSummary rows for one business and date range.
+
+    Amounts are converted into ``currency`` as the rows are loaded.
+    """
+
+    def __init__(self, start, end, rows, currency):
+        self.start = start
+        self.end = end
+        self.days = (end - start).days + 1
+        self.currency = currency
+
+        dates, location_ids, staff_ids, positions, currencies, totals, counts = (
+            zip(*rows) if rows else ((),) * 7
+        )
+        self.day = np.fromiter(((d - start).days for d in dates), dtype=np.int64, count=len(dates))
+        self.location, self.location_ids = _codes(location_ids)
+        self.staff, self.staff_ids = _codes(staff_ids)
+        position_index = {code: i for i, code in enumerate(POSITIONS)}
+        self.position = np.fromiter(
+            (position_index.get(p, -1) for p in positions), dtype=np.int64, count=len(positions)
+        )
+        self.pence = convert_pence(
+            np.fromiter((int(t * 100) for t in totals), dtype=np.int64, count=len(totals)),
+            currencies,
+            self.day + start.toordinal(),
+            currency,
+        )
+        self.count = np.fromiter(counts, dtype=np.int64, count=len(counts))
+
+    @classmethod
+    def load(cls, business_id, start, end, currency):
+        """
+        Loads all summary rows for a business between two dates (inclusive).
+
+        Days that are still held as hourly rows are folded in as if they
+        had already been compacted, so recent days are not missing.
+
+        Returns:
+            SummaryFrame: Columnar view of the rows, in ``currency``
+
+        Raises:
+            RateUnavailable: If rows in another currency have no exchange rate
+        """
+        rows = list(
+            TipSummary.objects
+            .filter(business_id=business_id, date__range=(start, end))
+            .values_list(
+                'date', 'location_id', 'staff_profile_id',
+                'staff_profile__position', 'currency', 'total_tips', 'tip_count',
+            )
+        )
+        rows.extend(_hourly_rows(business_id, start, end))
+        return cls(start, end, rows, currency)
+
+    @property
+    def business_rows(self):
+        return (self.location < 0) & (self.staff < 0)
+
+    @property
+    def location_rows(self):
+        return (self.location >= 0) & (self.staff < 0)
+
+    @property
+    def staff_rows(self):
+        return self.staff >= 0
+
+    def daily_totals(self):
+        """
+        Returns business-wide totals per day as (pence, tip_count) arrays.
+        """
+        mask = self.business_rows
+        pence = np.bincount(self.day[mask], weights=self.pence[mask], minlength=self.days)
+        count = np.bincount(self.day[mask], weights=self.count[mask], minlength=self.days)
+        return pence, count
+
+    def rolling_mean(self, series, window):
+        """
+        Trailing mean of a daily series; the first days average what is available.
+        """
+        cumulative = np.cumsum(np.concatenate(([0.0], series)))
+        upper = np.arange(1, len(series) + 1)
+        lower = np.maximum(upper - window, 0)
+        return (cumulative[upper] - cumulative[lower]) / (upper - lower)
+
+    def weekday_heatmap(self):
+        """
+        Returns business-wide totals as a (weeks, 7) matrix, Monday first.
+        """
+        mask = self.business_rows
+        offset = self.day[mask] + self.start.weekday()
+        weeks = (self.days + self.start.weekday() + 6) // 7
+        heatmap = np.zeros((weeks, 7), dtype=np.int64)
+        np.add.at(heatmap, (offset // 7, offset % 7), self.pence[mask])
+        return heatmap
+
+    def position_stats(self):
+        """
+        Compares staff positions by total tips and per-staff percentiles.
+        """
+        mask = self.staff_rows
+        staff_pence = np.bincount(self.staff[mask], weights=self.pence[mask], minlength=len(self.staff_ids))
+        staff_position = np.full(len(self.staff_ids), -1, dtype=np.int64)
+        staff_position[self.staff[mask]] = self.position[mask]
+
+        stats = []
+        for i, position in enumerate(POSITIONS):
+            members = staff_pence[staff_position == i]
+            if not len(members):
+                continue
+            stats.append({
+                'position': position,
+                'staff_count': len(members),
+                'total_tips': _money(members.sum()),
+                'percentiles': {
+                    p: _money(v) for p, v in zip(PERCENTILES, np.percentile(members, PERCENTILES))
+                },
+            })
+        return stats
+
+    def location_ranking(self):
+        """
+        Ranks locations by total tips, highest first.
+        """
+        mask = self.location_rows
+        pence = np.bincount(self.location[mask], weights=self.pence[mask], minlength=len(self.location_ids))
+        count = np.bincount(self.location[mask], weights=self.count[mask], minlength=len(self.location_ids))
+        order = np.argsort(-pence, kind='stable')
+        return [
+            {
+                'location_id': self.location_ids[i],
+                'total_tips': _money(pence[i]),
+                'tip_count': int(count[i]),
+            }
+            for i in order
+        ]
+
+
+def build_dashboard(frame):
+    """
+    Computes all dashboard figures from a SummaryFrame.
+
+    Returns:
+        dict: JSON-serializable dashboard data
+    """
+    pence, count = frame.daily_totals()
+    return {
+        'start': frame.start,
+        'end': frame.end,
+        'currency': frame.currency,
+        'total_tips': _money(pence.sum()),
+        'tip_count': int(count.sum()),
+        'daily': [_money(v) for v in pence],
+        'rolling': {
+            window: [_money(v) for v in frame.rolling_mean(pence, window)]
+            for window in ROLLING_WINDOWS
+        },
+        'weekday_heatmap': {
+            'weekdays': WEEKDAYS,
+            'weeks': [[_money(v) for v in week] for week in frame.weekday_heatmap()],
+        },
+        'positions': frame.position_stats(),
+        'locations': frame.location_ranking(),
+    }
+
+
+def get_business_dashboard(business_id, start, end, currency=None):
+    """
+    Returns cached dashboard data for a business between two dates.
+
+    The cache key includes the business's summary version and the loaded
+    exchange rates, so any change to its TipSummary rows or to the rates
+    makes the next call recompute.
+
+    Args:
+        business_id (UUID): Business to report on
+        start (date): First day of the range
+        end (date): Last day of the range (inclusive)
+        currency (str, optional): Report currency; defaults to the business's home currency
+
+    Returns:
+        dict: Dashboard data, see build_dashboard()
+
+    Raises:
+        RateUnavailable: If tips in another currency have no exchange rate
+    """
+    if currency is None:
+        currency = Business.objects.values_list('currency', flat=True).get(pk=business_id)
+    key = DASHBOARD_CACHE_KEY.format(
+        business_id=business_id,
+        start=start.isoformat(),
+        end=end.isoformat(),
+        currency=currency,
+        version=get_summary_version(business_id),
+        fx=get_rate_table().version,
+    )
+    dashboard = cache.get(key)
+    if dashboard is None:
+        dashboard = build_dashboard(SummaryFrame.load(business_id, start, end, currency))
+        cache.set(key, dashboard, DASHBOARD_CACHE_TIMEOUT)
+    return dashboard
+
+
+def get_hourly_totals(business_id, start, end, location_id=None, staff_profile_id=None):
+    """
+    Returns per-hour tip totals for an intraday window.
+
+    Reads HourlyTipSummary only, so a query over one day touches at most
+    24 rows per staff member. Hours already compacted into daily rows are
+    not included.
+
+    Args:
+        business_id (UUID): Business to report on
+        start (datetime): Start of the window (inclusive)
+        end (datetime): End of the window (exclusive)
+        location_id (UUID, optional): Restrict to one location
+        staff_profile_id (UUID, optional): Restrict to one staff member
+
+    Returns:
+        list: Dicts with hour, currency, total_tips and tip_count, ordered by hour
+    """
+    rows = HourlyTipSummary.objects.filter(business_id=business_id, hour__gte=start, hour__lt=end)
+    if location_id is not None:
+        rows = rows.filter(location_id=location_id)
+    if staff_profile_id is not None:
+        rows = rows.filter(staff_profile_id=staff_profile_id)
+    return list(
+        rows
+        .values('hour', 'currency')
+        .annotate(total_tips=Sum('total_tips'), tip_count=Sum('tip_count'))
+        .order_by('hour', 'currency')
+    )
+
+
+def get_staff_totals(business_id, start, end, location_id=None):
+    """
+    Returns tip totals per staff member between two dates (inclusive).
+
+    Combines compacted daily TipSummary staff rows with the hourly rows
+    that have not been compacted yet. Compaction moves a day from one
+    table to the other in a single transaction, so no day is counted twice.
+
+    Args:
+        business_id (UUID): Business to report on
+        start (date): First day of the range
+        end (date): Last day of the range (inclusive)
+        location_id (UUID, optional): Restrict to tips taken at one location
+
+    Returns:
+        dict: (staff_profile_id, currency) -> {'total_tips': Decimal, 'tip_count': int}
+    """
+    daily = TipSummary.objects.filter(
+        business_id=business_id,
+        staff_profile__isnull=False,
+        date__range=(start, end),
+    )
+    lower, upper = _day_bounds(start, end, _business_tz(business_id))
+    hourly = HourlyTipSummary.objects.filter(business_id=business_id, hour__gte=lower, hour__lt=upper)
+    if location_id is not None:
+        daily = daily.filter(location_id=location_id)
+        hourly = hourly.filter(location_id=location_id)
+
+    totals = {}
+    for rows in (daily, hourly):
+        grouped = (
+            rows
+            .values('staff_profile_id', 'currency')
+            .annotate(total=Sum('total_tips'), count=Sum('tip_count'))
+            .order_by()
+        )
+        for row in grouped:
+            key = (row['staff_profile_id'], row['currency'])
+            current = totals.get(key, {'total_tips': Decimal('0'), 'tip_count': 0})
+            totals[key] = {
+                'total_tips': current['total_tips'] + row['total'],
+                'tip_count': current['tip_count'] + row['count'],
+            }
+    return totals
+
+
+def get_tip_count(business_id, staff_profile_id=None, location_id=None):
+    """
+    Returns the number of succeeded tips from the summary tables.
+
+    Reads pre-aggregated counters instead of counting Tip rows, so it is
+    suitable as an approximate count for paginated tip lists.
+
+    Returns:
+        int: Succeeded tips for the business, staff member or location
+    """
+    daily = TipSummary.objects.filter(business_id=business_id, staff_profile__isnull=False)
+    hourly = HourlyTipSummary.objects.filter(business_id=business_id)
+    if staff_profile_id is not None:
+        daily = daily.filter(staff_profile_id=staff_profile_id)
+        hourly = hourly.filter(staff_profile_id=staff_profile_id)
+    if location_id is not None:
+        daily = daily.filter(location_id=location_id)
+        hourly = hourly.filter(location_id=location_id)
+    return sum(
+        rows.aggregate(count=Sum('tip_count'))['count'] or 0
+        for rows in (daily, hourly)
+    )
@@ -0,0 +1,201 @@
+import datetime
+import zoneinfo
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db.models import Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from businesses.models import Business
+from core import sharding
+
+from .cache import bump_summary_version
+from .leaderboard import leaderboards
+from .models import HourlyTipSummary, TipSummary
+
+
+def _summary_keys(row):
+    """
+    Returns the daily TipSummary keys an hourly group contributes to.
+
+    Every group feeds its staff row and its business row, plus its
+    location row when the tip was taken at a location.
+    """
+    business_id, location_id, date, currency = (
+        row['business_id'], row['location_id'], row['date'], row['currency'],
+    )
+    keys = [
+        (business_id, location_id, row['staff_profile_id'], date, currency),
+        (business_id, None, None, date, currency),
+    ]
+    if location_id is not None:
+        keys.append((business_id, location_id, None, date, currency))
+    return keys
+
+
+def compact_hourly_summaries(before):
+    """
+    Folds hourly rows older than ``before`` into daily TipSummary rows.
+
+    Works on the current shard; callers compact each shard in turn.
+
+    Hourly rows are grouped by the business's local day and added to the
+    matching staff, location and business TipSummary rows (creating them
+    as needed), then deleted, all in one transaction. For each business
+    only whole local days before ``before`` are compacted.
+
+    Args:
+        before (datetime): Hourly rows starting before this are compacted
+
+    Returns:
+        int: Number of hourly rows compacted
+    """
+    with sharding.atomic():
+        hourly = HourlyTipSummary.objects.filter(hour__lt=before)
+        # Lock the rows so no increment lands between aggregating and deleting
+        list(hourly.select_for_update().values_list('pk', flat=True))
+        timezones = set(hourly.order_by().values_list('business__timezone', flat=True).distinct())
+        totals = defaultdict(lambda: [Decimal('0'), 0])
+        compactable = Q(pk__in=[])
+        for name in timezones:
+            tz = zoneinfo.ZoneInfo(name)
+            local_before = datetime.datetime.combine(before.astimezone(tz).date(), datetime.time.min, tzinfo=tz)
+            rows = Q(business__timezone=name, hour__lt=local_before)
+            compactable |= rows
+            groups = (
+                hourly
+                .filter(rows)
+                .annotate(date=TruncDate('hour', tzinfo=tz))
+                .values('business_id', 'location_id', 'staff_profile_id', 'date', 'currency')
+                .annotate(total=Sum('total_tips'), count=Sum('tip_count'))
+                .order_by()
+            )
+            for row in groups:
+                for key in _summary_keys(row):
+                    totals[key][0] += row['total']
+                    totals[key][1] += row['count']
+        if not totals:
+            return 0
+
+        business_ids = {key[0] for key in totals}
+        dates = {key[3] for key in totals}
+        existing = {
+            (s.business_id, s.location_id, s.staff_profile_id, s.date, s.currency): s
+            for s in TipSummary.objects.filter(business_id__in=business_ids, date__in=dates)
+        }
+        to_update = []
+        to_create = []
+        for key, (total, count) in totals.items():
+            summary = existing.get(key)
+            if summary is None:
+                business_id, location_id, staff_profile_id, date, currency = key
+                to_create.append(TipSummary(
+                    business_id=business_id,
+                    location_id=location_id,
+                    staff_profile_id=staff_profile_id,
+                    date=date,
+                    currency=currency,
+                    total_tips=total,
+                    tip_count=count,
+                ))
+            else:
+                summary.total_tips += total
+                summary.tip_count += count
+                to_update.append(summary)
+
+        TipSummary.objects.bulk_update(to_update, ['total_tips', 'tip_count'], batch_size=500)
+        TipSummary.objects.bulk_create(to_create, batch_size=500)
+        compacted, _ = HourlyTipSummary.objects.filter(compactable).delete()
+
+    for business_id in business_ids:
+        bump_summary_version(business_id)
+    return compacted
+
+
+def apply_refund_deltas(tips):
+    """
+    Removes refunded tips from the summary tables in bulk.
+
+    Tips still inside the hourly retention window come off their hourly
+    rows; tips whose hours were already compacted come off the staff,
+    location and business TipSummary rows for their local day. Affected rows are
+    locked, adjusted in memory and written back with one bulk update per
+    table; loaded leaderboards are adjusted once the transaction commits.
+    Must be called inside a transaction on the tips' shard.
+
+    Args:
+        tips (list): Tips that were counted as SUCCEEDED, with staff_profile loaded
+
+    Returns:
+        None
+    """
+    deltas = defaultdict(lambda: [Decimal('0'), 0])
+    for tip in tips:
+        hour = tip.succeeded_at.replace(minute=0, second=0, microsecond=0)
+        key = (tip.staff_profile.business_id, tip.location_id, tip.staff_profile_id, hour, tip.currency)
+        deltas[key][0] += tip.amount
+        deltas[key][1] += 1
+    if not deltas:
+        return
+
+    hourly_rows = {
+        (row.business_id, row.location_id, row.staff_profile_id, row.hour, row.currency): row
+        for row in HourlyTipSummary.objects.select_for_update().filter(
+            staff_profile_id__in={key[2] for key in deltas},
+            hour__in={key[3] for key in deltas},
+        )
+    }
+    timezones = {
+        business_id: zoneinfo.ZoneInfo(name)
+        for business_id, name in Business.objects.filter(pk__in={key[0] for key in deltas}).values_list('pk', 'timezone')
+    }
+    hourly_updates = []
+    daily_deltas = defaultdict(lambda: [Decimal('0'), 0])
+    for key, (total, count) in deltas.items():
+        row = hourly_rows.get(key)
+        if row is not None:
+            row.total_tips = max(row.total_tips - total, Decimal('0'))
+            row.tip_count = max(row.tip_count - count, 0)
+            hourly_updates.append(row)
+            continue
+        business_id, location_id, staff_profile_id, hour, currency = key
+        group = {
+            'business_id': business_id,
+            'location_id': location_id,
+            'staff_profile_id': staff_profile_id,
+            'date': timezone.localdate(hour, timezones[business_id]),
+            'currency': currency,
+        }
+        for summary_key in _summary_keys(group):
+            daily_deltas[summary_key][0] += total
+            daily_deltas[summary_key][1] += count
+    HourlyTipSummary.objects.bulk_update(hourly_updates, ['total_tips', 'tip_count'], batch_size=500)
+
+    daily_updates = []
+    if daily_deltas:
+        for summary in TipSummary.objects.select_for_update().filter(
+            business_id__in={key[0] for key in daily_deltas},
+            date__in={key[3] for key in daily_deltas},
+        ):
+            delta = daily_deltas.get(
+                (summary.business_id, summary.location_id, summary.staff_profile_id, summary.date, summary.currency)
+            )
+            if delta is not None:
+                summary.total_tips = max(summary.total_tips - delta[0], Decimal('0'))
+                summary.tip_count = max(summary.tip_count - delta[1], 0)
+                daily_updates.append(summary)
+        TipSummary.objects.bulk_update(daily_updates, ['total_tips', 'tip_count'], batch_size=500)
+
+    def after_commit():
+        for business_id in {key[0] for key in deltas}:
+            bump_summary_version(business_id)
+        for (business_id, location_id, staff_profile_id, hour, currency), (total, _) in deltas.items():
+            pence = -int(total * 100)
+            day = timezone.localdate(hour, timezones[business_id])
+            leaderboards.apply_tip(('business', business_id), staff_profile_id, currency, pence, day)
+            if location_id is not None:
+                scope = ('location', business_id, location_id)
+                leaderboards.apply_tip(scope, staff_profile_id, currency, pence, day)
+
+    sharding.on_commit(after_commit)
@@ -0,0 +1,37 @@
+from rest_framework import serializers
+
+from core.api import DynamicFieldsMixin
+
+from .models import TipSummary
+
+
+class TipSummarySerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = TipSummary
+        fields = (
+            "date",
+            "location",
+            "staff_profile",
+            "total_tips",
+            "tip_count",
+            "currency",
+        )
+        read_only_fields = fields
+
+
+class StaffTotalSerializer(DynamicFieldsMixin, serializers.Serializer):
+    staff_profile = serializers.UUIDField()
+    display_name = serializers.CharField()
+    currency = serializers.CharField()
+    total_tips = serializers.DecimalField(max_digits=12, decimal_places=2)
+    tip_count = serializers.IntegerField()
+
+
+class CurrencyTotalSerializer(DynamicFieldsMixin, serializers.Serializer):
+    currency = serializers.CharField()
+    total_tips = serializers.DecimalField(max_digits=12, decimal_places=2)
+    tip_count = serializers.IntegerField()
+
+
+class HourlyTotalSerializer(CurrencyTotalSerializer):
+    hour = serializers.DateTimeField()
@@ -0,0 +1,40 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from tips.signals import tip_succeeded
+
+from .cache import bump_summary_version
+from .leaderboard import leaderboards
+from .models import HourlyTipSummary, TipSummary
+
+
+@receiver(post_save, sender=TipSummary)
+@receiver(post_delete, sender=TipSummary)
+def invalidate_summary_cache(sender, instance, **kwargs):
+    # Cached dashboards are keyed by summary version
+    bump_summary_version(instance.business_id)
+
+
+@receiver(tip_succeeded)
+def record_hourly_summary(sender, tip, **kwargs):
+    HourlyTipSummary.record_tip(tip)
+    bump_summary_version(tip.staff_profile.business_id)
+
+
+@receiver(tip_succeeded)
+def update_leaderboards(sender, tip, **kwargs):
+    business_id = tip.staff_profile.business_id
+    pence = int(tip.amount * 100)
+    # Boards count days in the business's timezone
+    day = timezone.localdate(tip.succeeded_at, tip.staff_profile.business.tzinfo)
+
+    def apply():
+        leaderboards.apply_tip(('business', business_id), tip.staff_profile_id, tip.currency, pence, day)
+        if tip.location_id is not None:
+            scope = ('location', business_id, tip.location_id)
+            leaderboards.apply_tip(scope, tip.staff_profile_id, tip.currency, pence, day)
+
+    # Boards are shared across requests, so only apply committed tips
+    transaction.on_commit(apply, using=tip._state.db)
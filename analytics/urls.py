@@ -0,0 +1,7 @@
+from django.urls import path
+from .views import leaderboard
+
+urlpatterns = [
+    path("leaderboard/<uuid:business_id>/", leaderboard, name="leaderboard"),
+    path("leaderboard/<uuid:business_id>/<uuid:location_id>/", leaderboard, name="location_leaderboard"),
+]
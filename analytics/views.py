@@ -1,3 +1,62 @@
-from django.shortcuts import render
+from decimal import Decimal
 
-# Create your views here.
+from django.contrib.auth.decorators import login_required
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponseBadRequest, JsonResponse
+from django.shortcuts import get_object_or_404
+
+from businesses.models import Business
+from core.currencies import SUPPORTED_CURRENCIES
+from staff.models import StaffProfile
+
+from .leaderboard import PERIODS, get_leaderboard
+
+LEADERBOARD_MAX_LIMIT = 100
+
+
+@login_required
+def leaderboard(request, business_id, location_id=None):
+    """
+    Returns the top staff by tips for a period, plus the caller's own rank.
+
+    Query parameters: period (today, week or month), currency (defaults to
+    the business's currency) and limit. Periods are days in the business's
+    timezone.
+    """
+    if not request.user.has_business_access(business_id):
+        raise PermissionDenied
+    period = request.GET.get('period', 'today')
+    if period not in PERIODS:
+        return HttpResponseBadRequest(f"period must be one of {', '.join(PERIODS)}")
+    business = get_object_or_404(Business.objects.only('currency', 'timezone'), pk=business_id)
+    currency = request.GET.get('currency', business.currency).upper()
+    if currency not in SUPPORTED_CURRENCIES:
+        return HttpResponseBadRequest(f"currency must be one of {', '.join(sorted(SUPPORTED_CURRENCIES))}")
+    try:
+        limit = min(int(request.GET.get('limit', 10)), LEADERBOARD_MAX_LIMIT)
+    except ValueError:
+        return HttpResponseBadRequest("limit must be an integer")
+
+    board = get_leaderboard(business_id, period, currency, business.tzinfo, location_id=location_id)
+    top = board.top(limit)
+    names = dict(
+        StaffProfile.objects
+        .filter(pk__in=[staff_profile_id for staff_profile_id, _ in top])
+        .values_list('id', 'display_name')
+    )
+    staff_profile = getattr(request.user, 'staff_profile', None)
+    return JsonResponse({
+        'period': period,
+        'start': board.start,
+        'currency': currency,
+        'entries': [
+            {
+                'rank': rank,
+                'staff_profile_id': staff_profile_id,
+                'display_name': names.get(staff_profile_id),
+                'total_tips': Decimal(pence).scaleb(-2),
+            }
+            for rank, (staff_profile_id, pence) in enumerate(top, start=1)
+        ],
+        'my_rank': board.rank(staff_profile.pk) if staff_profile else None,
+    })
@@ -1,3 +1,53 @@
 from django.contrib import admin
 
-# Register your models here.
+from core.pagination import EstimatedCountPaginator
+
+from .models import Business, Location
+
+
+@admin.register(Business)
+class BusinessAdmin(admin.ModelAdmin):
+    list_display = (
+        "name",
+        "business_type",
+        "currency",
+        "timezone",
+        "is_active",
+        "created_at",
+    )
+    list_filter = (
+        "business_type",
+        "is_active",
+    )
+    search_fields = ("name", "email", "stripe_account_id")
+    ordering = ("name",)
+    # Owners are users on the default database, so they are not joined
+    raw_id_fields = ("owner",)
+    readonly_fields = ("created_at", "updated_at")
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+@admin.register(Location)
+class LocationAdmin(admin.ModelAdmin):
+    list_display = (
+        "__str__",
+        "business",
+        "postal_code",
+        "country",
+        "currency",
+        "is_active",
+    )
+    list_filter = (
+        "country",
+        "is_active",
+    )
+    list_select_related = ("business",)
+    search_fields = ("name", "city", "postal_code", "business__name")
+    ordering = ("business__name", "name")
+    raw_id_fields = ("business",)
+    readonly_fields = ("created_at", "updated_at")
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.utils.decorators import method_decorator
+from rest_framework import generics
+from rest_framework.permissions import AllowAny, IsAuthenticated
+
+from accounts.access import filter_accessible
+from core.api import get_number_param
+from core.sharding import get_shards
+from core.ratelimit import Rule, client_ip, ratelimit
+
+from .geo import nearby_locations
+from .models import Business
+from .serializers import BusinessSerializer, NearbyLocationSerializer
+
+
+class BusinessListView(generics.ListAPIView):
+    """
+    Lists the businesses the user owns or staffs.
+    """
+
+    serializer_class = BusinessSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        # Businesses are spread over shards; merge each shard's accessible ones
+        businesses = [
+            business
+            for alias in get_shards()
+            for business in filter_accessible(Business.objects.using(alias), self.request.user, field='pk')
+        ]
+        return sorted(businesses, key=lambda business: business.name)
+
+
+@method_decorator(ratelimit(Rule('nearby-ip', settings.RATELIMIT_NEARBY_PER_IP, client_ip)), name='dispatch')
+class NearbyLocationListView(generics.ListAPIView):
+    """
+    Lists active locations near ``lat``/``lng``, nearest first.
+
+    ``radius`` (km) limits the search to a circle; without it the
+    ``limit`` nearest locations are returned. Public, for customers
+    choosing a venue to tip at.
+    """
+
+    serializer_class = NearbyLocationSerializer
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    def get_queryset(self):
+        return nearby_locations(
+            get_number_param(self.request, 'lat', -90, 90, required=True),
+            get_number_param(self.request, 'lng', -180, 180, required=True),
+            radius_km=get_number_param(self.request, 'radius', 0.01, settings.GEO_NEARBY_MAX_RADIUS_KM),
+            limit=get_number_param(self.request, 'limit', 1, 100, cast=int),
+        )
@@ -0,0 +1,7 @@
+from django.urls import path
+from .api import BusinessListView, NearbyLocationListView
+
+urlpatterns = [
+    path("businesses/", BusinessListView.as_view(), name="api_business_list"),
+    path("locations/nearby/", NearbyLocationListView.as_view(), name="api_nearby_locations"),
+]
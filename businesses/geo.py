@@ -0,0 +1,314 @@
+"""
+Nearest-location lookup without a spatial database.
+
+Each process keeps an in-memory grid index of active locations that have
+coordinates: the world is cut into GEO_INDEX_CELL_DEGREES square cells
+and every location sits in the cell containing it. A radius query only
+measures the locations in the cells overlapping the circle's bounding
+box, so its cost follows local density rather than the total number of
+locations. A nearest-k query runs radius queries with a doubling radius
+until it has k results or reaches the maximum radius.
+
+The index covers every shard and is built with one query per shard on
+first use. Location saves in this process update it once their
+transaction commits; saves in other processes are picked up by
+re-reading locations whose updated_at moved, at most every
+GEO_INDEX_REFRESH_SECONDS. Queryset update() calls that
+skip updated_at are not seen until the process restarts. Candidates are
+always re-fetched from the database, filtering on the location and
+business being active, so a stale entry can delay a new location but
+never return a deleted or deactivated one; such entries are dropped
+from the index when found.
+
+With GEO_INDEX_ENABLED off, lookups use a bounding-box query on the
+(latitude, longitude) index instead and measure the rows it returns.
+"""
+import datetime
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.sharding import get_shards
+
+from .models import Location
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = math.pi * EARTH_RADIUS_KM / 180
+
+# Radius of the first search in a nearest-k query
+NEAREST_START_RADIUS_KM = 1
+
+# Re-read rows updated this long before the last one seen, so rows
+# committed late by long transactions are not missed
+REFRESH_OVERLAP = datetime.timedelta(minutes=1)
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """
+    Returns the great-circle distance between two points in kilometres.
+    """
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1, math.sqrt(a)))
+
+
+def bounding_box(lat, lng, radius_km):
+    """
+    Returns (min_lat, max_lat, min_lng, max_lng) enclosing a circle.
+
+    Longitudes are not wrapped: min_lng may be below -180 or max_lng
+    above 180 when the box crosses the antimeridian. A box reaching a
+    pole spans every longitude.
+    """
+    dlat = radius_km / KM_PER_DEGREE_LAT
+    min_lat, max_lat = lat - dlat, lat + dlat
+    if min_lat <= -90 or max_lat >= 90:
+        return max(min_lat, -90), min(max_lat, 90), -180, 180
+    dlng = math.degrees(math.asin(math.sin(radius_km / EARTH_RADIUS_KM) / math.cos(math.radians(lat))))
+    return min_lat, max_lat, lng - dlng, lng + dlng
+
+
+class LocationIndex:
+    """
+    Grid index of active located Locations in this process.
+    """
+
+    def __init__(self, cell_degrees):
+        self.cell_degrees = cell_degrees
+        self.lng_cells = round(360 / cell_degrees)
+        self._lock = threading.RLock()
+        self._cells = {}
+        self._entries = {}
+        self._built = False
+        self._watermarks = {}
+        self._checked_at = 0
+
+    def _cell(self, lat, lng):
+        return (
+            math.floor((lat + 90) / self.cell_degrees),
+            math.floor((lng + 180) / self.cell_degrees) % self.lng_cells,
+        )
+
+    def _put(self, location_id, lat, lng, shard):
+        self._discard(location_id)
+        cell = self._cell(lat, lng)
+        self._cells.setdefault(cell, {})[location_id] = (lat, lng, shard)
+        self._entries[location_id] = cell
+
+    def _discard(self, location_id):
+        cell = self._entries.pop(location_id, None)
+        if cell is not None:
+            members = self._cells[cell]
+            del members[location_id]
+            if not members:
+                del self._cells[cell]
+
+    def _apply(self, rows, shard):
+        for location_id, lat, lng, is_active, updated_at in rows:
+            if is_active and lat is not None and lng is not None:
+                self._put(location_id, float(lat), float(lng), shard)
+            else:
+                self._discard(location_id)
+            watermark = self._watermarks.get(shard)
+            if watermark is None or updated_at > watermark:
+                self._watermarks[shard] = updated_at
+
+    def rebuild(self):
+        """
+        Loads every active located Location, one query per shard.
+        """
+        with self._lock:
+            self._cells = {}
+            self._entries = {}
+            self._watermarks = {}
+            for shard in get_shards():
+                rows = Location.objects.using(shard).filter(
+                    is_active=True, latitude__isnull=False, longitude__isnull=False,
+                ).values_list('id', 'latitude', 'longitude', 'is_active', 'updated_at')
+                self._apply(rows.iterator(chunk_size=5000), shard)
+            self._built = True
+            self._checked_at = time.monotonic()
+
+    def refresh(self):
+        """
+        Builds the index, or applies rows updated since the last refresh.
+        """
+        if not self._built:
+            self.rebuild()
+            return
+        if time.monotonic() - self._checked_at < settings.GEO_INDEX_REFRESH_SECONDS:
+            return
+        with self._lock:
+            self._checked_at = time.monotonic()
+            for shard in get_shards():
+                rows = Location.objects.using(shard).values_list(
+                    'id', 'latitude', 'longitude', 'is_active', 'updated_at',
+                )
+                watermark = self._watermarks.get(shard)
+                if watermark is not None:
+                    rows = rows.filter(updated_at__gte=watermark - REFRESH_OVERLAP)
+                self._apply(rows, shard)
+
+    def update(self, location):
+        with self._lock:
+            if self._built:
+                self._apply([(
+                    location.pk, location.latitude, location.longitude,
+                    location.is_active, location.updated_at,
+                )], location._state.db)
+
+    def discard(self, location_ids):
+        with self._lock:
+            for location_id in location_ids:
+                self._discard(location_id)
+
+    def within(self, lat, lng, radius_km):
+        """
+        Returns [(distance_km, location_id, shard)] within radius_km, nearest first.
+        """
+        min_lat, max_lat, min_lng, max_lng = bounding_box(lat, lng, radius_km)
+        lat_cells = range(self._cell(min_lat, 0)[0], self._cell(max_lat, 0)[0] + 1)
+        if max_lng - min_lng >= 360:
+            lng_cells = range(self.lng_cells)
+        else:
+            first = math.floor((min_lng + 180) / self.cell_degrees)
+            last = math.floor((max_lng + 180) / self.cell_degrees)
+            lng_cells = sorted({i % self.lng_cells for i in range(first, last + 1)})
+        results = []
+        with self._lock:
+            for i in lat_cells:
+                for j in lng_cells:
+                    for location_id, (location_lat, location_lng, shard) in self._cells.get((i, j), {}).items():
+                        distance = haversine_km(lat, lng, location_lat, location_lng)
+                        if distance <= radius_km:
+                            results.append((distance, location_id, shard))
+        results.sort()
+        return results
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_location_index():
+    """
+    Returns this process's LocationIndex, refreshed if due.
+    """
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = LocationIndex(settings.GEO_INDEX_CELL_DEGREES)
+    _index.refresh()
+    return _index
+
+
+def _candidates_sql(lat, lng, radius_km):
+    # Bounding-box prefilter on the (latitude, longitude) index, measured exactly here
+    min_lat, max_lat, min_lng, max_lng = bounding_box(lat, lng, radius_km)
+    rows = Location.objects.filter(
+        is_active=True,
+        business__is_active=True,
+        latitude__range=(round(min_lat, 6), round(max_lat, 6)),
+    )
+    if min_lng < -180:
+        rows = rows.filter(Q(longitude__gte=round(min_lng + 360, 6)) | Q(longitude__lte=round(max_lng, 6)))
+    elif max_lng > 180:
+        rows = rows.filter(Q(longitude__gte=round(min_lng, 6)) | Q(longitude__lte=round(max_lng - 360, 6)))
+    elif max_lng - min_lng < 360:
+        rows = rows.filter(longitude__range=(round(min_lng, 6), round(max_lng, 6)))
+    results = []
+    for shard in get_shards():
+        for location_id, location_lat, location_lng in rows.using(shard).values_list('id', 'latitude', 'longitude'):
+            distance = haversine_km(lat, lng, float(location_lat), float(location_lng))
+            if distance <= radius_km:
+                results.append((distance, location_id, shard))
+    results.sort()
+    return results
+
+
+def _fetch(candidates, limit, index=None):
+    # Loads candidates in distance order, skipping rows deactivated or deleted since indexing
+    found = []
+    offset = 0
+    while len(found) < limit and offset < len(candidates):
+        chunk = candidates[offset:offset + (limit - len(found)) * 2]
+        offset += len(chunk)
+        locations = {}
+        for shard in {shard for _, _, shard in chunk}:
+            locations.update(Location.objects.using(shard).select_related('business').filter(
+                pk__in=[location_id for _, location_id, location_shard in chunk if location_shard == shard],
+                is_active=True,
+            ).in_bulk())
+        stale = []
+        for distance, location_id, _ in chunk:
+            location = locations.get(location_id)
+            if location is None:
+                stale.append(location_id)
+            elif location.business.is_active and len(found) < limit:
+                location.distance_km = distance
+                found.append(location)
+        if index is not None and stale:
+            index.discard(stale)
+    return found
+
+
+def nearby_locations(lat, lng, radius_km=None, limit=None):
+    """
+    Returns active locations of active businesses near a point, nearest first.
+
+    With radius_km, returns up to ``limit`` locations within it. Without,
+    returns the ``limit`` nearest locations within GEO_NEARBY_MAX_RADIUS_KM.
+
+    Args:
+        lat (float): Latitude in degrees
+        lng (float): Longitude in degrees
+        radius_km (float, optional): Search radius, capped at GEO_NEARBY_MAX_RADIUS_KM
+        limit (int, optional): Maximum results; defaults to GEO_NEARBY_DEFAULT_LIMIT
+
+    Returns:
+        list: Location instances with ``business`` loaded and a ``distance_km`` attribute
+    """
+    limit = limit or settings.GEO_NEARBY_DEFAULT_LIMIT
+    max_radius = min(radius_km or settings.GEO_NEARBY_MAX_RADIUS_KM, settings.GEO_NEARBY_MAX_RADIUS_KM)
+
+    if not settings.GEO_INDEX_ENABLED:
+        return _fetch(_candidates_sql(lat, lng, max_radius), limit)
+
+    index = get_location_index()
+    if radius_km is not None:
+        return _fetch(index.within(lat, lng, max_radius), limit, index)
+    radius = min(NEAREST_START_RADIUS_KM, max_radius)
+    while True:
+        candidates = index.within(lat, lng, radius)
+        if len(candidates) >= limit or radius >= max_radius:
+            found = _fetch(candidates, limit, index)
+            # Inactive businesses may have filled the candidate list; widen and retry
+            if len(found) >= limit or radius >= max_radius:
+                return found
+        radius = min(radius * 2, max_radius)
+
+
+@receiver(post_save, sender=Location)
+def index_saved_location(sender, instance, **kwargs):
+    if _index is not None:
+        transaction.on_commit(lambda: _index.update(instance), using=instance._state.db)
+
+
+@receiver(post_delete, sender=Location)
+def unindex_deleted_location(sender, instance, **kwargs):
+    if _index is not None:
+        location_id = instance.pk
+        transaction.on_commit(lambda: _index.discard([location_id]), using=instance._state.db)
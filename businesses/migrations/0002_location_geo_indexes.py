@@ -0,0 +1,23 @@
+# Generated by Django 5.2.9 on 2026-10-19 17:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("businesses", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="location",
+            index=models.Index(
+                fields=["latitude", "longitude"], name="location_lat_lng_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="location",
+            index=models.Index(fields=["updated_at"], name="location_updated_at_idx"),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:41
+
+import core.currencies
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("businesses", "0004_cross_shard_user_fks"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="business",
+            name="currency",
+            field=models.CharField(
+                default="GBP",
+                help_text="ISO 4217 home currency; reports are converted into it",
+                max_length=3,
+                validators=[core.currencies.validate_currency],
+            ),
+        ),
+        migrations.AlterField(
+            model_name="location",
+            name="currency",
+            field=models.CharField(
+                blank=True,
+                help_text="ISO 4217 currency tips are taken in; blank uses the business's currency",
+                max_length=3,
+                validators=[core.currencies.validate_currency],
+            ),
+        ),
+    ]
@@ -1,14 +1,29 @@
 from django.db import models
 import uuid
+import zoneinfo
 from django.conf import settings
-from django.db.models import Sum
+from django.db.models import Q, Sum
 from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 
+from core.currencies import validate_currency
+from core.querysets import ShardedQuerySet
+
+class BusinessQuerySet(ShardedQuerySet):
+    def accessible_to(self, user):
+        """
+        Returns businesses the user owns or is an active staff member of.
+        """
+        return self.filter(
+            Q(owner=user) | Q(staff_members__user=user, staff_members__is_active=True)
+        ).distinct()
+
+
 class Business(models.Model):
     # Represents a hospitality business
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    # Users live on the default database, businesses on their shard
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, db_constraint=False)
     name = models.CharField(max_length=200)
     BUSINESS_TYPE_CHOICES = [
         ('RESTAURANT', 'Restaurant'),
@@ -27,6 +42,12 @@ class Business(models.Model):
         null=True
     )
     timezone = models.CharField(max_length=50, default='UTC')
+    currency = models.CharField(
+        max_length=3,
+        default='GBP',
+        validators=[validate_currency],
+        help_text="ISO 4217 home currency; reports are converted into it"
+    )
     is_active = models.BooleanField(default=True)
     stripe_account_id = models.CharField(
         max_length=255,
@@ -36,11 +57,19 @@ class Business(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = BusinessQuerySet.as_manager()
+
     # indexes here
 
     def __str__(self):
         return self.name
 
+    @property
+    def tzinfo(self):
+        """
+        The business's local time zone; report days are its local days.
+        """
+        return zoneinfo.ZoneInfo(self.timezone)
 
     def get_active_locations(self):
         """
@@ -59,14 +88,25 @@ class Business(models.Model):
     def add_staff_memeber(self, user, location):
         """
         Creates or reactivates a staff relationship.
+
+        Returns the user's StaffProfile, or None if they are active staff
+        of another business. See staff.onboarding for adding many at once.
         """
-        pass
+        from staff.onboarding import onboard_staff
+        result = onboard_staff(self, [{
+            'email': user.email,
+            'display_name': user.get_full_name() or user.username,
+            'location': location.pk if location else None,
+        }])
+        profiles = result.created + result.reactivated
+        return profiles[0] if profiles else None
 
     def remove_staff_member(self, user):
         """
         Deactivates a staff relationship.
         """
-        pass
+        from staff.onboarding import offboard_staff
+        return offboard_staff(self, [user.email]) > 0
 
 
 class Location(models.Model):
@@ -79,6 +119,12 @@ class Location(models.Model):
     state = models.CharField(max_length=100, help_text="State, province, or county")
     postal_code = models.CharField(max_length=20, verbose_name="Postal Code")
     country = models.CharField(max_length=2, default='UK', help_text="ISO 3166-1 alpha-2 country code")
+    currency = models.CharField(
+        max_length=3,
+        blank=True,
+        validators=[validate_currency],
+        help_text="ISO 4217 currency tips are taken in; blank uses the business's currency"
+    )
     latitude = models.DecimalField(
         max_digits=9,
         decimal_places=6,
@@ -107,7 +153,15 @@ class Location(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
-    # indexes here
+    objects = ShardedQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Bounding-box prefilter for nearby lookups (see businesses.geo)
+            models.Index(fields=['latitude', 'longitude'], name='location_lat_lng_idx'),
+            # Incremental refresh of the in-memory location index
+            models.Index(fields=['updated_at'], name='location_updated_at_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} - {self.city}"
@@ -0,0 +1,42 @@
+from rest_framework import serializers
+
+from core.api import DynamicFieldsMixin
+
+from .models import Business, Location
+
+
+class BusinessSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Business
+        fields = (
+            "id",
+            "name",
+            "business_type",
+            "timezone",
+            "currency",
+            "is_active",
+        )
+        read_only_fields = fields
+
+
+class NearbyLocationSerializer(serializers.ModelSerializer):
+    business = BusinessSerializer(read_only=True)
+    distance_km = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Location
+        fields = (
+            "id",
+            "name",
+            "address_line1",
+            "city",
+            "postal_code",
+            "latitude",
+            "longitude",
+            "distance_km",
+            "business",
+        )
+        read_only_fields = fields
+
+    def get_distance_km(self, location):
+        return round(location.distance_km, 3)
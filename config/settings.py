@@ -40,21 +40,43 @@ INSTALLED_APPS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.authentication.ClaimsJWTAuthentication',
     ),
 }
 
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
+    'TOKEN_OBTAIN_SERIALIZER': 'accounts.tokens.ClaimsTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'accounts.tokens.ClaimsTokenRefreshSerializer',
 }
 
+# The cache must be shared by every process: JWT revocations, access map
+# invalidations and the shard map are published through it. The default
+# database cache needs "manage.py createcachetable"; point CACHE_URL at
+# Redis (redis://host:6379/0, with the redis package) in production.
+# Process-local backends (locmemcache://) are only for development.
+CACHES = {
+    'default': env.cache_url('CACHE_URL', default='dbcache://django_cache'), # type: ignore
+}
+
+# How often each process reloads the shared JWT revocation list
+JWT_REVOCATION_REFRESH_SECONDS = 5
+
+# Upper bound on how long a cached business access map can be stale
+ACCESS_MAP_CACHE_TIMEOUT = 60 * 10
+
 MIDDLEWARE = [
+    # First, so the rest of the stack shows up in profiles; removes itself
+    # when PROFILING_ENABLED is off
+    "core.profiling.ProfilingMiddleware",
     "django.middleware.security.SecurityMiddleware",
-    "django.contrib.sessions.middleware.SessionMiddleware",
+    "whitenoise.middleware.WhiteNoiseMiddleware",
+    "core.sessions.PublicSessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "core.sharding.ShardMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -87,6 +109,22 @@ DATABASES = {
     }
 }
 
+# Database aliases holding business data (see core.sharding). Each alias
+# other than "default" is configured from <ALIAS>_DATABASE_URL, e.g.
+# TIP_SHARDS=default,shard1 and SHARD1_DATABASE_URL=sqlite:////tmp/shard1.sqlite3
+TIP_SHARDS = env.list('TIP_SHARDS', default=['default']) # type: ignore
+for _alias in TIP_SHARDS:
+    if _alias not in DATABASES:
+        DATABASES[_alias] = env.db_url(f'{_alias.upper()}_DATABASE_URL')
+
+DATABASE_ROUTERS = ['core.sharding.ShardRouter']
+
+# How long a process may route by a cached shard map entry. With several
+# shards the cache must be shared (check core.E001); this bounds how stale
+# an entry can get if an invalidation is missed, and move_business_shard
+# waits this long after locking a business and before deleting its old copy.
+SHARD_MAP_CACHE_SECONDS = env.int('SHARD_MAP_CACHE_SECONDS', default=10) # type: ignore
+
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -116,6 +154,18 @@ USE_TZ = True
 
 # Static files (CSS, JavaScript, Images)
 STATIC_URL = "static/"
+STATIC_ROOT = env.str('STATIC_ROOT', default=str(BASE_DIR / "staticfiles")) # type: ignore
+
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    # collectstatic writes content-hashed copies with .gz and .br versions
+    # beside them; WhiteNoise serves those with far-future cache headers
+    "staticfiles": {
+        "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage",
+    },
+}
 
 # Default primary key field type
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
@@ -127,8 +177,122 @@ AUTH_USER_MODEL = 'accounts.CustomUser'
 
 EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
 
+# Base URL for links in outbound emails
+SITE_URL = env.str('SITE_URL', default='http://localhost:8000') # type: ignore
+
+# Outbox worker (send_queued_emails)
+EMAIL_OUTBOX_BATCH_SIZE = 100
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+EMAIL_OUTBOX_RETRY_SECONDS = 60
+EMAIL_OUTBOX_LEASE_SECONDS = 60 * 5
+EMAIL_OUTBOX_POLL_SECONDS = 5
+
+# Interned user agents cached per process, in each direction
+USER_AGENT_CACHE_SIZE = 1024
+
+# Tips from one customer within this window share a single receipt email
+TIP_RECEIPT_COALESCE_SECONDS = 120
+
 
 REST_AUTH = {
 	'USE_JWT': True,
 	'JWT_AUTH_COOKIE': 'djangojwdauth_cookie'
-}
\ No newline at end of file
+}
+# Hourly tip rollups older than this are compacted into daily TipSummary rows
+ANALYTICS_HOURLY_RETENTION_DAYS = env.int('ANALYTICS_HOURLY_RETENTION_DAYS', default=7) # type: ignore
+
+# Every Stripe webhook is rejected while the signing secret is unset
+STRIPE_WEBHOOK_SECRET = env.str('STRIPE_WEBHOOK_SECRET', default='') # type: ignore
+STRIPE_SECRET_KEY = env.str('STRIPE_SECRET_KEY', default='') # type: ignore
+STRIPE_PUBLISHABLE_KEY = env.str('STRIPE_PUBLISHABLE_KEY', default='') # type: ignore
+STRIPE_API_BASE = env.str('STRIPE_API_BASE', default='https://api.stripe.com') # type: ignore
+STRIPE_TIMEOUT_SECONDS = 10
+
+# Daily exchange rates for reports in a business's home currency (see analytics.fx)
+FX_RATES_FILE = env.str('FX_RATES_FILE', default='') # type: ignore
+FX_BASE_CURRENCY = 'EUR'
+FX_RATE_MAX_AGE_DAYS = 7
+
+# Processed Stripe webhook events are moved to compressed archive files
+# after this many days (see payments.archive); 'zstd' needs zstandard
+WEBHOOK_RETENTION_DAYS = env.int('WEBHOOK_RETENTION_DAYS', default=30) # type: ignore
+WEBHOOK_ARCHIVE_DIR = env.str('WEBHOOK_ARCHIVE_DIR', default=str(BASE_DIR / "archive" / "webhooks")) # type: ignore
+WEBHOOK_ARCHIVE_COMPRESSION = env.str('WEBHOOK_ARCHIVE_COMPRESSION', default='gzip') # type: ignore
+
+# Tips can be refunded for this long after succeeding
+REFUND_WINDOW_DAYS = 30
+# Concurrent Stripe calls made by a bulk refund
+REFUND_MAX_WORKERS = 8
+
+# Nearby location lookup: in-memory grid index (or SQL bounding box when disabled)
+GEO_INDEX_ENABLED = env.bool('GEO_INDEX_ENABLED', default=True) # type: ignore
+GEO_INDEX_CELL_DEGREES = 0.05
+GEO_INDEX_REFRESH_SECONDS = 30
+GEO_NEARBY_MAX_RADIUS_KM = 50
+GEO_NEARBY_DEFAULT_LIMIT = 10
+
+# Rate limits for the public QR scan and tip endpoints ('local' or 'cache' backend)
+RATELIMIT_ENABLED = True
+RATELIMIT_BACKEND = env.str('RATELIMIT_BACKEND', default='local') # type: ignore
+RATELIMIT_TRUSTED_PROXIES = env.int('RATELIMIT_TRUSTED_PROXIES', default=0) # type: ignore
+RATELIMIT_SCAN_PER_IP = '30/m'
+RATELIMIT_SCAN_PER_TOKEN = '300/m'
+RATELIMIT_SCAN_PER_BUSINESS = '3000/m'
+RATELIMIT_TIP_PER_IP = '10/m'
+RATELIMIT_TIP_PER_TOKEN = '60/m'
+RATELIMIT_TIP_PER_BUSINESS = '600/m'
+RATELIMIT_NEARBY_PER_IP = '60/m'
+
+# Paths (regexes, without the leading slash) served without loading or
+# saving a session; see core.sessions
+SESSIONLESS_URLS = env.list('SESSIONLESS_URLS', default=[r'^tips/t/']) # type: ignore
+
+# Public tip page: rendered page fragment cached per QR code, and how long
+# the signed token in a served form is accepted (must outlast the cache)
+TIP_PAGE_CACHE_SECONDS = 60 * 5
+TIP_FORM_TOKEN_MAX_AGE = 60 * 60 * 24
+
+# In-process card testing and scan spike detection (see tips.fraud)
+FRAUD_DETECTION_ENABLED = env.bool('FRAUD_DETECTION_ENABLED', default=True) # type: ignore
+FRAUD_WINDOW_SECONDS = 60 * 10
+FRAUD_SMALL_TIP_AMOUNT = '2.00'
+FRAUD_SMALL_TIPS_PER_ADDRESS = 5
+FRAUD_QR_CODES_PER_ADDRESS = 3
+FRAUD_SCAN_SPIKE_MIN_PER_MINUTE = 20
+FRAUD_SCAN_SPIKE_FACTOR = 10
+FRAUD_SKETCH_WIDTH = 2048
+FRAUD_SKETCH_DEPTH = 4
+FRAUD_MAX_TRACKED_KEYS = 50_000
+
+# Tronc (tip pool) shares are hours worked times these position weights;
+# positions not listed weigh 1 (see staff.tronc)
+TRONC_POSITION_WEIGHTS = {
+    'WAITER': 1.0,
+    'BARTENDER': 1.0,
+    'CHEF': 0.75,
+    'HOST': 0.75,
+    'OTHER': 0.5,
+}
+
+# On-demand profiling (see core.profiling). Requests are profiled when they
+# send PROFILING_HEADER set to PROFILING_SECRET, or at random at the rate of
+# the first (path regex, rate) rule their path matches
+PROFILING_ENABLED = env.bool('PROFILING_ENABLED', default=False) # type: ignore
+PROFILING_SECRET = env.str('PROFILING_SECRET', default='') # type: ignore
+PROFILING_HEADER = 'X-Profile'
+PROFILING_URL_RULES = [
+    # (r'^tips/t/', 0.001),
+]
+PROFILING_INTERVAL_MS = env.int('PROFILING_INTERVAL_MS', default=5) # type: ignore
+PROFILING_MAX_QUERIES = 500
+
+# Live tip feed (server-sent events)
+LIVE_FEED_HEARTBEAT_SECONDS = 15
+LIVE_FEED_QUEUE_SIZE = 100
+LIVE_FEED_RETRY_MS = 5000
+
+# In-memory staff leaderboards are rebuilt from the summary tables this often
+LEADERBOARD_RECONCILE_SECONDS = 300
+
+# Per-user API response cache; entries are also keyed by summary version
+API_RESPONSE_CACHE_TIMEOUT = 60 * 5
@@ -9,7 +9,13 @@ urlpatterns = [
     path("admin/", admin.site.urls),
     path("accounts/", include("accounts.urls")),
     path("accounts/", include("django.contrib.auth.urls")),
+    path("analytics/", include("analytics.urls")),
+    path("payments/", include("payments.urls")),
+    path("tips/", include("tips.urls")),
     path("", include("core.urls")),
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path("api/", include("businesses.api_urls")),
+    path("api/", include("tips.api_urls")),
+    path("api/", include("analytics.api_urls")),
 ]
@@ -1,3 +1,128 @@
 from django.contrib import admin
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html, format_html_join
 
-# Register your models here.
+from .models import OutboundEmail, ProfileRecord, ShardAssignment
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = (
+        "to_email",
+        "kind",
+        "status",
+        "attempts",
+        "next_attempt_at",
+        "created_at",
+        "sent_at",
+    )
+    list_filter = (
+        "kind",
+        "status",
+    )
+    search_fields = ("to_email",)
+    readonly_fields = ("created_at", "sent_at", "last_error")
+
+
+@admin.register(ShardAssignment)
+class ShardAssignmentAdmin(admin.ModelAdmin):
+    list_display = (
+        "business_id",
+        "shard",
+        "locked",
+        "assigned_at",
+        "moved_at",
+    )
+    list_filter = (
+        "shard",
+        "locked",
+    )
+    search_fields = ("business_id",)
+    # Changed only by move_business_shard, which copies the data first
+    readonly_fields = ("business_id", "shard", "assigned_at", "moved_at")
+
+
+@admin.register(ProfileRecord)
+class ProfileRecordAdmin(admin.ModelAdmin):
+    list_display = (
+        "name",
+        "kind",
+        "trigger",
+        "status_code",
+        "duration_ms",
+        "query_count",
+        "query_ms",
+        "created_at",
+    )
+    list_filter = (
+        "kind",
+        "trigger",
+    )
+    search_fields = ("name",)
+    ordering = ("-created_at",)
+    fields = (
+        "name",
+        "kind",
+        "trigger",
+        "status_code",
+        "duration_ms",
+        "samples",
+        "query_count",
+        "query_ms",
+        "created_at",
+        "flamegraph",
+        "top_functions",
+        "query_log",
+    )
+    readonly_fields = fields
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path(
+                "<uuid:pk>/stacks.folded",
+                self.admin_site.admin_view(self.download_stacks),
+                name="core_profilerecord_stacks",
+            ),
+            *super().get_urls(),
+        ]
+
+    def download_stacks(self, request, pk):
+        if not self.has_view_permission(request):
+            return HttpResponse(status=403)
+        record = get_object_or_404(ProfileRecord, pk=pk)
+        response = HttpResponse(record.stacks, content_type="text/plain; charset=utf-8")
+        response["Content-Disposition"] = f'attachment; filename="profile-{record.pk}.folded"'
+        return response
+
+    @admin.display(description="Flame graph")
+    def flamegraph(self, obj):
+        return format_html(
+            '<a href="{}">Download folded stacks</a> (open in speedscope.app or pipe to flamegraph.pl)',
+            reverse("admin:core_profilerecord_stacks", args=[obj.pk]),
+        )
+
+    @admin.display(description="Top functions (self / total samples)")
+    def top_functions(self, obj):
+        return format_html(
+            "<table>{}</table>",
+            format_html_join("", "<tr><td>{}</td><td>{}</td><td>{}</td></tr>", obj.top_functions()),
+        )
+
+    @admin.display(description="Queries (ms)")
+    def query_log(self, obj):
+        return format_html(
+            "<table>{}</table>",
+            format_html_join(
+                "",
+                "<tr><td>{}</td><td>{}</td><td><code>{}</code></td></tr>",
+                ((query["ms"], query["alias"], query["sql"]) for query in obj.queries),
+            ),
+        )
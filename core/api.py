@@ -0,0 +1,150 @@
+import datetime
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+RESPONSE_CACHE_KEY = "api:response:{key}:{version}"
+
+
+def get_requested_fields(request):
+    """
+    Returns the field names listed in the ``fields`` query parameter, or None.
+    """
+    value = request.query_params.get('fields') if request is not None else None
+    if not value:
+        return None
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+class DynamicFieldsMixin:
+    """
+    Serializer mixin that limits output to the ``fields`` query parameter.
+
+    ``?fields=amount,created_at`` returns only those fields; without the
+    parameter every field is returned.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = get_requested_fields(self.context.get('request'))
+        if fields:
+            for name in set(self.fields) - fields:
+                self.fields.pop(name)
+
+
+class ConditionalCacheMixin:
+    """
+    Adds conditional GET and a per-user response cache to a read-only view.
+
+    Views implement get_data_version(), returning a millisecond timestamp
+    that changes whenever the data behind the response changes (and
+    raising if the user may not see it). The ETag is derived from that
+    version, the user and the full URL, so a client revalidating an
+    unchanged resource gets a 304 without the view running any data
+    query, and a changed resource is rendered once per user and served
+    from the cache until the version moves again.
+
+    Views whose response also depends on something outside the URL, such
+    as a date range defaulting to today, return it from get_cache_variant()
+    so it is part of the ETag and the cache key.
+
+    Views built on a generic view inherit its GET; others implement
+    get_response_data() instead of get().
+    """
+
+    def get_data_version(self):
+        raise NotImplementedError
+
+    def get_cache_variant(self):
+        return ''
+
+    def get_response_data(self, request, *args, **kwargs):
+        """
+        Returns the data for a full response; defaults to the parent view's GET.
+        """
+        return super().get(request, *args, **kwargs).data
+
+    def get(self, request, *args, **kwargs):
+        version = self.get_data_version()
+        variant = self.get_cache_variant()
+        key = hashlib.sha256(f"{request.user.pk}:{variant}:{request.get_full_path()}".encode()).hexdigest()
+        etag = f'"{version}-{key[:16]}"'
+        last_modified = version // 1000
+
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        cache_key = RESPONSE_CACHE_KEY.format(key=key, version=version)
+        data = cache.get(cache_key)
+        if data is None:
+            data = self.get_response_data(request, *args, **kwargs)
+            cache.set(cache_key, data, settings.API_RESPONSE_CACHE_TIMEOUT)
+
+        response = Response(data)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        response['Cache-Control'] = 'private, no-cache'
+        patch_vary_headers(response, ('Authorization',))
+        return response
+
+
+def get_uuid_param(request, name, required=False):
+    """
+    Returns a UUID query parameter, or None when it is absent and optional.
+
+    Raises:
+        ValidationError: If the value is missing but required, or malformed
+    """
+    value = request.query_params.get(name)
+    if not value:
+        if required:
+            raise ValidationError({name: "This parameter is required."})
+        return None
+    try:
+        return uuid.UUID(value)
+    except ValueError:
+        raise ValidationError({name: "Must be a valid UUID."})
+
+
+def get_date_param(request, name, default):
+    """
+    Returns an ISO date query parameter, or ``default`` when it is absent.
+
+    Raises:
+        ValidationError: If the value is not an ISO date
+    """
+    value = request.query_params.get(name)
+    if not value:
+        return default
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise ValidationError({name: "Must be a date in YYYY-MM-DD format."})
+
+
+def get_number_param(request, name, minimum, maximum, required=False, cast=float):
+    """
+    Returns a numeric query parameter within [minimum, maximum], or None when absent and optional.
+
+    Raises:
+        ValidationError: If the value is missing but required, not a number, or out of range
+    """
+    value = request.query_params.get(name)
+    if not value:
+        if required:
+            raise ValidationError({name: "This parameter is required."})
+        return None
+    try:
+        number = cast(value)
+    except ValueError:
+        raise ValidationError({name: "Must be a number."})
+    if not minimum <= number <= maximum:
+        raise ValidationError({name: f"Must be between {minimum} and {maximum}."})
+    return number
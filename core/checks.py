@@ -0,0 +1,43 @@
+"""
+System checks for deployment settings the code relies on.
+"""
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+
+# Backends whose entries are only visible to the process that wrote them
+PROCESS_LOCAL_CACHES = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+def cache_is_shared():
+    return settings.CACHES['default']['BACKEND'] not in PROCESS_LOCAL_CACHES
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    if cache_is_shared():
+        return []
+    return [
+        Warning(
+            "The default cache is local to each process.",
+            hint="JWT revocations and access map invalidations only reach the process "
+                 "that made them. Set CACHE_URL to a shared cache.",
+            id='core.W001',
+        ),
+    ]
+
+
+@register(Tags.caches)
+def check_shard_map_cache(app_configs, **kwargs):
+    if len(settings.TIP_SHARDS) == 1 or cache_is_shared():
+        return []
+    return [
+        Error(
+            "TIP_SHARDS lists several shards but the default cache is local to each process.",
+            hint="Other processes would keep routing a moved business to its old shard. "
+                 "Set CACHE_URL to a shared cache.",
+            id='core.E001',
+        ),
+    ]
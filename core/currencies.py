@@ -0,0 +1,35 @@
+"""
+Currencies tips can be taken and reported in.
+
+Amounts are stored with two decimal places and handled in the minor unit
+as amount * 100 throughout (Stripe amounts, summaries, leaderboards and
+FX conversion), which is only right for currencies whose minor unit is a
+hundredth. Zero-decimal currencies such as JPY would be charged 100 times
+over, and three-decimal ones such as BHD a tenth, so they are rejected.
+"""
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+
+# ISO 4217 codes with two decimal places that Stripe charges in
+SUPPORTED_CURRENCIES = frozenset({
+    'AUD', 'BRL', 'CAD', 'CHF', 'CZK', 'DKK', 'EUR', 'GBP', 'HKD', 'MXN',
+    'NOK', 'NZD', 'PLN', 'RON', 'SEK', 'SGD', 'USD', 'ZAR',
+})
+
+
+def validate_currency(value):
+    """
+    Raises ValidationError unless ``value`` is a supported currency code.
+    """
+    if value not in SUPPORTED_CURRENCIES:
+        raise ValidationError(
+            "%(value)s is not a supported currency.", code='invalid_currency', params={'value': value},
+        )
+
+
+def to_minor_units(amount):
+    """
+    Returns an amount in a supported currency as an integer of minor units.
+    """
+    return int((Decimal(amount) * 100).to_integral_value())
@@ -0,0 +1,57 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+
+
+class CompactJSONEncoder(DjangoJSONEncoder):
+    """
+    JSON encoder that writes no whitespace between items.
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs['separators'] = (',', ':')
+        super().__init__(*args, **kwargs)
+
+
+class CompactJSONField(models.JSONField):
+    """
+    JSONField that stores a dict with short aliases for common keys.
+
+    ``aliases`` maps full key names to the short names written to the
+    database; values are read back under their full names, so code only
+    ever sees full keys. Keys with None values are dropped and the JSON is
+    written without whitespace. Aliases are reserved: a full key equal to
+    another key's alias would be read back under the wrong name. Database
+    lookups into the field (``metadata__key``) must use the stored alias.
+    """
+
+    def __init__(self, *args, aliases=None, **kwargs):
+        self.aliases = dict(aliases or {})
+        self.expansions = {short: full for full, short in self.aliases.items()}
+        kwargs.setdefault('encoder', CompactJSONEncoder)
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.aliases:
+            kwargs['aliases'] = self.aliases
+        return name, path, args, kwargs
+
+    def compact(self, value):
+        if not isinstance(value, dict):
+            return value
+        return {
+            self.aliases.get(key, key): item
+            for key, item in value.items()
+            if item is not None
+        }
+
+    def expand(self, value):
+        if not isinstance(value, dict):
+            return value
+        return {self.expansions.get(key, key): item for key, item in value.items()}
+
+    def get_prep_value(self, value):
+        return super().get_prep_value(self.compact(value))
+
+    def from_db_value(self, value, expression, connection):
+        return self.expand(super().from_db_value(value, expression, connection))
@@ -0,0 +1,481 @@
+"""
+End-to-end load test of the public tipping path.
+
+Simulated customers scan a QR code, read the signed form token from the
+page, submit a tip and "pay"; a fake Stripe answers the app's API calls
+and sends the payment webhooks back after a random delay, sometimes
+twice, as Stripe does. Requests go to config.asgi.application in this
+process, or to a running server over HTTP.
+
+At the end the report gives throughput, latency percentiles and error
+rates per step, and checks that the succeeded tips, the summary tables
+and the fake Stripe's own ledger agree.
+
+The fake Stripe is a small HTTP server in a thread, so the app's
+blocking Stripe client can call it from view threads. When testing a
+separate server, start it with STRIPE_API_BASE pointing at the fake
+(see the loadtest command), the same STRIPE_WEBHOOK_SECRET, and
+RATELIMIT_TRUSTED_PROXIES=1 so each customer's X-Forwarded-For address
+is used for rate limiting and fraud checks.
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import random
+import re
+import threading
+import time
+import urllib.parse
+import uuid
+from collections import defaultdict
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+from django.db.models import Count, Q, Sum
+
+FORM_TOKEN_RE = re.compile(r'name="form_token" value="([^"]+)"')
+
+
+class FakeStripe:
+    """
+    The parts of the Stripe API the tipping path uses, plus webhook delivery.
+    """
+
+    def __init__(self, webhook_secret, failure_rate=0.0, duplicate_rate=0.0, delay_ms=300, host='127.0.0.1', port=0):
+        self.webhook_secret = webhook_secret
+        self.failure_rate = failure_rate
+        self.duplicate_rate = duplicate_rate
+        self.delay_ms = delay_ms
+        self.intents = {}
+        self.by_key = {}
+        # Outcomes Stripe reported: intent id -> 'succeeded' | 'failed'
+        self.outcomes = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self.url = f"http://{host}:{self._server.server_port}"
+
+    def _handler(self):
+        stripe = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                params = dict(urllib.parse.parse_qsl(self.rfile.read(length).decode()))
+                status, body = stripe.handle(self.path, params, self.headers.get('Idempotency-Key'))
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def handle(self, path, params, idempotency_key):
+        with self._lock:
+            if path == '/v1/payment_intents':
+                if idempotency_key in self.by_key:
+                    return 200, self.by_key[idempotency_key]
+                intent_id = f"pi_{uuid.uuid4().hex[:24]}"
+                intent = {
+                    'id': intent_id,
+                    'object': 'payment_intent',
+                    'amount': int(params['amount']),
+                    'currency': params['currency'],
+                    'capture_method': params.get('capture_method', 'automatic'),
+                    'client_secret': f"{intent_id}_secret_{uuid.uuid4().hex[:24]}",
+                    'metadata': {
+                        key[len('metadata['):-1]: value
+                        for key, value in params.items() if key.startswith('metadata[')
+                    },
+                    'status': 'requires_payment_method',
+                }
+                self.intents[intent_id] = intent
+                if idempotency_key:
+                    self.by_key[idempotency_key] = intent
+                return 200, intent
+            if path == '/v1/refunds':
+                return 200, {'id': f"re_{uuid.uuid4().hex[:24]}", 'status': 'succeeded'}
+            match = re.fullmatch(r'/v1/payment_intents/(\w+)/(capture|cancel)', path)
+            if match and match.group(1) in self.intents:
+                return 200, self.intents[match.group(1)]
+        return 404, {'error': {'message': f"Unknown path {path}"}}
+
+    def confirm(self, client_secret):
+        """
+        Confirms a payment as the browser would.
+
+        Returns:
+            list: (delay seconds, webhook event) to deliver, or [] for held payments
+        """
+        intent_id = client_secret.split('_secret_')[0]
+        with self._lock:
+            intent = self.intents.get(intent_id)
+            if intent is None or intent['status'] != 'requires_payment_method':
+                return []
+            if intent['capture_method'] == 'manual':
+                intent['status'] = 'requires_capture'
+                return []
+            failed = random.random() < self.failure_rate
+            intent['status'] = 'failed' if failed else 'succeeded'
+            self.outcomes[intent_id] = intent['status']
+        event = {
+            'id': f"evt_{uuid.uuid4().hex[:24]}",
+            'object': 'event',
+            'type': 'payment_intent.payment_failed' if failed else 'payment_intent.succeeded',
+            'data': {'object': dict(intent)},
+        }
+        deliveries = [(self._delay(), event)]
+        if random.random() < self.duplicate_rate:
+            deliveries.append((self._delay() * 2, event))
+        return deliveries
+
+    def _delay(self):
+        # Log-normal, with the configured median
+        return random.lognormvariate(0, 0.6) * self.delay_ms / 1000
+
+    def sign(self, payload):
+        timestamp = str(int(time.time()))
+        signature = hmac.new(
+            self.webhook_secret.encode(), timestamp.encode() + b'.' + payload, hashlib.sha256,
+        ).hexdigest()
+        return f"t={timestamp},v1={signature}"
+
+
+class ASGITransport:
+    """
+    Sends requests straight to an ASGI application.
+    """
+
+    def __init__(self, application, host='loadtest'):
+        self.application = application
+        self.host = host
+
+    async def request(self, method, path, body=b'', headers=(), client_ip='127.0.0.1'):
+        path, _, query = path.partition('?')
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': method,
+            'scheme': 'http',
+            'path': path,
+            'raw_path': path.encode(),
+            'query_string': query.encode(),
+            'root_path': '',
+            'headers': [(b'host', self.host.encode()), (b'content-length', str(len(body)).encode())]
+            + [(name.lower().encode(), value.encode()) for name, value in headers],
+            'client': (client_ip, 50000),
+            'server': (self.host, 80),
+        }
+        sent = False
+        status = None
+        chunks = []
+
+        async def receive():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {'type': 'http.request', 'body': body, 'more_body': False}
+            await asyncio.Event().wait()
+
+        async def send(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            elif message['type'] == 'http.response.body':
+                chunks.append(message.get('body', b''))
+
+        await self.application(scope, receive, send)
+        return status, b''.join(chunks)
+
+
+class HTTPTransport:
+    """
+    Sends requests to a running server, one HTTP/1.1 connection per request.
+    """
+
+    def __init__(self, url):
+        parts = urllib.parse.urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+
+    async def request(self, method, path, body=b'', headers=(), client_ip='127.0.0.1'):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            lines = [
+                f"{method} {path} HTTP/1.1",
+                f"Host: {self.host}:{self.port}",
+                f"Content-Length: {len(body)}",
+                f"X-Forwarded-For: {client_ip}",
+                "Connection: close",
+            ] + [f"{name}: {value}" for name, value in headers]
+            writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + body)
+            await writer.drain()
+            response = await reader.read()
+        finally:
+            writer.close()
+        head, _, content = response.partition(b'\r\n\r\n')
+        return int(head.split(b' ', 2)[1]), content
+
+
+class Stats:
+    """
+    Latencies and outcomes per step.
+    """
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def record(self, step, latency, status):
+        self.latencies[step].append(latency)
+        self.statuses[step][status] += 1
+
+    def summary(self):
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        steps = {}
+        for step, latencies in self.latencies.items():
+            ms = np.array(latencies) * 1000
+            statuses = self.statuses[step]
+            errors = sum(count for status, count in statuses.items() if status == 'error' or status >= 500)
+            steps[step] = {
+                'requests': len(ms),
+                'per_second': len(ms) / elapsed,
+                'p50_ms': float(np.percentile(ms, 50)),
+                'p90_ms': float(np.percentile(ms, 90)),
+                'p99_ms': float(np.percentile(ms, 99)),
+                'max_ms': float(ms.max()),
+                'error_rate': errors / len(ms),
+                'statuses': dict(sorted(statuses.items(), key=str)),
+            }
+        return {'elapsed_seconds': elapsed, 'steps': steps}
+
+
+class LoadTest:
+    """
+    Customers scanning and tipping through one transport.
+
+    Args:
+        transport: ASGITransport or HTTPTransport
+        stripe (FakeStripe): Fake Stripe the app is configured to call
+        tokens (list): QR code tokens customers pick from
+        think_ms (float): Median pause between reading the page and paying
+    """
+
+    def __init__(self, transport, stripe, tokens, think_ms=500):
+        self.transport = transport
+        self.stripe = stripe
+        self.tokens = tokens
+        self.think_ms = think_ms
+        self.stats = Stats()
+        self._webhooks = set()
+
+    async def _timed(self, step, method, path, body=b'', headers=(), client_ip='127.0.0.1'):
+        started = time.perf_counter()
+        try:
+            status, content = await self.transport.request(method, path, body, headers, client_ip)
+        except Exception:
+            self.stats.record(step, time.perf_counter() - started, 'error')
+            return None, b''
+        self.stats.record(step, time.perf_counter() - started, status)
+        return status, content
+
+    async def customer(self, number):
+        client_ip = f"10.{number >> 16 & 255}.{number >> 8 & 255}.{number & 255}"
+        token = random.choice(self.tokens)
+        status, page = await self._timed('scan', 'GET', f'/tips/t/{token}/', client_ip=client_ip)
+        match = FORM_TOKEN_RE.search(page.decode(errors='replace')) if status == 200 else None
+        if match is None:
+            return
+        await asyncio.sleep(random.lognormvariate(0, 0.5) * self.think_ms / 1000)
+        form = urllib.parse.urlencode({
+            'amount': str(random.choice((Decimal('2.00'), Decimal('3.50'), Decimal('5.00'), Decimal('10.00')))),
+            'idempotency_key': uuid.uuid4().hex,
+            'form_token': match.group(1),
+        }).encode()
+        status, content = await self._timed(
+            'tip', 'POST', f'/tips/t/{token}/pay/', form,
+            headers=[('Content-Type', 'application/x-www-form-urlencoded')], client_ip=client_ip,
+        )
+        if status != 200:
+            return
+        for delay, event in self.stripe.confirm(json.loads(content)['client_secret']):
+            task = asyncio.ensure_future(self._deliver(delay, event))
+            self._webhooks.add(task)
+            task.add_done_callback(self._webhooks.discard)
+
+    async def _deliver(self, delay, event):
+        await asyncio.sleep(delay)
+        payload = json.dumps(event).encode()
+        headers = [('Content-Type', 'application/json'), ('Stripe-Signature', self.stripe.sign(payload))]
+        for _ in range(3):
+            # Stripe retries failed deliveries; much sooner here
+            status, _ = await self._timed('webhook', 'POST', '/payments/webhook/', payload, headers)
+            if status == 200:
+                return
+            await asyncio.sleep(1)
+
+    async def run(self, customers, concurrency, arrival_rate=None):
+        """
+        Runs ``customers`` customers, at most ``concurrency`` at once.
+
+        With arrival_rate, customers arrive as a Poisson process of that
+        many per second instead of all at once.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def limited(number):
+            async with semaphore:
+                await self.customer(number)
+
+        tasks = []
+        for number in range(customers):
+            tasks.append(asyncio.ensure_future(limited(number)))
+            if arrival_rate:
+                await asyncio.sleep(random.expovariate(arrival_rate))
+        await asyncio.gather(*tasks)
+        while self._webhooks:
+            await asyncio.gather(*list(self._webhooks))
+        self.stats.finished = time.perf_counter()
+        return self.stats
+
+
+def create_fixtures(staff_count, locations=3):
+    """
+    Creates a business with staff and persistent QR codes to test against.
+
+    Returns:
+        tuple: (Business, list of QR tokens)
+    """
+    from django.contrib.auth import get_user_model
+    from django.utils import timezone
+
+    from businesses.models import Business, Location
+    from staff.models import StaffProfile, StaffQRCode
+
+    User = get_user_model()
+    run = uuid.uuid4().hex[:8]
+    owner = User.objects.create_user(
+        username=f'loadtest-{run}', email=f'loadtest-{run}@example.com', password=None, role='OWNER',
+    )
+    business = Business.objects.create(
+        owner=owner, name=f"Load test {run}", email=owner.email, phone='0',
+    )
+    sites = [
+        Location.objects.create(
+            business=business, name=f"Site {i}", address_line1='1 Test Street',
+            city='Testville', state='', postal_code='T1',
+        )
+        for i in range(locations)
+    ]
+    users = User.objects.bulk_create([
+        User(username=f'loadtest-{run}-{i}', email=f'loadtest-{run}-{i}@example.com', role='STAFF')
+        for i in range(staff_count)
+    ])
+    profiles = StaffProfile.objects.db_manager(business._state.db).bulk_create([
+        StaffProfile(user=user, business=business, location=sites[i % locations], display_name=f"Staff {i}", position='WAITER')
+        for i, user in enumerate(users)
+    ])
+    codes = StaffQRCode.objects.db_manager(business._state.db).bulk_create([
+        StaffQRCode(
+            staff_profile=profile, token=uuid.uuid4().hex, qr_type='PERSISTENT', valid_from=timezone.now(),
+        )
+        for profile in profiles
+    ])
+    return business, [code.token for code in codes]
+
+
+def delete_fixtures(business):
+    """
+    Deletes a business made by create_fixtures, with its tips, users and
+    the webhook events recorded for its payments.
+    """
+    from django.contrib.auth import get_user_model
+
+    from core import sharding
+    from core.models import ShardAssignment
+    from payments.models import StripeWebhookEvent
+    from staff.models import StaffProfile
+    from tips.models import Tip
+
+    db = business._state.db
+    tips = Tip.objects.using(db).filter(staff_profile__business=business)
+    intent_ids = list(tips.values_list('payment_intent_id', flat=True))
+    user_ids = [
+        business.owner_id,
+        *StaffProfile.objects.using(db).filter(business=business).values_list('user_id', flat=True),
+    ]
+    with sharding.use_shard(db), sharding.atomic():
+        tips.delete()
+        business.delete()
+    for start in range(0, len(intent_ids), 500):
+        StripeWebhookEvent.objects.filter(payload__data__object__id__in=intent_ids[start:start + 500]).delete()
+    ShardAssignment.objects.filter(business_id=business.pk).delete()
+    get_user_model().objects.filter(pk__in=user_ids).delete()
+
+
+def check_consistency(business, stripe=None):
+    """
+    Compares a business's succeeded tips with its summary rows.
+
+    Returns:
+        dict: Totals per currency from tips, hourly and daily summaries
+            and (when given) the fake Stripe's ledger, and whether they match
+    """
+    from analytics.models import HourlyTipSummary, TipSummary
+    from tips.models import Tip
+
+    db = business._state.db
+    tips = (
+        Tip.objects.using(db)
+        .filter(staff_profile__business=business, payment_status='SUCCEEDED')
+        .values('currency').annotate(total=Sum('amount'), count=Count('pk'))
+    )
+    hourly = (
+        HourlyTipSummary.objects.using(db).filter(business=business)
+        .values('currency').annotate(total=Sum('total_tips'), count=Sum('tip_count'))
+    )
+    daily = (
+        TipSummary.objects.using(db)
+        .filter(Q(business=business), staff_profile__isnull=True, location__isnull=True)
+        .values('currency').annotate(total=Sum('total_tips'), count=Sum('tip_count'))
+    )
+    totals = defaultdict(lambda: {'tips': (Decimal('0'), 0), 'summaries': (Decimal('0'), 0)})
+    for row in tips:
+        totals[row['currency']]['tips'] = (row['total'], row['count'])
+    for row in list(hourly) + list(daily):
+        total, count = totals[row['currency']]['summaries']
+        totals[row['currency']]['summaries'] = (total + row['total'], count + row['count'])
+    if stripe is not None:
+        ledger = defaultdict(lambda: [0, 0])
+        for intent_id, outcome in stripe.outcomes.items():
+            intent = stripe.intents[intent_id]
+            if outcome == 'succeeded' and intent['metadata'].get('business_id') == str(business.pk):
+                ledger[intent['currency'].upper()][0] += intent['amount']
+                ledger[intent['currency'].upper()][1] += 1
+        for currency, (pence, count) in ledger.items():
+            totals[currency]['stripe'] = (Decimal(pence).scaleb(-2), count)
+    result = {}
+    for currency, sources in totals.items():
+        values = set(sources.values())
+        result[currency] = {
+            name: {'total': str(total), 'count': count} for name, (total, count) in sources.items()
+        }
+        result[currency]['consistent'] = len(values) == 1
+    return result
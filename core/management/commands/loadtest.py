@@ -0,0 +1,127 @@
+import asyncio
+import json
+import secrets
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from businesses.models import Business
+from core import sharding
+from core.loadtest import (
+    ASGITransport, FakeStripe, HTTPTransport, LoadTest, check_consistency, create_fixtures,
+    delete_fixtures,
+)
+from staff.models import StaffQRCode
+
+
+class Command(BaseCommand):
+    help = (
+        "Load tests the scan, tip and webhook path with simulated customers and a fake Stripe, "
+        "then checks the summary tables against the tips."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customers', type=int, default=1000, help="Customers to simulate (default: %(default)s)")
+        parser.add_argument('--concurrency', type=int, default=200, help="Customers active at once (default: %(default)s)")
+        parser.add_argument('--arrival-rate', type=float, help="Customers arriving per second; default all at once")
+        parser.add_argument('--think-ms', type=float, default=500, help="Median pause before paying (default: %(default)s)")
+        parser.add_argument(
+            '--url',
+            help="Test a running server at this URL instead of config.asgi.application in this process",
+        )
+        parser.add_argument('--business', help="Tip the staff of this existing business")
+        parser.add_argument(
+            '--staff',
+            type=int,
+            default=50,
+            help="Staff in the business created for the test when --business is not given (default: %(default)s)",
+        )
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help="Keep the business created for the test, its staff and tips, instead of deleting them after the report",
+        )
+        parser.add_argument('--stripe-port', type=int, default=0, help="Port for the fake Stripe (default: any free port)")
+        parser.add_argument('--webhook-delay-ms', type=float, default=300, help="Median webhook delay (default: %(default)s)")
+        parser.add_argument('--duplicate-rate', type=float, default=0.1, help="Share of webhooks sent twice (default: %(default)s)")
+        parser.add_argument('--failure-rate', type=float, default=0.05, help="Share of payments that fail (default: %(default)s)")
+        parser.add_argument(
+            '--no-ratelimit',
+            action='store_true',
+            help="Disable rate limiting (in-process only; the per-business limits stop a large test otherwise)",
+        )
+        parser.add_argument('--json', action='store_true', help="Print the report as JSON")
+
+    def handle(self, *args, **options):
+        if options['business']:
+            business = Business.objects.using(sharding.shard_for_business(options['business'])).get(pk=options['business'])
+            tokens = list(
+                StaffQRCode.objects.using(business._state.db)
+                .filter(staff_profile__business=business, staff_profile__is_active=True, is_active=True)
+                .values_list('token', flat=True)
+            )
+            if not tokens:
+                raise CommandError(f"{business} has no active QR codes")
+            self.run_test(business, tokens, options)
+            return
+        business, tokens = create_fixtures(options['staff'])
+        self.stdout.write(f"Created {business} with {len(tokens)} staff.")
+        try:
+            self.run_test(business, tokens, options)
+        finally:
+            if options['keep']:
+                self.stdout.write(f"Kept {business} ({business.pk}).")
+            else:
+                delete_fixtures(business)
+                self.stdout.write(f"Deleted {business}.")
+
+    def run_test(self, business, tokens, options):
+        webhook_secret = settings.STRIPE_WEBHOOK_SECRET or secrets.token_hex(16)
+        stripe = FakeStripe(
+            webhook_secret,
+            failure_rate=options['failure_rate'],
+            duplicate_rate=options['duplicate_rate'],
+            delay_ms=options['webhook_delay_ms'],
+            port=options['stripe_port'],
+        )
+        stripe.start()
+        overrides = {
+            'STRIPE_API_BASE': stripe.url,
+            'STRIPE_WEBHOOK_SECRET': webhook_secret,
+        }
+        if options['url']:
+            if not settings.STRIPE_WEBHOOK_SECRET:
+                raise CommandError("Set STRIPE_WEBHOOK_SECRET to the server's secret to test over HTTP")
+            self.stdout.write(f"Fake Stripe at {stripe.url}; the server must use it as STRIPE_API_BASE.")
+            transport = HTTPTransport(options['url'])
+        else:
+            from config.asgi import application
+            transport = ASGITransport(application)
+            overrides['ALLOWED_HOSTS'] = [*settings.ALLOWED_HOSTS, transport.host]
+            if options['no_ratelimit']:
+                overrides['RATELIMIT_ENABLED'] = False
+
+        test = LoadTest(transport, stripe, tokens, think_ms=options['think_ms'])
+        try:
+            with override_settings(**overrides):
+                stats = asyncio.run(test.run(options['customers'], options['concurrency'], options['arrival_rate']))
+        finally:
+            stripe.stop()
+
+        report = stats.summary()
+        report['consistency'] = check_consistency(business, stripe)
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        self.stdout.write(f"{options['customers']} customers in {report['elapsed_seconds']:.1f}s")
+        for step, row in report['steps'].items():
+            self.stdout.write(
+                f"  {step:8} {row['requests']:6} requests {row['per_second']:8.1f}/s  "
+                f"p50 {row['p50_ms']:7.1f}ms  p90 {row['p90_ms']:7.1f}ms  p99 {row['p99_ms']:7.1f}ms  "
+                f"max {row['max_ms']:7.1f}ms  errors {row['error_rate']:.1%}  {row['statuses']}"
+            )
+        for currency, sources in report['consistency'].items():
+            consistent = sources.pop('consistent')
+            line = ', '.join(f"{name} {value['total']} ({value['count']})" for name, value in sources.items())
+            self.stdout.write(f"  {currency}: {line} - {'consistent' if consistent else 'MISMATCH'}")
@@ -0,0 +1,148 @@
+import time
+import uuid
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from analytics.models import HourlyTipSummary, TipSummary
+from businesses.models import Business, Location
+from core import sharding
+from core.models import ShardAssignment
+from payments.models import Refund
+from staff.models import StaffProfile, StaffQRCode, StaffShift, TroncDistribution, TroncShare
+from tips.models import Tip
+
+# Parents before children, each with its lookup to the business
+BUSINESS_ROWS = (
+    (Business, 'pk'),
+    (Location, 'business_id'),
+    (StaffProfile, 'business_id'),
+    (StaffQRCode, 'staff_profile__business_id'),
+    (StaffShift, 'business_id'),
+    (TroncDistribution, 'business_id'),
+    (TroncShare, 'distribution__business_id'),
+    (Tip, 'staff_profile__business_id'),
+    (Refund, 'tip__staff_profile__business_id'),
+    (TipSummary, 'business_id'),
+    (HourlyTipSummary, 'business_id'),
+)
+
+
+class Command(BaseCommand):
+    help = "Moves a business and all its tenant data to another shard."
+
+    def add_arguments(self, parser):
+        parser.add_argument('business_id', help="Business to move")
+        parser.add_argument('shard', help="Database alias to move it to; one of TIP_SHARDS")
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help="Rows copied per INSERT (default: %(default)s)",
+        )
+        parser.add_argument(
+            '--drain-seconds',
+            type=float,
+            help="Wait after locking for cached shard map entries to expire and requests "
+                 "already routed to the old shard to finish (default: SHARD_MAP_CACHE_SECONDS)",
+        )
+        parser.add_argument(
+            '--keep-source-seconds',
+            type=float,
+            help="Wait after the move before deleting the old copy, for processes still "
+                 "reading it (default: SHARD_MAP_CACHE_SECONDS)",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            business_id = uuid.UUID(options['business_id'])
+        except ValueError:
+            raise CommandError(f"Invalid business id: {options['business_id']}")
+        target = options['shard']
+        if target not in sharding.get_shards():
+            raise CommandError(f"{target} is not one of TIP_SHARDS: {', '.join(sharding.get_shards())}")
+        source = sharding.shard_for_business(business_id)
+        if source == target:
+            raise CommandError(f"Business {business_id} is already on {target}")
+        if not Business.objects.using(source).filter(pk=business_id).exists():
+            raise CommandError(f"Business {business_id} not found on {source}")
+
+        drain_seconds = options['drain_seconds']
+        if drain_seconds is None:
+            drain_seconds = settings.SHARD_MAP_CACHE_SECONDS
+        keep_source_seconds = options['keep_source_seconds']
+        if keep_source_seconds is None:
+            keep_source_seconds = settings.SHARD_MAP_CACHE_SECONDS
+
+        # Writes for the business are refused (503) until the move finishes
+        self.set_assignment(business_id, source, locked=True)
+        moved = False
+        try:
+            time.sleep(drain_seconds)
+            counts = self.copy(business_id, source, target, options['batch_size'])
+            self.set_assignment(business_id, target, locked=False, moved_at=timezone.now())
+            moved = True
+        finally:
+            if not moved:
+                self.set_assignment(business_id, source, locked=False)
+
+        time.sleep(keep_source_seconds)
+        self.delete(business_id, source)
+        for model, count in counts.items():
+            self.stdout.write(f"  {model.__name__}: {count}")
+        self.stdout.write(f"Moved business {business_id} from {source} to {target}.")
+
+    @staticmethod
+    def set_assignment(business_id, shard, locked, moved_at=None):
+        defaults = {'shard': shard, 'locked': locked}
+        if moved_at is not None:
+            defaults['moved_at'] = moved_at
+        ShardAssignment.objects.update_or_create(business_id=business_id, defaults=defaults)
+        sharding.forget_assignment(business_id)
+
+    @staticmethod
+    def rows(model, lookup, business_id, alias):
+        return model.objects.using(alias).filter(**{lookup: business_id})
+
+    def copy(self, business_id, source, target, batch_size):
+        """
+        Copies every row of the business to the target in one transaction.
+
+        Returns:
+            dict: Model -> rows copied
+        """
+        counts = {}
+        with transaction.atomic(using=target):
+            # Leftovers of an earlier interrupted move
+            self.delete(business_id, target)
+            for model, lookup in BUSINESS_ROWS:
+                batch = []
+                counts[model] = 0
+                for row in self.rows(model, lookup, business_id, source).iterator(chunk_size=batch_size):
+                    batch.append(row)
+                    if len(batch) >= batch_size:
+                        model.objects.using(target).bulk_create(batch)
+                        counts[model] += len(batch)
+                        batch = []
+                model.objects.using(target).bulk_create(batch)
+                counts[model] += len(batch)
+
+                copied = self.rows(model, lookup, business_id, target).count()
+                if copied != counts[model]:
+                    raise CommandError(
+                        f"Copied {copied} {model.__name__} rows but read {counts[model]}; "
+                        "was the business written to during the move?"
+                    )
+            # Lets other processes' location indexes see the rows on their new shard
+            self.rows(Location, 'business_id', business_id, target).update(updated_at=timezone.now())
+        return counts
+
+    def delete(self, business_id, alias):
+        # Raw deletes, children first: collector cascades and delete signals
+        # would treat the copies on the other shard as deleted too
+        with transaction.atomic(using=alias):
+            for model, lookup in reversed(BUSINESS_ROWS):
+                rows = self.rows(model, lookup, business_id, alias)
+                rows._raw_delete(rows.db)
@@ -0,0 +1,31 @@
+import shlex
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from core.profiling import profile, save_profile
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs a management command under the sampling profiler and stores its stacks "
+        "and SQL as a ProfileRecord, e.g. manage.py profile compact_hourly_summaries --days 7"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('command_name', help="Command to profile")
+        parser.add_argument('command_args', nargs='...', help="Arguments for the command")
+
+    def handle(self, *args, **options):
+        command_line = shlex.join([options['command_name'], *options['command_args']])
+        try:
+            with profile() as result:
+                call_command(options['command_name'], *options['command_args'])
+        finally:
+            # Failed runs are often the interesting ones
+            record = save_profile(result, 'COMMAND', command_line, 'COMMAND')
+        self.stdout.write(
+            f"Profiled {command_line}: {result.duration:.0f}ms, "
+            f"{record.samples} samples, {record.query_count} queries ({record.query_ms:.0f}ms). "
+            f"Profile {record.pk}"
+        )
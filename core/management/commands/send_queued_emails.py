@@ -0,0 +1,38 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.outbox import send_queued_emails
+
+
+class Command(BaseCommand):
+    help = "Sends queued outbound emails in batches, retrying failures with backoff."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.EMAIL_OUTBOX_BATCH_SIZE,
+            help="Emails sent per SMTP connection (default: %(default)s)",
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help="Keep polling the outbox instead of exiting once it is empty",
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=settings.EMAIL_OUTBOX_POLL_SECONDS,
+            help="Seconds between polls with --loop (default: %(default)s)",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = send_queued_emails(options['batch_size'])
+            if sent or failed or not options['loop']:
+                self.stdout.write(f"Sent {sent} emails, {failed} failed.")
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ShardAssignment",
+            fields=[
+                ("business_id", models.UUIDField(primary_key=True, serialize=False)),
+                ("shard", models.CharField(max_length=100)),
+                (
+                    "locked",
+                    models.BooleanField(
+                        default=False,
+                        help_text="Set while the business is being moved; writes are refused",
+                    ),
+                ),
+                ("assigned_at", models.DateTimeField(auto_now_add=True)),
+                ("moved_at", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "verbose_name": "Shard Assignment",
+                "verbose_name_plural": "Shard Assignments",
+                "indexes": [
+                    models.Index(fields=["shard"], name="core_sharda_shard_e111aa_idx")
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:20
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0002_shardassignment"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProfileRecord",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("REQUEST", "Request"),
+                            ("COMMAND", "Management command"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "name",
+                    models.CharField(
+                        help_text="Request method and path, or command line",
+                        max_length=255,
+                    ),
+                ),
+                (
+                    "trigger",
+                    models.CharField(
+                        choices=[
+                            ("HEADER", "Profiling header"),
+                            ("SAMPLED", "URL sampling rule"),
+                            ("COMMAND", "profile command"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "status_code",
+                    models.PositiveSmallIntegerField(blank=True, null=True),
+                ),
+                ("duration_ms", models.FloatField()),
+                ("samples", models.PositiveIntegerField(default=0)),
+                ("query_count", models.PositiveIntegerField(default=0)),
+                ("query_ms", models.FloatField(default=0)),
+                (
+                    "queries",
+                    models.JSONField(
+                        blank=True,
+                        default=list,
+                        help_text="First PROFILING_MAX_QUERIES queries",
+                    ),
+                ),
+                (
+                    "stacks",
+                    models.TextField(
+                        blank=True,
+                        help_text="Folded stacks, one 'outer;inner;leaf count' per line",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "verbose_name": "Profile Record",
+                "verbose_name_plural": "Profile Records",
+                "indexes": [
+                    models.Index(
+                        fields=["-created_at"], name="core_profil_created_26d60f_idx"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -1,3 +1,150 @@
+import uuid
+
 from django.db import models
+from django.utils import timezone
+
+
+class OutboundEmail(models.Model):
+    """
+    An email waiting in the outbox, or its record once sent.
+
+    Requests only insert rows; the send_queued_emails worker delivers them
+    in batches over one SMTP connection and retries failures with backoff.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    KIND_CHOICES = [
+        ('VERIFICATION', 'Email verification'),
+        ('RECEIPT', 'Tip receipt'),
+    ]
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('SENT', 'Sent'),
+        ('FAILED', 'Failed'),
+    ]
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
+    to_email = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Outbound Email'
+        verbose_name_plural = 'Outbound Emails'
+        indexes = [
+            # Serves the worker's "pending and due" scan
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} to {self.to_email} ({self.status})"
+
+    @classmethod
+    def enqueue(cls, kind, to_email, subject, body):
+        """
+        Queues an email for the background worker.
+
+        Args:
+            kind (str): One of KIND_CHOICES
+            to_email (str): Recipient address
+            subject (str): Subject line
+            body (str): Plain text body
+
+        Returns:
+            OutboundEmail: The queued email
+        """
+        return cls.objects.create(kind=kind, to_email=to_email, subject=subject, body=body)
+
+
+class ShardAssignment(models.Model):
+    """
+    The database alias holding a business's tenant data.
+
+    Lives on the default database; businesses without a row are on the
+    first of TIP_SHARDS. See core.sharding.
+    """
+    business_id = models.UUIDField(primary_key=True)
+    shard = models.CharField(max_length=100)
+    locked = models.BooleanField(
+        default=False,
+        help_text="Set while the business is being moved; writes are refused"
+    )
+    assigned_at = models.DateTimeField(auto_now_add=True)
+    moved_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Shard Assignment'
+        verbose_name_plural = 'Shard Assignments'
+        indexes = [
+            models.Index(fields=['shard']),
+        ]
+
+    def __str__(self):
+        return f"{self.business_id} on {self.shard}"
+
+
+class ProfileRecord(models.Model):
+    """
+    A sampled stack profile and SQL log of one request or command.
+
+    Written by core.profiling; stacks are in the folded format read by
+    flamegraph tools.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    KIND_CHOICES = [
+        ('REQUEST', 'Request'),
+        ('COMMAND', 'Management command'),
+    ]
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    name = models.CharField(max_length=255, help_text="Request method and path, or command line")
+    TRIGGER_CHOICES = [
+        ('HEADER', 'Profiling header'),
+        ('SAMPLED', 'URL sampling rule'),
+        ('COMMAND', 'profile command'),
+    ]
+    trigger = models.CharField(max_length=20, choices=TRIGGER_CHOICES)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    duration_ms = models.FloatField()
+    samples = models.PositiveIntegerField(default=0)
+    query_count = models.PositiveIntegerField(default=0)
+    query_ms = models.FloatField(default=0)
+    queries = models.JSONField(default=list, blank=True, help_text="First PROFILING_MAX_QUERIES queries")
+    stacks = models.TextField(blank=True, help_text="Folded stacks, one 'outer;inner;leaf count' per line")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Profile Record'
+        verbose_name_plural = 'Profile Records'
+        indexes = [
+            models.Index(fields=['-created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.duration_ms:.0f}ms)"
+
+    def top_functions(self, limit=20):
+        """
+        Returns the functions seen in most samples.
+
+        Args:
+            limit (int): Number of functions to return
 
-# Create your models here.
+        Returns:
+            list: (function, self samples, total samples) tuples, by total
+        """
+        own = {}
+        total = {}
+        for line in self.stacks.splitlines():
+            stack, _, count = line.rpartition(' ')
+            frames = stack.split(';')
+            count = int(count)
+            own[frames[-1]] = own.get(frames[-1], 0) + count
+            # A recursive function counts once per sample
+            for frame in set(frames):
+                total[frame] = total.get(frame, 0) + count
+        ranked = sorted(total.items(), key=lambda item: item[1], reverse=True)[:limit]
+        return [(frame, own.get(frame, 0), count) for frame, count in ranked]
@@ -0,0 +1,109 @@
+"""
+Delivery of queued OutboundEmail rows.
+
+Workers claim a batch of due emails by pushing their next_attempt_at
+forward by a lease, so concurrent workers never pick up the same row and
+an email claimed by a worker that dies is retried once the lease expires.
+The batch is then sent over a single SMTP connection. Failures are
+retried with exponential backoff until EMAIL_OUTBOX_MAX_ATTEMPTS.
+"""
+import datetime
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+
+def claim_batch(batch_size):
+    """
+    Claims up to ``batch_size`` due emails for this worker.
+
+    Returns:
+        list: Claimed OutboundEmail instances, oldest due first
+    """
+    now = timezone.now()
+    lease = datetime.timedelta(seconds=settings.EMAIL_OUTBOX_LEASE_SECONDS)
+    with transaction.atomic():
+        ids = list(
+            OutboundEmail.objects
+            .select_for_update(skip_locked=True)
+            .filter(status='PENDING', next_attempt_at__lte=now)
+            .order_by('next_attempt_at')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        OutboundEmail.objects.filter(pk__in=ids).update(next_attempt_at=now + lease)
+    return list(OutboundEmail.objects.filter(pk__in=ids).order_by('created_at'))
+
+
+def _record_failure(email, error, now):
+    email.attempts += 1
+    email.last_error = str(error)
+    if email.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+        email.status = 'FAILED'
+    else:
+        delay = settings.EMAIL_OUTBOX_RETRY_SECONDS * 2 ** (email.attempts - 1)
+        email.next_attempt_at = now + datetime.timedelta(seconds=delay)
+
+
+def send_batch(emails):
+    """
+    Sends claimed emails over one connection and records the outcome of each.
+
+    Returns:
+        int: Number of emails sent
+    """
+    if not emails:
+        return 0
+    now = timezone.now()
+    sent = 0
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as exc:
+        for email in emails:
+            _record_failure(email, exc, now)
+    else:
+        try:
+            for email in emails:
+                message = EmailMessage(email.subject, email.body, to=[email.to_email], connection=connection)
+                try:
+                    connection.send_messages([message])
+                except Exception as exc:
+                    _record_failure(email, exc, now)
+                else:
+                    email.status = 'SENT'
+                    email.attempts += 1
+                    email.sent_at = timezone.now()
+                    email.last_error = ''
+                    sent += 1
+        finally:
+            connection.close()
+
+    OutboundEmail.objects.bulk_update(
+        emails, ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at']
+    )
+    return sent
+
+
+def send_queued_emails(batch_size=None):
+    """
+    Sends due emails batch by batch until none are left.
+
+    Args:
+        batch_size (int, optional): Emails per connection; defaults to EMAIL_OUTBOX_BATCH_SIZE
+
+    Returns:
+        tuple: (sent, failed) counts for this run
+    """
+    batch_size = batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE
+    sent = failed = 0
+    while True:
+        emails = claim_batch(batch_size)
+        if not emails:
+            return sent, failed
+        batch_sent = send_batch(emails)
+        sent += batch_sent
+        failed += len(emails) - batch_sent
@@ -0,0 +1,192 @@
+import base64
+import datetime
+import json
+import uuid
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+# Below this many rows an exact COUNT(*) is cheap and estimates are unreliable
+ESTIMATE_THRESHOLD = 10_000
+
+
+def estimate_table_rows(model, using='default'):
+    """
+    Returns the database's own estimate of a table's row count.
+
+    Uses planner statistics on PostgreSQL and the highest rowid on SQLite.
+    Neither reads the table, but both can be off, so only use this where an
+    approximate figure is acceptable.
+
+    Returns:
+        int or None: Estimated row count, or None if the backend has no estimate
+    """
+    connection = connections[using]
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+        elif connection.vendor == 'sqlite':
+            cursor.execute(f"SELECT MAX(rowid) FROM {table}")
+        else:
+            return None
+        row = cursor.fetchone()
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+def approximate_count(queryset):
+    """
+    Returns a cheap approximate count for a queryset, if one is available.
+
+    Only unfiltered querysets over large tables have one; callers with
+    better knowledge (such as counters kept in summary tables) should
+    provide their own.
+
+    Returns:
+        int or None: Approximate row count, or None to fall back to COUNT(*)
+    """
+    if queryset.query.where:
+        return None
+    estimate = estimate_table_rows(queryset.model, using=queryset.db)
+    if estimate is None or estimate <= ESTIMATE_THRESHOLD:
+        return None
+    return estimate
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that avoids COUNT(*) over large unfiltered tables.
+
+    The count comes from approximate_count() when there is one, and from
+    an exact count otherwise.
+    """
+
+    @cached_property
+    def count(self):
+        if hasattr(self.object_list, 'query'):
+            estimate = approximate_count(self.object_list)
+            if estimate is not None:
+                return estimate
+        return super().count
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+class KeysetPaginator:
+    """
+    Cursor paginator over (created_at, id), newest first.
+
+    Each page seeks past the last row of the previous one with
+    ``(created_at, id) < (last.created_at, last.id)`` instead of using
+    OFFSET, so every page costs the same however deep it is, and is served
+    by any index that starts with the filter columns followed by
+    created_at (for example Tip's (staff_profile, created_at) index).
+    Cursors are opaque URL-safe strings.
+    """
+
+    def __init__(self, queryset, per_page):
+        self.queryset = queryset
+        self.per_page = per_page
+
+    @staticmethod
+    def encode_cursor(obj):
+        position = [obj.created_at.isoformat(), str(obj.pk)]
+        return base64.urlsafe_b64encode(json.dumps(position).encode()).decode().rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            created_at, pk = json.loads(base64.urlsafe_b64decode(padded))
+            return datetime.datetime.fromisoformat(created_at), uuid.UUID(pk)
+        except (TypeError, ValueError):
+            raise InvalidCursor(f"Invalid cursor: {cursor!r}")
+
+    def page(self, cursor=None):
+        """
+        Returns the page following ``cursor``, or the first page if it is None.
+
+        Raises:
+            InvalidCursor: If the cursor cannot be decoded
+        """
+        queryset = self.queryset.order_by('-created_at', '-pk')
+        if cursor:
+            created_at, pk = self.decode_cursor(cursor)
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk)
+            )
+        rows = list(queryset[:self.per_page + 1])
+        next_cursor = None
+        if len(rows) > self.per_page:
+            rows = rows[:self.per_page]
+            next_cursor = self.encode_cursor(rows[-1])
+        return KeysetPage(rows, next_cursor)
+
+
+class KeysetPagination(BasePagination):
+    """
+    REST framework pagination using KeysetPaginator.
+
+    Responses carry a ``next`` link and an ``approximate_count``. Views can
+    supply the count from their own counters by defining
+    ``get_approximate_count(queryset)``; otherwise approximate_count() is
+    used, and the count is null when no cheap estimate exists.
+    """
+
+    page_size = 50
+    max_page_size = 200
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        paginator = KeysetPaginator(queryset, self.get_page_size(request))
+        try:
+            self.page = paginator.page(request.query_params.get(self.cursor_query_param))
+        except InvalidCursor:
+            raise NotFound("Invalid cursor.")
+        if view is not None and hasattr(view, 'get_approximate_count'):
+            self.approximate_count = view.get_approximate_count(queryset)
+        else:
+            self.approximate_count = approximate_count(queryset)
+        return self.page.object_list
+
+    def get_next_link(self):
+        if not self.page.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.page.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'approximate_count': self.approximate_count,
+            'results': data,
+        })
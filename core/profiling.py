@@ -0,0 +1,196 @@
+"""
+On-demand sampled profiling of requests and management commands.
+
+A profile is a statistical stack profile plus the SQL the profiled code
+ran. While profiling, a background thread samples the profiled thread's
+stack every PROFILING_INTERVAL_MS and counts each distinct stack; every
+database connection of the thread records its queries and timings. The
+result is saved as a ProfileRecord, whose stacks are in the folded
+format (``outer;inner;leaf count`` per line) read by flamegraph.pl and
+speedscope and can be downloaded from the admin.
+
+Requests are profiled by ProfilingMiddleware when they carry the
+PROFILING_HEADER header set to PROFILING_SECRET, or at random at the
+rate of the first PROFILING_URL_RULES pattern their path matches.
+Commands are profiled by running them through ``manage.py profile``.
+With PROFILING_ENABLED off the middleware removes itself at startup, so
+unprofiled requests pay nothing; with it on, an unprofiled request costs
+a header lookup and a few regex matches.
+
+Only the thread handling the request is sampled: work handed to other
+threads, and queries they run, are not seen.
+"""
+import hmac
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+BASE_DIR = str(settings.BASE_DIR) + os.sep
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    filename = code.co_filename
+    if filename.startswith(BASE_DIR):
+        filename = filename[len(BASE_DIR):]
+    else:
+        # Keep the package path of installed code, e.g. django/db/models/query.py
+        filename = filename.rsplit('site-packages' + os.sep, 1)[-1]
+    name = getattr(code, 'co_qualname', code.co_name)
+    return f"{name} ({filename}:{code.co_firstlineno})".replace(';', ':')
+
+
+class StackSampler:
+    """
+    Counts the stacks of one thread, sampled from a background thread.
+    """
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profiling-sampler', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            if labels:
+                self.stacks[';'.join(reversed(labels))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def folded(self):
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class QueryRecorder:
+    """
+    Database execute wrapper recording each query's SQL and duration.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.queries = []
+        self.count = 0
+        self.total = 0.0
+
+    def wrapper(self, alias):
+        def record(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                elapsed = (time.perf_counter() - started) * 1000
+                self.count += 1
+                self.total += elapsed
+                if len(self.queries) < self.limit:
+                    self.queries.append({'alias': alias, 'sql': sql, 'ms': round(elapsed, 3), 'many': many})
+        return record
+
+
+class Profile:
+    def __init__(self):
+        self.sampler = None
+        self.recorder = None
+        self.duration = 0.0
+
+
+@contextmanager
+def profile():
+    """
+    Profiles the block on the current thread.
+
+    Yields a Profile whose sampler and recorder hold the results once the
+    block exits.
+    """
+    result = Profile()
+    result.sampler = StackSampler(threading.get_ident(), settings.PROFILING_INTERVAL_MS / 1000)
+    result.recorder = QueryRecorder(settings.PROFILING_MAX_QUERIES)
+    started = time.perf_counter()
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(result.recorder.wrapper(alias)))
+        result.sampler.start()
+        try:
+            yield result
+        finally:
+            result.sampler.stop()
+            result.duration = (time.perf_counter() - started) * 1000
+
+
+def save_profile(result, kind, name, trigger, status_code=None):
+    """
+    Stores a finished profile as a ProfileRecord.
+    """
+    from .models import ProfileRecord
+    return ProfileRecord.objects.create(
+        kind=kind,
+        name=name[:255],
+        trigger=trigger,
+        status_code=status_code,
+        duration_ms=result.duration,
+        samples=sum(result.sampler.stacks.values()),
+        query_count=result.recorder.count,
+        query_ms=result.recorder.total,
+        queries=result.recorder.queries,
+        stacks=result.sampler.folded(),
+    )
+
+
+class ProfilingMiddleware:
+    """
+    Profiles requests selected by header or URL sampling rules.
+
+    Goes first in MIDDLEWARE so the other middleware is profiled too.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.header = 'HTTP_' + settings.PROFILING_HEADER.upper().replace('-', '_')
+        self.secret = settings.PROFILING_SECRET
+        self.rules = [(re.compile(pattern), rate) for pattern, rate in settings.PROFILING_URL_RULES]
+
+    def get_trigger(self, request):
+        value = request.META.get(self.header)
+        # Header values are latin-1 decoded; compare bytes, as compare_digest
+        # refuses str with non-ASCII characters
+        if value is not None and self.secret and hmac.compare_digest(value.encode('latin-1'), self.secret.encode()):
+            return 'HEADER'
+        path = request.path_info.lstrip('/')
+        for pattern, rate in self.rules:
+            if pattern.search(path):
+                return 'SAMPLED' if random.random() < rate else None
+        return None
+
+    def __call__(self, request):
+        trigger = self.get_trigger(request)
+        if trigger is None:
+            return self.get_response(request)
+        with profile() as result:
+            response = self.get_response(request)
+        record = save_profile(
+            result, 'REQUEST', f"{request.method} {request.get_full_path()}", trigger, response.status_code,
+        )
+        response['X-Profile-Id'] = str(record.pk)
+        return response
@@ -0,0 +1,41 @@
+from django.db import models, router
+
+
+class DisplayQuerySet(models.QuerySet):
+    """
+    QuerySet that can load what ``__str__`` and list views need in one query.
+
+    Subclasses set ``display_related`` to the relations dereferenced by the
+    model's ``__str__`` (and list columns), mapped to the fields read from
+    each. ``with_display()`` joins those relations and loads only those
+    fields from them, while keeping every column of the model itself.
+    """
+
+    display_related = {}
+
+    def with_display(self):
+        fields = [field.name for field in self.model._meta.concrete_fields]
+        fields += [
+            f'{relation}__{name}'
+            for relation, names in self.display_related.items()
+            for name in names
+        ]
+        return self.select_related(*self.display_related).only(*fields)
+
+
+class ShardedQuerySet(models.QuerySet):
+    """
+    QuerySet for models kept on a business's shard (see core.sharding).
+
+    ``create()`` normally picks its database before the object exists;
+    here, unless ``using()`` chose one, the router is asked with the new
+    object, so it lands on its business's shard rather than the current one.
+    """
+
+    def create(self, **kwargs):
+        if self._db is not None:
+            return super().create(**kwargs)
+        obj = self.model(**kwargs)
+        self._for_write = True
+        obj.save(force_insert=True, using=router.db_for_write(self.model, instance=obj))
+        return obj
@@ -0,0 +1,208 @@
+"""
+Request rate limiting for unauthenticated endpoints.
+
+Limits are token buckets: a key may make ``burst`` requests at once and
+then ``rate`` requests per period on average. Two backends are provided:
+
+* ``local`` keeps buckets in process memory. A check is a lock, a dict
+  lookup and some arithmetic (a few microseconds), but each process
+  enforces its own limit, so the effective limit scales with the number
+  of workers.
+* ``cache`` counts requests in the shared cache with a sliding window
+  (the current fixed window plus a weighted share of the previous one),
+  so the limit holds across processes at the cost of two cache round
+  trips per rule.
+
+RATELIMIT_BACKEND selects the backend. The ratelimit() decorator checks
+its rules before the view runs, so a limited request is answered with
+429 without touching the database.
+"""
+import functools
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600}
+
+# Local buckets are swept for idle entries once the table grows past this,
+# at most once per LOCAL_SWEEP_INTERVAL seconds so a large table of live
+# buckets is not rebuilt on every request
+LOCAL_SWEEP_SIZE = 10_000
+LOCAL_SWEEP_INTERVAL = 60
+
+
+def parse_rate(rate):
+    """
+    Parses a rate such as '30/m' into (requests, period_seconds).
+    """
+    count, _, period = rate.partition('/')
+    try:
+        return int(count), PERIODS[period]
+    except (KeyError, ValueError):
+        raise ValueError(f"Invalid rate: {rate!r}")
+
+
+def get_client_ip(request):
+    """
+    Returns the client address, skipping RATELIMIT_TRUSTED_PROXIES proxy hops.
+    """
+    proxies = settings.RATELIMIT_TRUSTED_PROXIES
+    if proxies:
+        forwarded = request.META.get('HTTP_X_FORWARDED_FOR', '')
+        hops = [hop.strip() for hop in forwarded.split(',') if hop.strip()]
+        if len(hops) >= proxies:
+            return hops[-proxies]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def client_ip(request, **kwargs):
+    # Rule key function limiting by client address
+    return get_client_ip(request)
+
+
+class LocalBackend:
+    """
+    In-process token buckets.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._swept_at = time.monotonic()
+
+    def hit(self, key, rate, burst):
+        """
+        Takes a token from a bucket.
+
+        Returns:
+            float: 0 if allowed, otherwise seconds until a token is available
+        """
+        count, period = rate
+        refill = count / period
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * refill)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                if len(self._buckets) > LOCAL_SWEEP_SIZE and now - self._swept_at >= LOCAL_SWEEP_INTERVAL:
+                    self._sweep(now)
+                return 0
+            self._buckets[key] = (tokens, now)
+            return (1 - tokens) / refill
+
+    def _sweep(self, now):
+        # Buckets idle for an hour are full for any practical rate; dropping
+        # them is the same as keeping them
+        self._buckets = {
+            key: bucket for key, bucket in self._buckets.items() if now - bucket[1] < 3600
+        }
+        self._swept_at = now
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class CacheBackend:
+    """
+    Sliding-window counters in the shared cache.
+
+    A burst larger than the rate is not representable with window counts,
+    so the window allows max(count, burst) requests.
+    """
+
+    def hit(self, key, rate, burst):
+        count, period = rate
+        limit = max(count, burst)
+        now = time.time()
+        window = int(now // period)
+        elapsed = (now % period) / period
+        previous_key = f"ratelimit:{key}:{window - 1}"
+        current_key = f"ratelimit:{key}:{window}"
+        counts = cache.get_many([previous_key, current_key])
+        estimate = counts.get(previous_key, 0) * (1 - elapsed) + counts.get(current_key, 0)
+        if estimate >= limit:
+            return max(period * (1 - elapsed), 1)
+        if not cache.add(current_key, 1, timeout=period * 2):
+            try:
+                cache.incr(current_key)
+            except ValueError:
+                cache.set(current_key, 1, timeout=period * 2)
+        return 0
+
+    def reset(self):
+        pass
+
+
+BACKENDS = {
+    'local': LocalBackend,
+    'cache': CacheBackend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = BACKENDS[settings.RATELIMIT_BACKEND]()
+    return _backend
+
+
+class Rule:
+    """
+    A named limit applied to the value returned by ``key(request, **kwargs)``.
+
+    Rules whose key function returns None are skipped for that request.
+    """
+
+    def __init__(self, name, rate, key, burst=None):
+        self.name = name
+        self.rate = parse_rate(rate)
+        self.burst = burst or self.rate[0]
+        self.key = key
+
+    def check(self, request, **kwargs):
+        """
+        Returns 0 if the request is within the limit, else the seconds to wait.
+        """
+        value = self.key(request, **kwargs)
+        if value is None:
+            return 0
+        return get_backend().hit(f"{self.name}:{value}", self.rate, self.burst)
+
+
+def too_many_requests(retry_after):
+    response = HttpResponse("Too many requests.", status=429, content_type='text/plain')
+    response['Retry-After'] = str(math.ceil(retry_after))
+    return response
+
+
+def ratelimit(*rules):
+    """
+    View decorator returning 429 when any of ``rules`` is exceeded.
+
+    Rules are checked in order, before the view runs, and the first one
+    exceeded ends the request; earlier rules have already consumed a token.
+    """
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if settings.RATELIMIT_ENABLED:
+                for rule in rules:
+                    retry_after = rule.check(request, **kwargs)
+                    if retry_after:
+                        return too_many_requests(retry_after)
+            return view(request, *args, **kwargs)
+        return wrapper
+
+    return decorator
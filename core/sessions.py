@@ -0,0 +1,41 @@
+"""
+Sessions that stay out of the way of public pages.
+
+Customers reach the tip pages by scanning a QR code and never log in,
+so those pages have no use for a session. Paths matching SESSIONLESS_URLS
+get an empty session that is never loaded or saved: the request reads
+and writes no session row, the response sets no session cookie and adds
+no ``Vary: Cookie``, and request.user is anonymous even for a visitor
+who is logged in elsewhere on the site.
+"""
+import re
+
+from django.conf import settings
+from django.contrib.sessions.middleware import SessionMiddleware
+
+
+class PublicSessionMiddleware(SessionMiddleware):
+    """
+    SessionMiddleware that skips the session store on SESSIONLESS_URLS.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.sessionless_urls = [re.compile(pattern) for pattern in settings.SESSIONLESS_URLS]
+
+    def is_sessionless(self, request):
+        path = request.path_info.lstrip('/')
+        return any(pattern.search(path) for pattern in self.sessionless_urls)
+
+    def process_request(self, request):
+        if self.is_sessionless(request):
+            request._sessionless = True
+            # No session key, so nothing is read from the store
+            request.session = self.SessionStore()
+        else:
+            super().process_request(request)
+
+    def process_response(self, request, response):
+        if getattr(request, '_sessionless', False):
+            return response
+        return super().process_response(request, response)
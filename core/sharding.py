@@ -0,0 +1,321 @@
+"""
+Tenant sharding of business data across databases.
+
+Each business and everything that belongs to it (locations, staff,
+QR codes, tips, refunds and tip summaries) lives on one of the database
+aliases listed in TIP_SHARDS. Users, webhook events, the email outbox
+and the shard map itself stay on the default database. With a single
+shard (the default configuration) every query goes to that alias and
+nothing else changes.
+
+The shard map is the ShardAssignment table, read through the shared
+cache (which must be shared by every process when there are several
+shards; see core.checks). A new business is assigned a shard when it is first saved; a
+business without an assignment predates sharding and lives on the first
+shard. move_business_shard moves a business between shards.
+
+ShardRouter sends queries for sharded models to the shard of the
+instance involved, if any, and otherwise to the shard selected for the
+current context with use_shard(). ShardMiddleware selects it for each
+request from the view's ``business_id`` argument or the ``business``
+query parameter. Public views taking a QR ``token`` select it with the
+qr_token_shard decorator instead, applied under their rate limits, so
+requests with unknown tokens are limited before any shard is searched. Code working on several businesses (the
+access map, management commands) queries each shard in turn.
+
+Transactions and on-commit callbacks are per database, so code writing
+tenant data uses atomic() and on_commit() from this module, which apply
+to the current shard rather than to the default database.
+"""
+import contextlib
+import contextvars
+import functools
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+
+SHARDED_MODELS = {
+    'businesses.business',
+    'businesses.location',
+    'staff.staffprofile',
+    'staff.staffqrcode',
+    'staff.staffshift',
+    'staff.troncdistribution',
+    'staff.troncshare',
+    'tips.tip',
+    'payments.refund',
+    'analytics.tipsummary',
+    'analytics.hourlytipsummary',
+}
+
+SHARD_MAP_KEY = "shards:business:{business_id}"
+QR_TOKEN_KEY = "shards:qr-token:{token}"
+
+_current_shard = contextvars.ContextVar('current_shard', default=None)
+
+
+def get_shards():
+    return settings.TIP_SHARDS
+
+
+def is_sharded(model):
+    # The database cache routes a stand-in model whose _meta has no label
+    return getattr(model._meta, 'label_lower', None) in SHARDED_MODELS
+
+
+def current_shard():
+    """
+    Returns the shard selected for this context, or the first shard.
+    """
+    return _current_shard.get() or get_shards()[0]
+
+
+@contextlib.contextmanager
+def use_shard(alias):
+    """
+    Routes sharded queries without an instance to ``alias`` within the block.
+    """
+    token = _current_shard.set(alias)
+    try:
+        yield alias
+    finally:
+        _current_shard.reset(token)
+
+
+def atomic(**kwargs):
+    """
+    transaction.atomic() on the current shard.
+    """
+    return transaction.atomic(using=current_shard(), **kwargs)
+
+
+def on_commit(func):
+    """
+    transaction.on_commit() for the current shard's transaction.
+    """
+    transaction.on_commit(func, using=current_shard())
+
+
+def get_assignment(business_id):
+    """
+    Returns (shard, locked) for a business, cached in the shared cache for
+    at most SHARD_MAP_CACHE_SECONDS.
+    """
+    shards = get_shards()
+    if len(shards) == 1:
+        return shards[0], False
+    key = SHARD_MAP_KEY.format(business_id=business_id)
+    assignment = cache.get(key)
+    if assignment is None:
+        from .models import ShardAssignment
+        assignment = (
+            ShardAssignment.objects.filter(business_id=business_id).values_list('shard', 'locked').first()
+            or (shards[0], False)
+        )
+        cache.set(key, assignment, timeout=settings.SHARD_MAP_CACHE_SECONDS)
+    return tuple(assignment)
+
+
+def shard_for_business(business_id):
+    return get_assignment(business_id)[0]
+
+
+def forget_assignment(business_id):
+    cache.delete(SHARD_MAP_KEY.format(business_id=business_id))
+
+
+def assign_shard(business_id):
+    """
+    Assigns a new business to a shard, spreading businesses by id.
+
+    Returns:
+        str: The business's shard
+    """
+    shards = get_shards()
+    if len(shards) == 1:
+        return shards[0]
+    from .models import ShardAssignment
+    business_id = uuid.UUID(str(business_id))
+    assignment, _ = ShardAssignment.objects.get_or_create(
+        business_id=business_id,
+        defaults={'shard': shards[business_id.int % len(shards)]},
+    )
+    forget_assignment(business_id)
+    return assignment.shard
+
+
+def business_for_qr_token(token):
+    """
+    Returns the id of the business a QR token belongs to, or None.
+
+    Tokens are looked up on each shard in turn the first time they are
+    seen, then remembered in the shared cache.
+    """
+    from staff.models import StaffQRCode
+    key = QR_TOKEN_KEY.format(token=token)
+    business_id = cache.get(key)
+    if business_id is None:
+        for alias in get_shards():
+            business_id = (
+                StaffQRCode.objects.using(alias)
+                .filter(token=token)
+                .values_list('staff_profile__business_id', flat=True)
+                .first()
+            )
+            if business_id is not None:
+                cache.set(key, business_id, timeout=None)
+                break
+    return business_id
+
+
+def locate(model, pks, field='pk'):
+    """
+    Groups primary keys (or other unique values) by the shard holding them.
+
+    Returns:
+        dict: Shard alias -> list of values found there
+    """
+    pks = list(pks)
+    shards = get_shards()
+    if len(shards) == 1:
+        return {shards[0]: pks}
+    found = {}
+    for alias in shards:
+        values = list(model.objects.using(alias).filter(**{f'{field}__in': pks}).values_list(field, flat=True))
+        if values:
+            found[alias] = values
+    return found
+
+
+def for_each_shard(func):
+    """
+    Decorator running ``func`` once per shard, returning the list of results.
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        results = []
+        for alias in get_shards():
+            with use_shard(alias):
+                results.append(func(*args, **kwargs))
+        return results
+
+    return wrapper
+
+
+class ShardRouter:
+    """
+    Routes sharded models to their business's shard and the rest to default.
+    """
+
+    def _db_for(self, model, **hints):
+        if not is_sharded(model):
+            return DEFAULT_DB_ALIAS
+        # The instance hint is either the object being saved or an object
+        # related to it; users and other unsharded objects say nothing
+        instance = hints.get('instance')
+        if instance is None or not is_sharded(instance):
+            return current_shard()
+        if isinstance(instance, model) and instance._state.adding:
+            if model._meta.label_lower == 'businesses.business':
+                return assign_shard(instance.pk)
+            business_id = getattr(instance, 'business_id', None)
+            if business_id is not None:
+                return shard_for_business(business_id)
+            # Otherwise follow a parent already loaded, e.g. a tip's staff profile
+            for field in model._meta.concrete_fields:
+                if field.is_relation and is_sharded(field.related_model) and field.is_cached(instance):
+                    parent = field.get_cached_value(instance)
+                    if parent is not None and parent._state.db:
+                        return parent._state.db
+        return instance._state.db or current_shard()
+
+    def db_for_read(self, model, **hints):
+        return self._db_for(model, **hints)
+
+    def db_for_write(self, model, **hints):
+        return self._db_for(model, **hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Users and interned values are referenced across databases by id
+        if not (is_sharded(obj1) and is_sharded(obj2)):
+            return True
+        # An unsaved object's database is only settled when it is saved
+        if obj1._state.adding or obj2._state.adding:
+            return True
+        return obj1._state.db == obj2._state.db
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if model_name is None:
+            return None
+        if f'{app_label}.{model_name}' in SHARDED_MODELS:
+            return db in get_shards()
+        return db == DEFAULT_DB_ALIAS
+
+
+def _route(request, business_id, handler):
+    # Runs handler() on the business's shard; writes to a business that is
+    # being moved are answered with 503
+    shard, locked = get_assignment(business_id)
+    if locked and request.method not in ('GET', 'HEAD', 'OPTIONS'):
+        response = HttpResponse("Temporarily unavailable.", status=503, content_type='text/plain')
+        response['Retry-After'] = '30'
+        return response
+    with use_shard(shard):
+        return handler()
+
+
+def qr_token_shard(view):
+    """
+    View decorator selecting the shard of the business a QR ``token`` belongs to.
+
+    Goes below the view's ratelimit() decorator: finding an unknown token
+    searches every shard.
+    """
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if len(get_shards()) == 1:
+            return view(request, *args, **kwargs)
+        business_id = business_for_qr_token(kwargs['token'])
+        if business_id is None:
+            # The view finds no QR code on the first shard either
+            return view(request, *args, **kwargs)
+        return _route(request, business_id, lambda: view(request, *args, **kwargs))
+
+    return wrapper
+
+
+class ShardMiddleware:
+    """
+    Selects the shard for a request from its business id.
+
+    Writes to a business that is being moved are answered with 503.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def get_business_id(self, request):
+        try:
+            kwargs = resolve(request.path_info).kwargs
+        except Resolver404:
+            return None
+        if 'business_id' in kwargs:
+            return kwargs['business_id']
+        try:
+            return uuid.UUID(request.GET.get('business', ''))
+        except ValueError:
+            return None
+
+    def __call__(self, request):
+        if len(get_shards()) == 1:
+            return self.get_response(request)
+        business_id = self.get_business_id(request)
+        if business_id is None:
+            return self.get_response(request)
+        return _route(request, business_id, lambda: self.get_response(request))
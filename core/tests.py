@@ -1,3 +1,158 @@
-from django.test import TestCase
+import datetime
+import uuid
+from decimal import Decimal
+from io import StringIO
+from unittest import skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase
+from django.utils import timezone
+
+from accounts.models import CustomUser
+from businesses.models import Business, Location
+from staff.models import StaffProfile, StaffQRCode
+from tips.models import Tip
+
+from . import sharding
+from .models import ShardAssignment
+
+
+@skipUnless(len(settings.TIP_SHARDS) > 1, "Needs two shards, e.g. TIP_SHARDS=default,shard1 "
+                                          "SHARD1_DATABASE_URL=sqlite:////tmp/shard1.sqlite3")
+class ShardingTests(TestCase):
+    """
+    Routing and moves between the first two of TIP_SHARDS.
+    """
+
+    databases = {'default', *settings.TIP_SHARDS}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.first, cls.second = settings.TIP_SHARDS[:2]
+        cls.owner = CustomUser.objects.create_user(
+            username='owner', email='owner@example.com', password='pw', role='OWNER',
+        )
+
+    def make_business(self, shard):
+        # Business ids are spread over the shards by id; pick one for ``shard``
+        shards = sharding.get_shards()
+        while True:
+            business_id = uuid.uuid4()
+            if shards[business_id.int % len(shards)] == shard:
+                break
+        business = Business.objects.create(
+            id=business_id, owner=self.owner, name='Cafe', email='cafe@example.com', phone='1',
+        )
+        location = Location.objects.create(
+            business=business, name='High Street', address_line1='1 High Street', city='London',
+            state='London', postal_code='N1',
+        )
+        user = CustomUser.objects.create_user(
+            username=f'staff-{business_id}', email=f'{business_id}@example.com', password='pw',
+        )
+        staff_profile = StaffProfile.objects.create(
+            user=user, business=business, location=location, display_name='Sam',
+        )
+        qr_code = StaffQRCode.objects.create(
+            staff_profile=staff_profile, token=f'token-{business_id}', qr_type='PERSISTENT',
+            valid_from=timezone.now() - datetime.timedelta(days=1),
+        )
+        tip = Tip.objects.create(
+            staff_profile=staff_profile, qr_code=qr_code, location=location, amount=Decimal('5.00'),
+            currency='GBP', payment_intent_id=f'pi_{business_id.hex}', idempotency_key=business_id.hex,
+            ip_address='127.0.0.1',
+        )
+        return business, tip
+
+    def test_create_routes_to_business_shard(self):
+        business, tip = self.make_business(self.second)
+        self.assertEqual(sharding.shard_for_business(business.pk), self.second)
+        for obj in (business, tip):
+            self.assertEqual(obj._state.db, self.second)
+        self.assertTrue(Tip.objects.using(self.second).filter(pk=tip.pk).exists())
+        self.assertFalse(Tip.objects.using(self.first).filter(pk=tip.pk).exists())
+
+    def test_reads_follow_current_shard(self):
+        business, tip = self.make_business(self.second)
+        with sharding.use_shard(self.second):
+            self.assertEqual(Tip.objects.get(pk=tip.pk).staff_profile.business_id, business.pk)
+        with sharding.use_shard(self.first):
+            self.assertFalse(Tip.objects.filter(pk=tip.pk).exists())
+
+    def test_create_ignores_current_shard(self):
+        business, _ = self.make_business(self.second)
+        # create() picks the business's shard, not the one selected here
+        with sharding.use_shard(self.first):
+            location = Location.objects.create(
+                business=business, name='Station', address_line1='2 Station Road', city='London',
+                state='London', postal_code='N2',
+            )
+        self.assertEqual(location._state.db, self.second)
+        self.assertTrue(Location.objects.using(self.second).filter(pk=location.pk).exists())
+
+    def test_middleware_selects_shard(self):
+        business, _ = self.make_business(self.second)
+        seen = []
+
+        def view(request):
+            seen.append(sharding.current_shard())
+            return HttpResponse()
+
+        middleware = sharding.ShardMiddleware(view)
+        response = middleware(RequestFactory().get(f'/api/businesses/{business.pk}/dashboard/'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(seen, [self.second])
+
+    def test_middleware_refuses_writes_while_locked(self):
+        business, _ = self.make_business(self.second)
+        ShardAssignment.objects.filter(business_id=business.pk).update(locked=True)
+        sharding.forget_assignment(business.pk)
+        middleware = sharding.ShardMiddleware(lambda request: HttpResponse())
+        path = f'/api/businesses/{business.pk}/dashboard/'
+        self.assertEqual(middleware(RequestFactory().post(path)).status_code, 503)
+        self.assertEqual(middleware(RequestFactory().get(path)).status_code, 200)
+
+    def test_qr_token_shard(self):
+        business, tip = self.make_business(self.second)
+        seen = []
+
+        @sharding.qr_token_shard
+        def view(request, token):
+            seen.append(sharding.current_shard())
+            return HttpResponse()
+
+        self.assertEqual(view(RequestFactory().get('/'), token=f'token-{business.pk}').status_code, 200)
+        self.assertEqual(seen, [self.second])
+
+    def test_middleware_leaves_qr_tokens_to_the_view(self):
+        # Tokens are resolved under the view's rate limits, not here
+        business, _ = self.make_business(self.second)
+        seen = []
+
+        def view(request):
+            seen.append(sharding.current_shard())
+            return HttpResponse()
+
+        middleware = sharding.ShardMiddleware(view)
+        middleware(RequestFactory().get(f'/tips/t/token-{business.pk}/'))
+        self.assertEqual(seen, [self.first])
+
+    def test_move_business_shard(self):
+        business, tip = self.make_business(self.first)
+        call_command(
+            'move_business_shard', str(business.pk), self.second,
+            drain_seconds=0, keep_source_seconds=0, stdout=StringIO(),
+        )
+        self.assertEqual(sharding.get_assignment(business.pk), (self.second, False))
+        self.assertTrue(Tip.objects.using(self.second).filter(pk=tip.pk).exists())
+        self.assertFalse(Tip.objects.using(self.first).filter(pk=tip.pk).exists())
+        self.assertFalse(Business.objects.using(self.first).filter(pk=business.pk).exists())
+        with sharding.use_shard(sharding.shard_for_business(business.pk)):
+            self.assertEqual(Tip.objects.get(pk=tip.pk).amount, Decimal('5.00'))
+
+    def test_move_to_same_shard_fails(self):
+        business, _ = self.make_business(self.first)
+        with self.assertRaisesMessage(CommandError, "already on"):
+            call_command('move_business_shard', str(business.pk), self.first, drain_seconds=0)
@@ -1,3 +1,59 @@
 from django.contrib import admin
 
-# Register your models here.
+from core.pagination import EstimatedCountPaginator
+
+from .models import ArchivedStripeEvent, Refund, StripeWebhookEvent
+
+
+@admin.register(StripeWebhookEvent)
+class StripeWebhookEventAdmin(admin.ModelAdmin):
+    list_display = (
+        "stripe_event_id",
+        "event_type",
+        "processed",
+        "processed_at",
+        "created_at",
+    )
+    list_filter = (
+        "processed",
+        "event_type",
+    )
+    search_fields = ("stripe_event_id",)
+    ordering = ("-created_at",)
+    readonly_fields = ("created_at", "processed_at")
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+@admin.register(ArchivedStripeEvent)
+class ArchivedStripeEventAdmin(admin.ModelAdmin):
+    search_fields = ("stripe_event_id",)
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+@admin.register(Refund)
+class RefundAdmin(admin.ModelAdmin):
+    list_display = (
+        "tip",
+        "amount",
+        "currency",
+        "reason",
+        "status",
+        "created_at",
+        "completed_at",
+    )
+    list_filter = (
+        "status",
+        "reason",
+    )
+    list_select_related = ("tip__staff_profile",)
+    search_fields = ("stripe_refund_id",)
+    ordering = ("-created_at",)
+    raw_id_fields = ("tip", "initiated_by")
+    readonly_fields = ("created_at", "completed_at")
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
@@ -0,0 +1,127 @@
+"""
+Retention for StripeWebhookEvent payloads.
+
+Processed events older than the retention window are moved out of the
+hot table into compressed JSON Lines files under WEBHOOK_ARCHIVE_DIR,
+one file per month of archiving (``stripe-events-2024-05.jsonl.gz``).
+Only their stripe_event_id is kept, in ArchivedStripeEvent, so Stripe
+redeliveries of archived events are still recognised.
+
+Files are append-only. Each batch is compressed into its own gzip member
+(or zstd frame) and appended, fsynced, and only then deleted from the
+table, so a file always holds every event deleted so far and is
+readable with ``zcat``/``zstdcat`` or read_archive() even if a run dies
+part way. An interrupted batch may be written again by the next run;
+read_archive() callers should expect the odd duplicate line.
+
+Compression is gzip, or zstd with the optional ``zstandard`` package.
+"""
+import gzip
+import io
+import json
+import os
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ArchivedStripeEvent, StripeWebhookEvent
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+EXTENSIONS = {
+    'gzip': '.gz',
+    'zstd': '.zst',
+}
+
+
+def _compress(data, compression):
+    if compression == 'zstd':
+        if zstandard is None:
+            raise ImproperlyConfigured("zstd compression requires the zstandard package")
+        return zstandard.ZstdCompressor().compress(data)
+    return gzip.compress(data)
+
+
+def archive_path(compression, now=None):
+    """
+    Returns the archive file this month's events are appended to.
+    """
+    now = now or timezone.now()
+    name = f"stripe-events-{now:%Y-%m}.jsonl{EXTENSIONS[compression]}"
+    return os.path.join(settings.WEBHOOK_ARCHIVE_DIR, name)
+
+
+def _line(event):
+    return json.dumps({
+        'id': event.id,
+        'stripe_event_id': event.stripe_event_id,
+        'event_type': event.event_type,
+        'created_at': event.created_at,
+        'processed_at': event.processed_at,
+        'payload': event.payload,
+    }, cls=DjangoJSONEncoder, separators=(',', ':')) + '\n'
+
+
+def archive_events(cutoff, batch_size=1000, compression='gzip'):
+    """
+    Moves processed events created before ``cutoff`` into the archive.
+
+    Unprocessed events stay in the table however old they are.
+
+    Args:
+        cutoff (datetime): Archive events created before this
+        batch_size (int): Events written and deleted per batch
+        compression (str): 'gzip' or 'zstd'
+
+    Returns:
+        tuple: (number of events archived, archive file path)
+    """
+    if compression not in EXTENSIONS:
+        raise ValueError(f"Unknown compression {compression}")
+    path = archive_path(compression)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    archived = 0
+    with open(path, 'ab') as archive:
+        while True:
+            events = list(
+                StripeWebhookEvent.objects
+                .filter(processed=True, created_at__lt=cutoff)
+                .order_by('created_at')[:batch_size]
+            )
+            if not events:
+                break
+            archive.write(_compress(''.join(map(_line, events)).encode(), compression))
+            archive.flush()
+            os.fsync(archive.fileno())
+            with transaction.atomic():
+                ArchivedStripeEvent.objects.bulk_create(
+                    [ArchivedStripeEvent(stripe_event_id=event.stripe_event_id) for event in events],
+                    ignore_conflicts=True,
+                )
+                StripeWebhookEvent.objects.filter(pk__in=[event.pk for event in events]).delete()
+            archived += len(events)
+    return archived, path
+
+
+def read_archive(path):
+    """
+    Yields the archived events in a file as dicts.
+    """
+    if path.endswith(EXTENSIONS['zstd']):
+        if zstandard is None:
+            raise ImproperlyConfigured("Reading zstd archives requires the zstandard package")
+        raw = open(path, 'rb')
+        # One frame per batch
+        stream = zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True, closefd=True)
+        lines = io.TextIOWrapper(stream, encoding='utf-8')
+    else:
+        lines = gzip.open(path, 'rt', encoding='utf-8')
+    with lines:
+        for line in lines:
+            yield json.loads(line)
@@ -0,0 +1,135 @@
+"""
+Minimal Stripe API client for the calls the tipping flow makes.
+
+Requests are form-encoded and authenticated with STRIPE_SECRET_KEY.
+STRIPE_API_BASE can point the client at a stub server for local
+development and load testing.
+"""
+import json
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from django.conf import settings
+
+
+class StripeError(Exception):
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+def _encode(params, prefix=None):
+    # Flattens nested dicts into Stripe's bracketed form keys, e.g. metadata[tip_id]
+    items = []
+    for key, value in params.items():
+        name = f"{prefix}[{key}]" if prefix else key
+        if isinstance(value, dict):
+            items.extend(_encode(value, name))
+        elif isinstance(value, bool):
+            items.append((name, 'true' if value else 'false'))
+        elif value is not None:
+            items.append((name, str(value)))
+    return items
+
+
+def request(method, path, params=None, idempotency_key=None):
+    """
+    Calls the Stripe API and returns the decoded JSON response.
+
+    Raises:
+        StripeError: If Stripe cannot be reached or returns an error
+    """
+    data = urllib.parse.urlencode(_encode(params or {})).encode() if params else None
+    req = urllib.request.Request(
+        settings.STRIPE_API_BASE.rstrip('/') + path, data=data, method=method,
+    )
+    req.add_header('Authorization', f"Bearer {settings.STRIPE_SECRET_KEY}")
+    if idempotency_key:
+        req.add_header('Idempotency-Key', idempotency_key)
+    try:
+        with urllib.request.urlopen(req, timeout=settings.STRIPE_TIMEOUT_SECONDS) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        try:
+            message = json.loads(e.read())['error']['message']
+        except (ValueError, KeyError, TypeError):
+            message = e.reason
+        raise StripeError(message, status=e.code)
+    except (urllib.error.URLError, TimeoutError) as e:
+        raise StripeError(f"Could not reach Stripe: {e}")
+
+
+def create_payment_intent(amount, currency, idempotency_key, metadata=None, destination=None, capture=True):
+    """
+    Creates a PaymentIntent for a tip.
+
+    Args:
+        amount (int): Amount in the currency's minor unit (pence)
+        currency (str): ISO currency code
+        idempotency_key (str): Retries with the same key return the same intent
+        metadata (dict, optional): Metadata stored on the intent
+        destination (str, optional): Connected account that receives the funds
+        capture (bool): False only authorises the payment until it is captured
+
+    Returns:
+        dict: The PaymentIntent, including ``id`` and ``client_secret``
+    """
+    params = {
+        'amount': amount,
+        'currency': currency.lower(),
+        'automatic_payment_methods': {'enabled': True},
+        'metadata': metadata or {},
+    }
+    if destination:
+        params['transfer_data'] = {'destination': destination}
+    if not capture:
+        params['capture_method'] = 'manual'
+    return request('POST', '/v1/payment_intents', params, idempotency_key=idempotency_key)
+
+
+def capture_payment_intent(payment_intent_id):
+    """
+    Captures an authorised PaymentIntent created with capture=False.
+    """
+    return request('POST', f'/v1/payment_intents/{payment_intent_id}/capture', idempotency_key=f'capture-{payment_intent_id}')
+
+
+def cancel_payment_intent(payment_intent_id):
+    """
+    Cancels a PaymentIntent, releasing any authorised funds.
+    """
+    return request('POST', f'/v1/payment_intents/{payment_intent_id}/cancel', idempotency_key=f'cancel-{payment_intent_id}')
+
+
+def create_refund(payment_intent_id, idempotency_key, reason=None, metadata=None, reverse_transfer=False):
+    """
+    Refunds a PaymentIntent in full.
+
+    Args:
+        payment_intent_id (str): Intent to refund
+        idempotency_key (str): Retries with the same key return the same refund
+        reason (str, optional): One of Stripe's refund reasons
+        metadata (dict, optional): Metadata stored on the refund
+        reverse_transfer (bool): Take the funds back from the connected account
+
+    Returns:
+        dict: The Refund, including ``id`` and ``status``
+    """
+    params = {
+        'payment_intent': payment_intent_id,
+        'reason': reason,
+        'metadata': metadata or {},
+        'reverse_transfer': reverse_transfer or None,
+    }
+    return request('POST', '/v1/refunds', params, idempotency_key=idempotency_key)
+
+
+def retrieve_refund(refund_id):
+    """
+    Fetches a Refund, to settle one that was still pending when created.
+
+    Returns:
+        dict: The Refund, including ``id`` and ``status``
+    """
+    return request('GET', f'/v1/refunds/{refund_id}')
@@ -0,0 +1,36 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from payments.archive import EXTENSIONS, archive_events
+
+
+class Command(BaseCommand):
+    help = "Moves processed Stripe webhook events past the retention window into compressed archive files."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retention-days',
+            type=int,
+            default=settings.WEBHOOK_RETENTION_DAYS,
+            help="Keep events in the table for this many days (default: %(default)s)",
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help="Events archived per batch (default: %(default)s)",
+        )
+        parser.add_argument(
+            '--compression',
+            choices=sorted(EXTENSIONS),
+            default=settings.WEBHOOK_ARCHIVE_COMPRESSION,
+            help="Archive file compression (default: %(default)s)",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - datetime.timedelta(days=options['retention_days'])
+        archived, path = archive_events(cutoff, options['batch_size'], options['compression'])
+        self.stdout.write(f"Archived {archived} webhook events from before {cutoff:%Y-%m-%d} to {path}.")
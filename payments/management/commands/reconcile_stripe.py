@@ -0,0 +1,100 @@
+import csv
+import datetime
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from payments.reconcile import ReconciliationError, correct, open_export, reconcile, stream_tips
+
+
+def parse_date(value):
+    date = datetime.date.fromisoformat(value)
+    return timezone.make_aware(datetime.datetime.combine(date, datetime.time.min))
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconciles a Stripe PaymentIntent export, sorted by id, against the tips table "
+        "and reports missing, mismatched and orphaned records."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'export',
+            help="JSON Lines of PaymentIntents, or CSV with id, amount, currency and status columns (.gz allowed)",
+        )
+        parser.add_argument('--csv', action='store_true', help="Read the export as CSV whatever its extension")
+        parser.add_argument(
+            '--since',
+            type=parse_date,
+            help="Only compare tips created on or after this day (YYYY-MM-DD), to match the export",
+        )
+        parser.add_argument(
+            '--until',
+            type=parse_date,
+            help="Only compare tips created before this day (YYYY-MM-DD)",
+        )
+        parser.add_argument('--output', help="Write every discrepancy to this CSV file")
+        parser.add_argument(
+            '--show',
+            type=int,
+            default=20,
+            help="Discrepancies printed here (default: %(default)s)",
+        )
+        parser.add_argument(
+            '--correct',
+            action='store_true',
+            help="Record and process the missed webhook event for PENDING tips whose intent "
+                 "succeeded or was canceled",
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10000,
+            help="Tips read per query (default: %(default)s)",
+        )
+
+    def handle(self, *args, **options):
+        counts = Counter()
+        corrected = failed = 0
+        output = open(options['output'], 'w', newline='', encoding='utf-8') if options['output'] else None
+        try:
+            writer = csv.writer(output) if output else None
+            if writer:
+                writer.writerow(['kind', 'payment_intent_id', 'tip_id', 'detail'])
+            rows = reconcile(
+                open_export(options['export'], csv_format=True if options['csv'] else None),
+                stream_tips(options['since'], options['until'], options['batch_size']),
+            )
+            for kind, payment_intent_id, intent, tip, detail in rows:
+                counts[kind] += 1
+                if kind == 'matched':
+                    continue
+                tip_id = tip[1] if tip else ''
+                if writer:
+                    writer.writerow([kind, payment_intent_id, tip_id, detail])
+                if sum(counts.values()) - counts['matched'] <= options['show']:
+                    self.stdout.write(f"  {kind:9} {payment_intent_id} {tip_id} {detail}")
+                if kind == 'status' and options['correct']:
+                    result = correct(intent, tip)
+                    if result is not None:
+                        success, message = result
+                        corrected += success
+                        failed += not success
+                        if not success:
+                            self.stderr.write(f"  could not correct {payment_intent_id}: {message}")
+        except (OSError, ReconciliationError) as e:
+            raise CommandError(e)
+        finally:
+            if output:
+                output.close()
+
+        discrepancies = sum(counts.values()) - counts['matched']
+        self.stdout.write(
+            f"{counts['matched']} matched, {discrepancies} discrepancies: "
+            f"{counts['missing']} missing tips, {counts['orphaned']} orphaned tips, "
+            f"{counts['amount']} amount, {counts['currency']} currency and {counts['status']} status mismatches."
+        )
+        if options['correct']:
+            self.stdout.write(f"Corrected {corrected} tips through webhook events; {failed} failed.")
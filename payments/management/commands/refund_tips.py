@@ -0,0 +1,84 @@
+import datetime
+import uuid
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from businesses.models import Location
+from core import sharding
+from payments.models import Refund
+from payments.refunds import check_refund_eligibility, refund_tips, settle_pending_refunds
+from tips.models import Tip
+
+
+class Command(BaseCommand):
+    help = "Refunds tips in bulk, by id or for a whole location or business."
+
+    def add_arguments(self, parser):
+        target = parser.add_mutually_exclusive_group(required=True)
+        target.add_argument('--tip', action='append', dest='tips', help="Tip id (repeatable)")
+        target.add_argument('--location', help="Refund every eligible tip taken at this location")
+        target.add_argument('--business', help="Refund every eligible tip for this business")
+        target.add_argument(
+            '--settle-pending',
+            action='store_true',
+            help="Settle PENDING refunds from Stripe instead of refunding tips",
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=1,
+            help="With --location or --business, only tips from the last N days (default: %(default)s)",
+        )
+        parser.add_argument(
+            '--reason',
+            choices=[choice for choice, _ in Refund.REASON_CHOICES],
+            default='BUSINESS_INITIATED',
+        )
+        parser.add_argument('--workers', type=int, help="Concurrent Stripe calls")
+        parser.add_argument('--dry-run', action='store_true', help="Only report which tips are eligible")
+
+    def handle(self, *args, **options):
+        if options['settle_pending']:
+            refunds = settle_pending_refunds(max_workers=options['workers'])
+            self.stdout.write(self._summary(refunds, "Settled"))
+            return
+        try:
+            if options['tips']:
+                tip_ids = [uuid.UUID(tip_id) for tip_id in options['tips']]
+            else:
+                since = timezone.now() - datetime.timedelta(days=options['days'])
+                if options['location']:
+                    location_id = uuid.UUID(options['location'])
+                    shard = next(iter(sharding.locate(Location, [location_id])), sharding.current_shard())
+                    filters = {'location_id': location_id}
+                else:
+                    business_id = uuid.UUID(options['business'])
+                    shard = sharding.shard_for_business(business_id)
+                    filters = {'staff_profile__business_id': business_id}
+                tip_ids = list(
+                    Tip.objects.using(shard)
+                    .filter(payment_status='SUCCEEDED', succeeded_at__gte=since, **filters)
+                    .values_list('pk', flat=True)
+                )
+        except ValueError as e:
+            raise CommandError(f"Invalid id: {e}")
+
+        if options['dry_run']:
+            eligibility = check_refund_eligibility(tip_ids)
+            eligible = sum(1 for can_refund, _ in eligibility.values() if can_refund)
+            self.stdout.write(f"{eligible} of {len(eligibility)} tips are eligible for a refund.")
+            return
+
+        refunds, skipped = refund_tips(tip_ids, options['reason'], max_workers=options['workers'])
+        self.stdout.write(self._summary(refunds, "Refunded") + f", {len(skipped)} skipped.")
+        for tip_id, reason in skipped.items():
+            self.stdout.write(f"  skipped {tip_id}: {reason}")
+
+    def _summary(self, refunds, verb):
+        statuses = Counter(refund.status for refund in refunds)
+        return (
+            f"{verb} {statuses['SUCCEEDED']} tips; {statuses['PENDING']} pending, "
+            f"{statuses['FAILED']} failed"
+        )
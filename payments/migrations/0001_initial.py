@@ -0,0 +1,50 @@
+# Generated by Django 5.2.9 on 2026-10-19 17:26
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="StripeWebhookEvent",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("stripe_event_id", models.CharField(max_length=255, unique=True)),
+                ("event_type", models.CharField(db_index=True, max_length=100)),
+                ("payload", models.JSONField()),
+                ("processed", models.BooleanField(db_index=True, default=False)),
+                ("processed_at", models.DateTimeField(blank=True, null=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "verbose_name": "Stripe Webhook Event",
+                "verbose_name_plural": "Stripe Webhook Events",
+                "indexes": [
+                    models.Index(
+                        fields=["stripe_event_id"],
+                        name="payments_st_stripe__a444ea_idx",
+                    ),
+                    models.Index(
+                        fields=["event_type"], name="payments_st_event_t_802e5e_idx"
+                    ),
+                    models.Index(
+                        fields=["processed"], name="payments_st_process_0ea60a_idx"
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.9 on 2026-10-19 17:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payments", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="stripewebhookevent",
+            index=models.Index(
+                fields=["created_at"], name="payments_st_created_3ef7e8_idx"
+            ),
+        ),
+    ]
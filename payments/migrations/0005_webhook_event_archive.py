@@ -0,0 +1,43 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payments", "0004_cross_shard_user_fks"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchivedStripeEvent",
+            fields=[
+                (
+                    "stripe_event_id",
+                    models.CharField(max_length=255, primary_key=True, serialize=False),
+                ),
+            ],
+            options={
+                "verbose_name": "Archived Stripe Event",
+                "verbose_name_plural": "Archived Stripe Events",
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name="stripewebhookevent",
+            name="payments_st_process_0ea60a_idx",
+        ),
+        migrations.AlterField(
+            model_name="stripewebhookevent",
+            name="processed",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name="stripewebhookevent",
+            index=models.Index(
+                condition=models.Q(("processed", False)),
+                fields=["created_at"],
+                name="webhook_event_unprocessed_idx",
+            ),
+        ),
+    ]
@@ -1,6 +1,14 @@
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
+import logging
 import uuid
 
+from core import sharding
+from core.querysets import ShardedQuerySet
+from tips.models import Tip
+
+logger = logging.getLogger(__name__)
+
 
 class StripeWebhookEvent(models.Model):
     """
@@ -12,7 +20,7 @@ class StripeWebhookEvent(models.Model):
     stripe_event_id = models.CharField(max_length=255, unique=True)
     event_type = models.CharField(max_length=100, db_index=True)
     payload = models.JSONField()
-    processed = models.BooleanField(default=False, db_index=True)
+    processed = models.BooleanField(default=False)
     processed_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
@@ -22,9 +30,25 @@ class StripeWebhookEvent(models.Model):
         indexes = [
             models.Index(fields=['stripe_event_id']),
             models.Index(fields=['event_type']),
-            models.Index(fields=['processed']),
+            models.Index(fields=['created_at']),
+            # Processed events are the bulk of the table until archived;
+            # only the few unprocessed ones are indexed
+            models.Index(
+                fields=['created_at'],
+                condition=models.Q(processed=False),
+                name='webhook_event_unprocessed_idx',
+            ),
         ]
     
+    # Maps handled event types to the Tip transition they trigger
+    TIP_TRANSITIONS = {
+        'payment_intent.succeeded': 'mark_as_succeeded',
+        'payment_intent.payment_failed': 'mark_as_failed',
+        'payment_intent.canceled': 'mark_as_failed',
+    }
+    # Events carrying a Refund whose status may have changed
+    REFUND_EVENTS = {'refund.updated', 'charge.refund.updated', 'refund.failed'}
+    
     def __str__(self):
         return f"{self.event_type} - {self.stripe_event_id}"
     
@@ -44,7 +68,68 @@ class StripeWebhookEvent(models.Model):
                    Returns (True, "Success message") if processed successfully,
                    (False, "Error message") if processing fails
         """
-        pass
+        if self.processed:
+            return True, f"Event {self.stripe_event_id} already processed"
+        
+        if self.event_type in self.REFUND_EVENTS:
+            return self.process_refund()
+        
+        transition = self.TIP_TRANSITIONS.get(self.event_type)
+        if transition is None:
+            self.mark_as_processed()
+            return True, f"Ignored event type {self.event_type}"
+        
+        intent = self.payload.get('data', {}).get('object', {})
+        payment_intent_id = intent.get('id')
+        shard, locked = self.get_tip_shard(intent)
+        if locked:
+            # Stripe retries the event once the move has finished
+            return False, f"Business for payment intent {payment_intent_id} is being moved"
+        try:
+            tip = Tip.objects.using(shard).select_related('staff_profile').get(payment_intent_id=payment_intent_id)
+        except Tip.DoesNotExist:
+            # Not a tip payment (tips are saved before their intent can be
+            # confirmed); retrying would never find one
+            logger.warning("No tip for payment intent %s (event %s)", payment_intent_id, self.stripe_event_id)
+            self.mark_as_processed()
+            return True, f"Ignored payment intent {payment_intent_id} with no tip"
+        
+        # The event is on the default database and the tip on its shard; the
+        # tip commits first, and replaying the event cannot apply it twice
+        with transaction.atomic():
+            with transaction.atomic(using=shard):
+                changed = getattr(tip, transition)()
+            self.mark_as_processed()
+        if not changed:
+            return True, f"Tip {tip.pk} already {tip.payment_status}"
+        return True, f"Tip {tip.pk} marked {tip.payment_status}"
+    
+    def process_refund(self):
+        """
+        Settles the pending refund the event's Refund object belongs to.
+        """
+        from .refunds import settle_refund
+        result = self.payload.get('data', {}).get('object', {})
+        refund = settle_refund(result)
+        self.mark_as_processed()
+        if refund is None:
+            return True, f"Ignored refund {result.get('id')} not made here"
+        return True, f"Refund {refund.pk} is {refund.status}"
+    
+    @staticmethod
+    def get_tip_shard(intent):
+        """
+        Returns (shard, locked) for the tip a PaymentIntent pays for.
+
+        Intents created for tips carry the business id in their metadata;
+        older ones are looked up on each shard. ``locked`` is True while the
+        business is being moved between shards.
+        """
+        business_id = intent.get('metadata', {}).get('business_id')
+        if business_id:
+            return sharding.get_assignment(business_id)
+        found = sharding.locate(Tip, [intent.get('id')], field='payment_intent_id')
+        return next(iter(found), sharding.get_shards()[0]), False
     
     def mark_as_processed(self):
         """
@@ -57,4 +142,82 @@ class StripeWebhookEvent(models.Model):
         Returns:
             None
         """
-        pass
\ No newline at end of file
+        self.processed = True
+        self.processed_at = timezone.now()
+        self.save(update_fields=['processed', 'processed_at'])
+
+
+class ArchivedStripeEvent(models.Model):
+    """
+    A webhook event moved to the archive files (see payments.archive).
+
+    Only the Stripe event id is kept, so redeliveries are still ignored.
+    """
+    stripe_event_id = models.CharField(max_length=255, primary_key=True)
+
+    class Meta:
+        verbose_name = 'Archived Stripe Event'
+        verbose_name_plural = 'Archived Stripe Events'
+
+    def __str__(self):
+        return self.stripe_event_id
+
+class Refund(models.Model):
+    """
+    A full refund of a tip through Stripe
+    """
+
+    REASON_CHOICES = [
+        ('REQUESTED_BY_CUSTOMER', 'Requested by customer'),
+        ('DUPLICATE', 'Duplicate'),
+        ('FRAUDULENT', 'Fraudulent'),
+        ('BUSINESS_INITIATED', 'Business initiated'),
+    ]
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('SUCCEEDED', 'Succeeded'),
+        ('FAILED', 'Failed'),
+    ]
+
+    # Fields
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    tip = models.ForeignKey('tips.Tip', on_delete=models.PROTECT, related_name='refunds')
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    currency = models.CharField(max_length=3)
+    reason = models.CharField(max_length=30, choices=REASON_CHOICES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
+    stripe_refund_id = models.CharField(max_length=255, unique=True, null=True, blank=True)
+    failure_reason = models.TextField(blank=True)
+    initiated_by = models.ForeignKey(
+        'accounts.CustomUser', on_delete=models.SET_NULL, null=True, blank=True, related_name='+',
+        db_constraint=False,
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    objects = ShardedQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Refund'
+        verbose_name_plural = 'Refunds'
+        constraints = [
+            # A tip can have any number of failed attempts but only one live refund
+            models.UniqueConstraint(
+                fields=['tip'],
+                condition=models.Q(status__in=['PENDING', 'SUCCEEDED']),
+                name='unique_active_refund_per_tip',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    # Stripe accepts only these reasons; others are recorded here only
+    STRIPE_REASONS = {
+        'REQUESTED_BY_CUSTOMER': 'requested_by_customer',
+        'DUPLICATE': 'duplicate',
+        'FRAUDULENT': 'fraudulent',
+    }
+
+    def __str__(self):
+        return f"Refund of {self.currency} {self.amount} ({self.status})"
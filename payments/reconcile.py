@@ -0,0 +1,236 @@
+"""
+Reconciliation of Stripe PaymentIntents against Tip rows.
+
+A Stripe export and the tips table, both ordered by payment intent id,
+are read in step as a merge join, so memory stays constant however many
+rows there are: the export is read line by line, and tips are read in
+keyset-paginated batches from each shard, merged into one stream.
+
+The export is JSON Lines of PaymentIntent objects as the API returns
+them, or CSV with id, amount (in the minor unit, as in the API),
+currency and status columns; either may be gzipped. It must be sorted by
+id in plain byte order (``LC_ALL=C sort``), the order SQLite and C
+collation databases return; both streams are checked as they are read
+and an out-of-order row stops the run.
+
+Each intent and tip pair is classified as:
+
+* ``missing``: an intent with no tip;
+* ``orphaned``: a tip with no intent in the export (limit the tips
+  compared to the export's period with ``since``/``until``);
+* ``amount``, ``currency`` or ``status``: a tip that disagrees with its
+  intent.
+
+Tips left PENDING for an intent that has since succeeded or been
+canceled can be corrected by recording the webhook event Stripe should
+have delivered and processing it like the webhook view does.
+"""
+import csv
+import gzip
+import heapq
+import json
+
+from core import sharding
+from tips.models import Tip
+
+from .models import StripeWebhookEvent
+
+# Tip statuses consistent with each PaymentIntent status; a refunded tip's
+# intent stays succeeded, a declined one waits for another payment method
+EXPECTED_STATUSES = {
+    'succeeded': {'SUCCEEDED', 'REFUNDED'},
+    'canceled': {'FAILED'},
+    'requires_payment_method': {'PENDING', 'FAILED'},
+    'requires_confirmation': {'PENDING'},
+    'requires_action': {'PENDING'},
+    'processing': {'PENDING'},
+    'requires_capture': {'PENDING'},
+}
+
+# Events that bring a PENDING tip up to date with its intent
+CORRECTIVE_EVENTS = {
+    'succeeded': 'payment_intent.succeeded',
+    'canceled': 'payment_intent.canceled',
+}
+
+
+class ReconciliationError(Exception):
+    pass
+
+
+def _open(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, encoding='utf-8', newline='')
+
+
+def read_export(file, csv_format=False):
+    """
+    Yields the PaymentIntents in an export as dicts.
+
+    Args:
+        file: Text file of JSON Lines, or of CSV when csv_format is True
+        csv_format (bool): Read CSV instead of JSON Lines
+
+    Raises:
+        ReconciliationError: If a row is malformed
+    """
+    if csv_format:
+        reader = csv.DictReader(file)
+        fields = {name.strip().lower(): name for name in reader.fieldnames or ()}
+        missing = {'id', 'amount', 'currency', 'status'} - set(fields)
+        if missing:
+            raise ReconciliationError(f"CSV is missing columns: {', '.join(sorted(missing))}")
+        for line, row in enumerate(reader, start=2):
+            try:
+                amount = int(row[fields['amount']])
+            except ValueError:
+                raise ReconciliationError(f"Line {line}: invalid amount {row[fields['amount']]!r}")
+            yield {
+                'id': row[fields['id']].strip(),
+                'amount': amount,
+                'currency': row[fields['currency']].strip(),
+                'status': row[fields['status']].strip(),
+            }
+        return
+    for line, text in enumerate(file, start=1):
+        if not text.strip():
+            continue
+        try:
+            intent = json.loads(text)
+            intent['id'], intent['amount'], intent['currency'], intent['status']
+        except (ValueError, KeyError, TypeError):
+            raise ReconciliationError(f"Line {line}: not a PaymentIntent object")
+        yield intent
+
+
+def _ascending(rows, key, source):
+    previous = None
+    for row in rows:
+        value = key(row)
+        if previous is not None and value <= previous:
+            raise ReconciliationError(
+                f"{source} is not sorted by payment intent id in byte order: {value!r} after {previous!r}"
+            )
+        previous = value
+        yield row
+
+
+def _shard_tips(shard, since, until, batch_size):
+    tips = Tip.objects.using(shard).order_by('payment_intent_id')
+    if since is not None:
+        tips = tips.filter(created_at__gte=since)
+    if until is not None:
+        tips = tips.filter(created_at__lt=until)
+    tips = tips.values_list('payment_intent_id', 'pk', 'amount', 'currency', 'payment_status')
+    last = None
+    while True:
+        batch = list((tips.filter(payment_intent_id__gt=last) if last is not None else tips)[:batch_size])
+        yield from batch
+        if len(batch) < batch_size:
+            return
+        last = batch[-1][0]
+
+
+def stream_tips(since=None, until=None, batch_size=10000):
+    """
+    Yields (payment_intent_id, pk, amount, currency, payment_status) for
+    every tip on every shard, in payment intent id order.
+    """
+    return heapq.merge(
+        *(_shard_tips(shard, since, until, batch_size) for shard in sharding.get_shards()),
+        key=lambda tip: tip[0],
+    )
+
+
+def compare(intent, tip):
+    """
+    Returns the ways a tip disagrees with its PaymentIntent.
+
+    Returns:
+        list: (kind, detail) tuples; empty if they agree
+    """
+    _, _, amount, currency, status = tip
+    problems = []
+    if int((amount * 100).to_integral_value()) != intent['amount']:
+        problems.append(('amount', f"Stripe {intent['amount']}, tip {amount}"))
+    if currency.lower() != intent['currency'].lower():
+        problems.append(('currency', f"Stripe {intent['currency']}, tip {currency}"))
+    if status not in EXPECTED_STATUSES.get(intent['status'], ()):
+        problems.append(('status', f"Stripe {intent['status']}, tip {status}"))
+    return problems
+
+
+def reconcile(intents, tips):
+    """
+    Merge-joins intents and tips on payment intent id.
+
+    Args:
+        intents: PaymentIntent dicts in id order
+        tips: Tip tuples from stream_tips()
+
+    Yields:
+        tuple: (kind, payment_intent_id, intent or None, tip or None, detail)
+            for every discrepancy, and ('matched', ...) for agreeing pairs
+    """
+    intents = _ascending(intents, lambda intent: intent['id'], "The export")
+    tips = _ascending(tips, lambda tip: tip[0], "The tips table")
+    intent = next(intents, None)
+    tip = next(tips, None)
+    while intent is not None or tip is not None:
+        if tip is None or (intent is not None and intent['id'] < tip[0]):
+            yield 'missing', intent['id'], intent, None, "No tip for this payment intent"
+            intent = next(intents, None)
+        elif intent is None or tip[0] < intent['id']:
+            yield 'orphaned', tip[0], None, tip, "Payment intent not in the export"
+            tip = next(tips, None)
+        else:
+            problems = compare(intent, tip)
+            for kind, detail in problems:
+                yield kind, tip[0], intent, tip, detail
+            if not problems:
+                yield 'matched', tip[0], intent, tip, ''
+            intent = next(intents, None)
+            tip = next(tips, None)
+
+
+def correct(intent, tip):
+    """
+    Records and processes the webhook event a lagging tip missed.
+
+    Only PENDING tips whose intent has succeeded or been canceled are
+    corrected. The event id is derived from the intent, so running the
+    reconciliation again does not record it twice.
+
+    Returns:
+        tuple: (bool, str) from StripeWebhookEvent.process(), or None if
+            the tip cannot be corrected this way
+    """
+    event_type = CORRECTIVE_EVENTS.get(intent['status'])
+    if event_type is None or tip[4] != 'PENDING':
+        return None
+    event_id = f"reconcile_{intent['id']}_{intent['status']}"
+    payload = {
+        'id': event_id,
+        'object': 'event',
+        'type': event_type,
+        'data': {'object': intent},
+    }
+    event, _ = StripeWebhookEvent.objects.get_or_create(
+        stripe_event_id=event_id,
+        defaults={'event_type': event_type, 'payload': payload},
+    )
+    return event.process()
+
+
+def open_export(path, csv_format=None):
+    """
+    Opens an export file and yields its PaymentIntents.
+
+    The format follows the extension (.csv or .csv.gz for CSV) unless
+    csv_format is given.
+    """
+    if csv_format is None:
+        csv_format = path.removesuffix('.gz').endswith('.csv')
+    with _open(path) as file:
+        yield from read_export(file, csv_format)
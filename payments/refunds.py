@@ -0,0 +1,303 @@
+"""
+Bulk tip refunds.
+
+Refunding N tips costs one eligibility query, one transaction creating
+the PENDING Refund rows, N Stripe calls made by a bounded thread pool,
+and one transaction recording the outcomes: refunds and tips are
+updated in bulk and the summary tables are adjusted with one pass over
+the affected rows. Worker threads only talk to Stripe, never to the
+database. Tips on different shards are refunded shard by shard.
+
+A refund is only SUCCEEDED, and its tip REFUNDED, once Stripe reports it
+succeeded. Refunds Stripe is still processing, and calls that failed
+without an answer, stay PENDING; refund webhooks (settle_refund) and
+settle_pending_refunds() settle them later.
+"""
+import datetime
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from analytics.rollups import apply_refund_deltas
+from core import sharding
+from tips.models import Tip
+
+from . import client
+from .models import Refund
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_REFUND_STATUSES = ('PENDING', 'SUCCEEDED')
+
+# Final Stripe refund statuses; pending and requires_action refunds stay
+# PENDING until a refund webhook or settle_pending_refunds() settles them
+REFUND_STATUSES = {
+    'succeeded': 'SUCCEEDED',
+    'failed': 'FAILED',
+    'canceled': 'FAILED',
+}
+
+
+def check_refund_eligibility(tip_ids, now=None):
+    """
+    Decides whether each tip can be refunded, in a single query per shard.
+
+    A tip is refundable if it SUCCEEDED within the last REFUND_WINDOW_DAYS
+    and has no pending or succeeded refund.
+
+    Args:
+        tip_ids (iterable): Tips to check
+        now (datetime, optional): Current time, for testing
+
+    Returns:
+        dict: Tip id -> (bool, str) - (can_refund, reason); reason is None when refundable
+    """
+    now = now or timezone.now()
+    tip_ids = [uuid.UUID(str(tip_id)) for tip_id in tip_ids]
+    results = {tip_id: (False, "Tip not found") for tip_id in tip_ids}
+    for alias, shard_tip_ids in sharding.locate(Tip, tip_ids).items():
+        with sharding.use_shard(alias):
+            results.update(_check_eligibility(shard_tip_ids, now))
+    return results
+
+
+def _check_eligibility(tip_ids, now):
+    window_start = now - datetime.timedelta(days=settings.REFUND_WINDOW_DAYS)
+    rows = (
+        Tip.objects
+        .filter(pk__in=tip_ids)
+        .annotate(has_refund=Exists(
+            Refund.objects.filter(tip=OuterRef('pk'), status__in=ACTIVE_REFUND_STATUSES)
+        ))
+        .values_list('pk', 'payment_status', 'succeeded_at', 'has_refund')
+    )
+    results = {tip_id: (False, "Tip not found") for tip_id in tip_ids}
+    for tip_id, payment_status, succeeded_at, has_refund in rows:
+        if has_refund:
+            results[tip_id] = (False, "Tip already has a refund")
+        elif payment_status != 'SUCCEEDED':
+            results[tip_id] = (False, f"Tip is {payment_status.lower()}")
+        elif succeeded_at < window_start:
+            results[tip_id] = (False, f"Tip is older than {settings.REFUND_WINDOW_DAYS} days")
+        else:
+            results[tip_id] = (True, None)
+    return results
+
+
+def _create_pending_refunds(tips, reason, initiated_by):
+    refunds = [
+        Refund(tip=tip, amount=tip.amount, currency=tip.currency, reason=reason, initiated_by=initiated_by)
+        for tip in tips
+    ]
+    try:
+        with sharding.atomic():
+            return Refund.objects.bulk_create(refunds)
+    except IntegrityError:
+        # A concurrent request refunded some of these tips since the
+        # eligibility check; keep the rest
+        created = []
+        for refund in refunds:
+            try:
+                with sharding.atomic():
+                    refund.save(force_insert=True)
+            except IntegrityError:
+                continue
+            created.append(refund)
+        return created
+
+
+def _outcome(refund, result):
+    status = REFUND_STATUSES.get(result.get('status'), 'PENDING')
+    error = (result.get('failure_reason') or result['status']) if status == 'FAILED' else None
+    return refund, result, status, error
+
+
+def _call_stripe(refund):
+    try:
+        result = client.create_refund(
+            refund.tip.payment_intent_id,
+            idempotency_key=f"refund-{refund.pk}",
+            reason=Refund.STRIPE_REASONS.get(refund.reason),
+            metadata={'refund_id': refund.pk, 'tip_id': refund.tip_id},
+            reverse_transfer=bool(refund.tip.staff_profile.business.stripe_account_id),
+        )
+    except client.StripeError as e:
+        if e.status is None or e.status >= 500:
+            # Stripe may have made the refund before the call failed; the
+            # refund stays PENDING until settled with the same idempotency key
+            logger.warning("Refund %s outcome unknown: %s", refund.pk, e)
+            return refund, None, 'PENDING', None
+        return refund, None, 'FAILED', str(e)
+    return _outcome(refund, result)
+
+
+def _fetch_stripe(refund):
+    if refund.stripe_refund_id is None:
+        return _call_stripe(refund)
+    try:
+        result = client.retrieve_refund(refund.stripe_refund_id)
+    except client.StripeError as e:
+        logger.warning("Could not fetch refund %s: %s", refund.pk, e)
+        return refund, None, 'PENDING', None
+    return _outcome(refund, result)
+
+
+def _record_outcomes(outcomes):
+    now = timezone.now()
+    refunded_tips = []
+    for refund, result, status, error in outcomes:
+        if result is not None:
+            refund.stripe_refund_id = result['id']
+        refund.status = status
+        if status == 'PENDING':
+            continue
+        refund.completed_at = now
+        if status == 'SUCCEEDED':
+            refunded_tips.append(refund.tip)
+        else:
+            refund.failure_reason = error
+
+    with sharding.atomic():
+        Refund.objects.bulk_update(
+            [refund for refund, _, _, _ in outcomes],
+            ['status', 'stripe_refund_id', 'failure_reason', 'completed_at'],
+            batch_size=500,
+        )
+        # Only tips that were still counted as succeeded come off the summaries
+        counted = set(
+            Tip.objects
+            .select_for_update()
+            .filter(pk__in=[tip.pk for tip in refunded_tips], payment_status='SUCCEEDED')
+            .values_list('pk', flat=True)
+        )
+        Tip.objects.filter(pk__in=counted).update(payment_status='REFUNDED')
+        apply_refund_deltas([tip for tip in refunded_tips if tip.pk in counted])
+    for tip in refunded_tips:
+        tip.payment_status = 'REFUNDED'
+
+
+def refund_tips(tip_ids, reason, initiated_by=None, max_workers=None):
+    """
+    Refunds tips in bulk, calling Stripe with bounded parallelism.
+
+    Ineligible tips are skipped. Stripe failures mark their refund FAILED
+    and leave the tip SUCCEEDED, so the tip can be refunded again later.
+    Refunds Stripe has not finished, and calls whose outcome is unknown
+    (network errors, Stripe 5xx), stay PENDING with the tip SUCCEEDED
+    until settled.
+
+    Args:
+        tip_ids (iterable): Tips to refund
+        reason (str): One of Refund.REASON_CHOICES
+        initiated_by (CustomUser, optional): User requesting the refunds
+        max_workers (int, optional): Concurrent Stripe calls; defaults to REFUND_MAX_WORKERS
+
+    Returns:
+        tuple: (refunds, skipped) - the Refund rows attempted, and a dict of
+               tip id -> reason for each tip that was not refunded
+    """
+    tip_ids = [uuid.UUID(str(tip_id)) for tip_id in tip_ids]
+    refunds = []
+    skipped = {tip_id: "Tip not found" for tip_id in tip_ids}
+    for alias, shard_tip_ids in sharding.locate(Tip, tip_ids).items():
+        for tip_id in shard_tip_ids:
+            del skipped[tip_id]
+        with sharding.use_shard(alias):
+            shard_refunds, shard_skipped = _refund_shard_tips(shard_tip_ids, reason, initiated_by, max_workers)
+        refunds.extend(shard_refunds)
+        skipped.update(shard_skipped)
+    return refunds, skipped
+
+
+def _refund_shard_tips(tip_ids, reason, initiated_by, max_workers):
+    eligibility = _check_eligibility(tip_ids, timezone.now())
+    skipped = {tip_id: why for tip_id, (eligible, why) in eligibility.items() if not eligible}
+    eligible_ids = [tip_id for tip_id, (eligible, _) in eligibility.items() if eligible]
+    if not eligible_ids:
+        return [], skipped
+
+    tips = list(Tip.objects.select_related('staff_profile__business').filter(pk__in=eligible_ids))
+    refunds = _create_pending_refunds(tips, reason, initiated_by)
+    created_tip_ids = {refund.tip_id for refund in refunds}
+    for tip in tips:
+        if tip.pk not in created_tip_ids:
+            skipped[tip.pk] = "Tip already has a refund"
+    if not refunds:
+        return [], skipped
+
+    with ThreadPoolExecutor(max_workers=max_workers or settings.REFUND_MAX_WORKERS) as executor:
+        outcomes = list(executor.map(_call_stripe, refunds))
+    _record_outcomes(outcomes)
+
+    failed = sum(1 for _, _, status, _ in outcomes if status == 'FAILED')
+    if failed:
+        logger.warning("%d of %d refunds failed", failed, len(outcomes))
+    return refunds, skipped
+
+
+def settle_pending_refunds(older_than=datetime.timedelta(minutes=5), max_workers=None):
+    """
+    Settles PENDING refunds from Stripe.
+
+    Refunds with a Stripe id are fetched again; those whose create call
+    never returned are retried with their idempotency key, which returns
+    the refund Stripe made, if any, instead of making another.
+
+    Args:
+        older_than (timedelta): Skip refunds created more recently, which
+            may still be in flight
+        max_workers (int, optional): Concurrent Stripe calls; defaults to REFUND_MAX_WORKERS
+
+    Returns:
+        list: The refunds checked, with their current status
+    """
+    cutoff = timezone.now() - older_than
+    settled = []
+    for alias in sharding.get_shards():
+        with sharding.use_shard(alias):
+            refunds = list(
+                Refund.objects
+                .select_related('tip__staff_profile__business')
+                .filter(status='PENDING', created_at__lt=cutoff)
+            )
+            if not refunds:
+                continue
+            with ThreadPoolExecutor(max_workers=max_workers or settings.REFUND_MAX_WORKERS) as executor:
+                outcomes = list(executor.map(_fetch_stripe, refunds))
+            _record_outcomes(outcomes)
+        settled.extend(refunds)
+    return settled
+
+
+def settle_refund(result):
+    """
+    Settles the PENDING refund a Stripe Refund object belongs to.
+
+    Called for refund webhooks. The refund is found by its Stripe id, or
+    by the refund_id metadata when the create call never returned.
+
+    Returns:
+        Refund or None: The refund, or None if it is not one of ours
+    """
+    found = sharding.locate(Refund, [result['id']], field='stripe_refund_id')
+    lookup = {'stripe_refund_id': result['id']}
+    refund_id = result.get('metadata', {}).get('refund_id')
+    if not found and refund_id:
+        try:
+            refund_id = uuid.UUID(str(refund_id))
+        except ValueError:
+            return None
+        found = sharding.locate(Refund, [refund_id])
+        lookup = {'pk': refund_id}
+    if not found:
+        return None
+    with sharding.use_shard(next(iter(found))):
+        refund = Refund.objects.select_related('tip__staff_profile__business').filter(**lookup).first()
+        if refund is not None and refund.status == 'PENDING':
+            _record_outcomes([_outcome(refund, result)])
+    return refund
@@ -1,3 +1,48 @@
-from django.shortcuts import render
+import json
+import logging
 
-# Create your views here.
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseBadRequest
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+
+from .models import ArchivedStripeEvent, StripeWebhookEvent
+from .webhooks import SignatureVerificationError, verify_signature
+
+logger = logging.getLogger(__name__)
+
+
+@csrf_exempt
+@require_POST
+def stripe_webhook(request):
+    """
+    Receives Stripe webhooks, records them and processes them inline.
+
+    Processing in the web process lets in-process listeners (such as the
+    live tip feed) see tip updates as soon as they are confirmed. Events
+    are deduplicated on stripe_event_id, including events already moved
+    to the archive; a failed event returns 500 so that Stripe retries it.
+    """
+    try:
+        verify_signature(
+            request.body,
+            request.headers.get('Stripe-Signature', ''),
+            settings.STRIPE_WEBHOOK_SECRET,
+        )
+        data = json.loads(request.body)
+        event_id, event_type = data['id'], data['type']
+    except (SignatureVerificationError, ValueError, KeyError) as e:
+        logger.warning("Rejected Stripe webhook: %s", e)
+        return HttpResponseBadRequest()
+
+    if ArchivedStripeEvent.objects.filter(pk=event_id).exists():
+        return HttpResponse(status=200)
+    event, _ = StripeWebhookEvent.objects.get_or_create(
+        stripe_event_id=event_id,
+        defaults={'event_type': event_type, 'payload': data},
+    )
+    success, message = event.process()
+    if not success:
+        logger.error("Failed to process Stripe event %s: %s", event_id, message)
+        return HttpResponse(status=500)
+    return HttpResponse(status=200)
@@ -0,0 +1,51 @@
+import hashlib
+import hmac
+import time
+
+# Maximum age of a signed webhook, matching Stripe's default tolerance
+SIGNATURE_TOLERANCE = 300
+
+
+class SignatureVerificationError(Exception):
+    pass
+
+
+def verify_signature(payload, header, secret, tolerance=SIGNATURE_TOLERANCE):
+    """
+    Verifies a Stripe-Signature header against the raw request body.
+
+    The header has the form ``t=<timestamp>,v1=<signature>[,v1=...]`` where
+    each signature is the hex HMAC-SHA256 of ``"<timestamp>.<payload>"``
+    keyed with the endpoint secret.
+
+    Args:
+        payload (bytes): Raw request body
+        header (str): Value of the Stripe-Signature header
+        secret (str): Webhook endpoint signing secret
+        tolerance (int): Maximum age of the signature in seconds
+
+    Raises:
+        SignatureVerificationError: If no secret is configured, or the header
+            is malformed, stale or does not match
+    """
+    if not secret:
+        # An empty key would let anyone sign events
+        raise SignatureVerificationError("No webhook signing secret is configured")
+    timestamp = None
+    signatures = []
+    for item in header.split(','):
+        key, _, value = item.strip().partition('=')
+        if key == 't':
+            timestamp = value
+        elif key == 'v1':
+            signatures.append(value)
+    if not timestamp or not timestamp.isdigit() or not signatures:
+        raise SignatureVerificationError("Malformed Stripe-Signature header")
+    if abs(time.time() - int(timestamp)) > tolerance:
+        raise SignatureVerificationError("Timestamp outside the tolerance zone")
+
+    expected = hmac.new(
+        secret.encode(), timestamp.encode() + b'.' + payload, hashlib.sha256,
+    ).hexdigest()
+    if not any(hmac.compare_digest(expected, signature) for signature in signatures):
+        raise SignatureVerificationError("No signature matches the payload")
@@ -1,3 +1,117 @@
 from django.contrib import admin
 
-# Register your models here.
+from core.pagination import EstimatedCountPaginator
+
+from .models import StaffProfile, StaffQRCode, StaffShift, TroncDistribution, TroncShare
+
+
+@admin.register(StaffProfile)
+class StaffProfileAdmin(admin.ModelAdmin):
+    list_display = (
+        "display_name",
+        "business",
+        "location",
+        "position",
+        "is_active",
+    )
+    list_filter = (
+        "position",
+        "is_active",
+    )
+    list_select_related = ("business", "location")
+    search_fields = ("display_name", "employee_id", "user__email")
+    raw_id_fields = ("user", "business", "location")
+    readonly_fields = ("joined_at",)
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_display()
+
+
+@admin.register(StaffQRCode)
+class StaffQRCodeAdmin(admin.ModelAdmin):
+    list_display = (
+        "__str__",
+        "qr_type",
+        "scan_count",
+        "is_active",
+        "valid_until",
+    )
+    list_filter = (
+        "qr_type",
+        "is_active",
+    )
+    list_select_related = ("staff_profile",)
+    search_fields = ("token", "shift_id")
+    ordering = ("-created_at",)
+    raw_id_fields = ("staff_profile",)
+    readonly_fields = ("created_at", "last_scanned_at", "scan_count")
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_display()
+
+
+@admin.register(StaffShift)
+class StaffShiftAdmin(admin.ModelAdmin):
+    list_display = (
+        "__str__",
+        "shift_id",
+        "date",
+        "hours",
+    )
+    list_select_related = ("staff_profile",)
+    search_fields = ("shift_id", "staff_profile__display_name", "staff_profile__employee_id")
+    ordering = ("-date",)
+    raw_id_fields = ("business", "staff_profile")
+    readonly_fields = ("created_at",)
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_display()
+
+
+class TroncShareInline(admin.TabularInline):
+    model = TroncShare
+    fields = ("staff_profile", "hours", "weight", "amount")
+    readonly_fields = fields
+    can_delete = False
+    extra = 0
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_display()
+
+
+@admin.register(TroncDistribution)
+class TroncDistributionAdmin(admin.ModelAdmin):
+    list_display = (
+        "business",
+        "period_start",
+        "period_end",
+        "currency",
+        "pool_total",
+        "total_hours",
+        "staff_count",
+        "created_at",
+    )
+    list_filter = ("currency",)
+    list_select_related = ("business",)
+    search_fields = ("business__name",)
+    ordering = ("-period_start",)
+    inlines = (TroncShareInline,)
+
+    def has_add_permission(self, request):
+        # Created by distribute_tronc, which computes the shares
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
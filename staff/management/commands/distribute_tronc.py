@@ -0,0 +1,91 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from businesses.models import Business
+from core.sharding import shard_for_business
+from staff.models import StaffProfile
+from staff.tronc import TroncError, distribute, import_shifts, read_shifts_csv
+
+POSITIONS = {choice for choice, _ in StaffProfile.POSITION_CHOICES}
+
+
+def parse_weight(value):
+    position, _, weight = value.partition('=')
+    position = position.strip().upper()
+    if position not in POSITIONS:
+        raise ValueError(f"Unknown position {position}")
+    return position, float(weight)
+
+
+class Command(BaseCommand):
+    help = (
+        "Splits a business's succeeded tips for a period among its staff by hours worked "
+        "and position weight, and saves the shares as a TroncDistribution."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('business_id', help="Business to distribute for")
+        parser.add_argument('start', type=datetime.date.fromisoformat, help="First day of the period (YYYY-MM-DD)")
+        parser.add_argument('end', type=datetime.date.fromisoformat, help="Last day of the period (YYYY-MM-DD)")
+        parser.add_argument('--currency', help="Currency of the tips to pool (default: the business's currency)")
+        parser.add_argument(
+            '--weight',
+            action='append',
+            default=[],
+            metavar='POSITION=WEIGHT',
+            help="Override a position weight from TRONC_POSITION_WEIGHTS; may be repeated",
+        )
+        parser.add_argument(
+            '--shifts',
+            metavar='CSV',
+            help="First import shift hours from a CSV with staff, date, hours and optional shift_id columns, "
+                 "replacing the business's shifts on the days it covers",
+        )
+        parser.add_argument(
+            '--replace',
+            action='store_true',
+            help="Replace an existing distribution for the same period and currency",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            business_id = options['business_id']
+            business = Business.objects.using(shard_for_business(business_id)).get(pk=business_id)
+        except (Business.DoesNotExist, ValueError):
+            raise CommandError(f"Business {options['business_id']} not found")
+        if options['end'] < options['start']:
+            raise CommandError("The period ends before it starts")
+        try:
+            weights = dict(parse_weight(value) for value in options['weight'])
+        except ValueError as e:
+            raise CommandError(e)
+
+        if options['shifts']:
+            try:
+                with open(options['shifts'], newline='', encoding='utf-8') as f:
+                    entries = read_shifts_csv(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(e)
+            imported, skipped = import_shifts(business, entries)
+            self.stdout.write(f"Imported {imported} shifts.")
+            for staff, reason in skipped.items():
+                self.stdout.write(f"  skipped {staff}: {reason}")
+
+        started = time.monotonic()
+        try:
+            distribution = distribute(
+                business,
+                options['start'],
+                options['end'],
+                currency=options['currency'],
+                weights=weights,
+                replace=options['replace'],
+            )
+        except TroncError as e:
+            raise CommandError(e)
+        self.stdout.write(
+            f"Distributed {distribution.currency} {distribution.pool_total} over {distribution.total_hours} hours "
+            f"to {distribution.staff_count} staff in {time.monotonic() - started:.1f}s."
+        )
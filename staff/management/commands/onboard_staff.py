@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from businesses.models import Business
+from core.sharding import shard_for_business
+from staff.onboarding import offboard_staff, onboard_staff, read_staff_csv
+
+
+class Command(BaseCommand):
+    help = "Onboards, or with --offboard deactivates, a business's staff listed in a CSV file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('business_id', help="Business to update")
+        parser.add_argument(
+            'csv_path',
+            help="CSV with an email column and optional display_name, position, location and employee_id",
+        )
+        parser.add_argument(
+            '--offboard',
+            action='store_true',
+            help="Deactivate the listed staff and expire their QR codes instead",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            business_id = options['business_id']
+            business = Business.objects.using(shard_for_business(business_id)).get(pk=business_id)
+        except (Business.DoesNotExist, ValueError):
+            raise CommandError(f"Business {options['business_id']} not found")
+        try:
+            with open(options['csv_path'], newline='', encoding='utf-8') as f:
+                entries = read_staff_csv(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(e)
+
+        if options['offboard']:
+            offboarded = offboard_staff(business, [entry['email'] for entry in entries])
+            self.stdout.write(f"Offboarded {offboarded} staff members of {business}.")
+            return
+
+        result = onboard_staff(business, entries)
+        self.stdout.write(
+            f"Onboarded {len(result.created)} new and {len(result.reactivated)} returning staff "
+            f"members of {business} ({len(result.created_users)} new accounts)."
+        )
+        for email, reason in result.skipped.items():
+            self.stdout.write(f"  skipped {email}: {reason}")
@@ -0,0 +1,136 @@
+# Generated by Django 5.2.9 on 2026-10-19 17:26
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ("businesses", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StaffProfile",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("display_name", models.CharField(max_length=100)),
+                (
+                    "position",
+                    models.CharField(
+                        choices=[
+                            ("WAITER", "Waiter"),
+                            ("BARTENDER", "Bartender"),
+                            ("CHEF", "Chef"),
+                            ("HOST", "Host"),
+                            ("OTHER", "Other"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("employee_id", models.CharField(blank=True, max_length=50, null=True)),
+                ("is_active", models.BooleanField(default=True)),
+                ("joined_at", models.DateTimeField(auto_now_add=True)),
+                ("left_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "business",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="staff_members",
+                        to="businesses.business",
+                    ),
+                ),
+                (
+                    "location",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="staff_members",
+                        to="businesses.location",
+                    ),
+                ),
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="staff_profile",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Staff Profile",
+                "verbose_name_plural": "Staff Profiles",
+            },
+        ),
+        migrations.CreateModel(
+            name="StaffQRCode",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("token", models.CharField(max_length=64, unique=True)),
+                (
+                    "qr_type",
+                    models.CharField(
+                        choices=[
+                            ("SHIFT", "Shift"),
+                            ("DAILY", "Daily"),
+                            ("PERSISTENT", "Persistent"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("shift_id", models.CharField(blank=True, max_length=100, null=True)),
+                ("valid_from", models.DateTimeField()),
+                ("valid_until", models.DateTimeField(blank=True, null=True)),
+                ("scan_count", models.IntegerField(default=0)),
+                ("max_scans", models.IntegerField(blank=True, null=True)),
+                ("is_active", models.BooleanField(db_index=True, default=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("last_scanned_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "staff_profile",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="qr_codes",
+                        to="staff.staffprofile",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Staff QR Code",
+                "verbose_name_plural": "Staff QR Codes",
+                "indexes": [
+                    models.Index(fields=["token"], name="staff_staff_token_bf37a0_idx"),
+                    models.Index(
+                        fields=["staff_profile"], name="staff_staff_staff_p_fdf64a_idx"
+                    ),
+                    models.Index(
+                        fields=["valid_until"], name="staff_staff_valid_u_5c803e_idx"
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,163 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:24
+
+import django.core.validators
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("businesses", "0004_cross_shard_user_fks"),
+        ("staff", "0002_cross_shard_user_fks"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TroncDistribution",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("period_start", models.DateField()),
+                ("period_end", models.DateField(help_text="Last day included")),
+                ("currency", models.CharField(max_length=3)),
+                ("pool_total", models.DecimalField(decimal_places=2, max_digits=12)),
+                ("total_hours", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("position_weights", models.JSONField(default=dict)),
+                ("staff_count", models.IntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "business",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="tronc_distributions",
+                        to="businesses.business",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Tronc Distribution",
+                "verbose_name_plural": "Tronc Distributions",
+            },
+        ),
+        migrations.CreateModel(
+            name="TroncShare",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("hours", models.DecimalField(decimal_places=2, max_digits=8)),
+                (
+                    "weight",
+                    models.DecimalField(
+                        decimal_places=3,
+                        help_text="Position weight applied to the hours",
+                        max_digits=6,
+                    ),
+                ),
+                ("amount", models.DecimalField(decimal_places=2, max_digits=12)),
+                (
+                    "distribution",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="shares",
+                        to="staff.troncdistribution",
+                    ),
+                ),
+                (
+                    "staff_profile",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="tronc_shares",
+                        to="staff.staffprofile",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Tronc Share",
+                "verbose_name_plural": "Tronc Shares",
+            },
+        ),
+        migrations.CreateModel(
+            name="StaffShift",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("shift_id", models.CharField(blank=True, max_length=100, null=True)),
+                ("date", models.DateField()),
+                (
+                    "hours",
+                    models.DecimalField(
+                        decimal_places=2,
+                        max_digits=5,
+                        validators=[django.core.validators.MinValueValidator(0)],
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "business",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="staff_shifts",
+                        to="businesses.business",
+                    ),
+                ),
+                (
+                    "staff_profile",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="shifts",
+                        to="staff.staffprofile",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Staff Shift",
+                "verbose_name_plural": "Staff Shifts",
+                "indexes": [
+                    models.Index(
+                        fields=["business", "date"],
+                        name="staff_staff_busines_c78b3c_idx",
+                    ),
+                    models.Index(
+                        fields=["staff_profile", "date"],
+                        name="staff_staff_staff_p_f24c55_idx",
+                    ),
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="troncdistribution",
+            constraint=models.UniqueConstraint(
+                fields=("business", "period_start", "period_end", "currency"),
+                name="unique_tronc_distribution",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="troncshare",
+            constraint=models.UniqueConstraint(
+                fields=("distribution", "staff_profile"), name="unique_tronc_share"
+            ),
+        ),
+    ]
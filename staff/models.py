@@ -1,16 +1,54 @@
 from django.db import models
+from django.db.models import F
+from django.core.validators import MinValueValidator
 from django.contrib.auth.models import User
 import uuid
 from django.conf import settings
+from django.utils import timezone
+
+from core.querysets import DisplayQuerySet, ShardedQuerySet
+from core.sharding import use_shard
+
+
+class StaffProfileQuerySet(ShardedQuerySet, DisplayQuerySet):
+    display_related = {
+        'business': ('name',),
+        'location': ('name', 'city'),
+    }
+
+
+class StaffQRCodeQuerySet(ShardedQuerySet, DisplayQuerySet):
+    display_related = {
+        'staff_profile': ('display_name',),
+    }
+
+
+class StaffShiftQuerySet(ShardedQuerySet, DisplayQuerySet):
+    display_related = {
+        'staff_profile': ('display_name',),
+    }
+
+
+class TroncDistributionQuerySet(ShardedQuerySet, DisplayQuerySet):
+    display_related = {
+        'business': ('name',),
+    }
+
+
+class TroncShareQuerySet(ShardedQuerySet, DisplayQuerySet):
+    display_related = {
+        'staff_profile': ('display_name',),
+    }
+
 
 class StaffProfile(models.Model):
     """
     Staff member profile and metadata
     """
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='staff_profile')
-    business = models.ForeignKey('Business', on_delete=models.CASCADE, related_name='staff_members')
-    location = models.ForeignKey('Location', on_delete=models.SET_NULL, null=True, blank=True, related_name='staff_members')
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='staff_profile', db_constraint=False)
+    business = models.ForeignKey('businesses.Business', on_delete=models.CASCADE, related_name='staff_members')
+    location = models.ForeignKey('businesses.Location', on_delete=models.SET_NULL, null=True, blank=True, related_name='staff_members')
     display_name = models.CharField(max_length=100)
     POSITION_CHOICES = [
         ('WAITER', 'Waiter'),
@@ -25,6 +63,8 @@ class StaffProfile(models.Model):
     joined_at = models.DateTimeField(auto_now_add=True)
     left_at = models.DateTimeField(null=True, blank=True)
 
+    objects = StaffProfileQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Staff Profile'
         verbose_name_plural = 'Staff Profiles'
@@ -86,7 +126,13 @@ class StaffProfile(models.Model):
         Returns:
             None
         """
-        pass
+        from .onboarding import deactivate_profiles
+        now = timezone.now()
+        with use_shard(self._state.db):
+            deactivated = deactivate_profiles([self.pk], now=now)
+        if deactivated:
+            self.is_active = False
+            self.left_at = now
 
 class StaffQRCode(models.Model):
     """
@@ -106,7 +152,7 @@ class StaffQRCode(models.Model):
     
     # Fields
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    staff_profile = models.ForeignKey('StaffProfile', on_delete=models.CASCADE, related_name='qr_codes')
+    staff_profile = models.ForeignKey('staff.StaffProfile', on_delete=models.CASCADE, related_name='qr_codes')
     token = models.CharField(max_length=64, unique=True)
     qr_type = models.CharField(max_length=20, choices=QR_TYPE_CHOICES)
     shift_id = models.CharField(max_length=100, null=True, blank=True)
@@ -118,6 +164,8 @@ class StaffQRCode(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     last_scanned_at = models.DateTimeField(null=True, blank=True)
     
+    objects = StaffQRCodeQuerySet.as_manager()
+    
     class Meta:
         verbose_name = 'Staff QR Code'
         verbose_name_plural = 'Staff QR Codes'
@@ -143,7 +191,16 @@ class StaffQRCode(models.Model):
             tuple: (bool, str) - (is_valid, error_message)
                    Returns (True, None) if valid, (False, error_reason) if invalid
         """
-        pass
+        now = timezone.now()
+        if not self.is_active:
+            return False, "This QR code is no longer active."
+        if now < self.valid_from:
+            return False, "This QR code is not valid yet."
+        if self.valid_until is not None and now >= self.valid_until:
+            return False, "This QR code has expired."
+        if self.max_scans is not None and self.scan_count >= self.max_scans:
+            return False, "This QR code has reached its scan limit."
+        return True, None
     
     def increment_scan(self):
         """
@@ -156,7 +213,16 @@ class StaffQRCode(models.Model):
         Returns:
             bool: True if increment successful, False if max scans reached
         """
-        pass
+        now = timezone.now()
+        queryset = StaffQRCode.objects.using(self._state.db).filter(pk=self.pk)
+        if self.max_scans is not None:
+            # Checked in the UPDATE itself so concurrent scans cannot overshoot
+            queryset = queryset.filter(scan_count__lt=F('max_scans'))
+        if not queryset.update(scan_count=F('scan_count') + 1, last_scanned_at=now):
+            return False
+        self.scan_count += 1
+        self.last_scanned_at = now
+        return True
     
     def invalidate(self):
         """
@@ -169,7 +235,8 @@ class StaffQRCode(models.Model):
         Returns:
             None
         """
-        pass
+        StaffQRCode.objects.using(self._state.db).filter(pk=self.pk).update(is_active=False)
+        self.is_active = False
     
     def generate_qr_image(self):
         """
@@ -182,4 +249,90 @@ class StaffQRCode(models.Model):
         Returns:
             BytesIO or str: QR code image as binary stream or file path
         """
-        pass
\ No newline at end of file
+        pass
+
+class StaffShift(models.Model):
+    """
+    Hours a staff member worked on one shift, for tronc distribution.
+
+    shift_id matches StaffQRCode.shift_id, tying tips taken through shift
+    QR codes to the staff who worked that shift (see staff.tronc).
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    business = models.ForeignKey('businesses.Business', on_delete=models.CASCADE, related_name='staff_shifts')
+    staff_profile = models.ForeignKey('staff.StaffProfile', on_delete=models.CASCADE, related_name='shifts')
+    shift_id = models.CharField(max_length=100, null=True, blank=True)
+    date = models.DateField()
+    hours = models.DecimalField(max_digits=5, decimal_places=2, validators=[MinValueValidator(0)])
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = StaffShiftQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Staff Shift'
+        verbose_name_plural = 'Staff Shifts'
+        indexes = [
+            models.Index(fields=['business', 'date']),
+            models.Index(fields=['staff_profile', 'date']),
+        ]
+
+    def __str__(self):
+        return f"{self.staff_profile.display_name} on {self.date} ({self.hours}h)"
+
+
+class TroncDistribution(models.Model):
+    """
+    One run of the tip pool split for a business, period and currency.
+
+    The position weights used are stored with the run, so it can be
+    reproduced from the same tips and shifts.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    business = models.ForeignKey('businesses.Business', on_delete=models.CASCADE, related_name='tronc_distributions')
+    period_start = models.DateField()
+    period_end = models.DateField(help_text="Last day included")
+    currency = models.CharField(max_length=3)
+    pool_total = models.DecimalField(max_digits=12, decimal_places=2)
+    total_hours = models.DecimalField(max_digits=10, decimal_places=2)
+    position_weights = models.JSONField(default=dict)
+    staff_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = TroncDistributionQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Tronc Distribution'
+        verbose_name_plural = 'Tronc Distributions'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['business', 'period_start', 'period_end', 'currency'],
+                name='unique_tronc_distribution',
+            ),
+        ]
+
+    def __str__(self):
+        return f"Tronc for {self.business.name} {self.period_start} to {self.period_end} ({self.currency})"
+
+
+class TroncShare(models.Model):
+    """
+    A staff member's share of a TroncDistribution.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    distribution = models.ForeignKey('staff.TroncDistribution', on_delete=models.CASCADE, related_name='shares')
+    staff_profile = models.ForeignKey('staff.StaffProfile', on_delete=models.PROTECT, related_name='tronc_shares')
+    hours = models.DecimalField(max_digits=8, decimal_places=2)
+    weight = models.DecimalField(max_digits=6, decimal_places=3, help_text="Position weight applied to the hours")
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+
+    objects = TroncShareQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Tronc Share'
+        verbose_name_plural = 'Tronc Shares'
+        constraints = [
+            models.UniqueConstraint(fields=['distribution', 'staff_profile'], name='unique_tronc_share'),
+        ]
+
+    def __str__(self):
+        return f"{self.staff_profile.display_name}: {self.amount}"
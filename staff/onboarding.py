@@ -0,0 +1,258 @@
+"""
+Bulk staff onboarding and offboarding.
+
+Both operations run in one transaction with a fixed number of queries
+however many staff they cover: users and profiles are written with
+bulk_create/bulk_update, and deactivation and QR code expiry are single
+set-based UPDATEs. Bulk writes send no model signals, so the access map
+and token invalidations those signals would trigger are done here, in
+one batch, once the transaction commits.
+
+Users live on the default database and profiles on the business's
+shard; the user transaction commits first, so a failure in between
+leaves only unused accounts that the next onboarding run picks up.
+"""
+import csv
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from accounts.access import invalidate_access_maps
+from accounts.revocation import revocations
+from businesses.models import Location
+from core import sharding
+
+from .models import StaffProfile, StaffQRCode
+
+POSITIONS = {choice for choice, _ in StaffProfile.POSITION_CHOICES}
+
+CSV_FIELDS = ('email', 'display_name', 'position', 'location', 'employee_id')
+
+
+class OnboardingResult:
+    def __init__(self):
+        self.created_users = []
+        self.created = []
+        self.reactivated = []
+        self.skipped = {}
+
+    def __repr__(self):
+        return (
+            f"<OnboardingResult created={len(self.created)} reactivated={len(self.reactivated)} "
+            f"skipped={len(self.skipped)}>"
+        )
+
+
+def read_staff_csv(file):
+    """
+    Reads onboarding entries from a CSV file with a header row.
+
+    Recognised columns are email, display_name, position, location (a
+    location id or name) and employee_id; only email is required.
+
+    Returns:
+        list: One dict per row
+    """
+    reader = csv.DictReader(file)
+    if 'email' not in (reader.fieldnames or ()):
+        raise ValueError("CSV must have an 'email' column")
+    return [
+        {field: (row.get(field) or '').strip() for field in CSV_FIELDS}
+        for row in reader
+    ]
+
+
+def _after_commit_invalidate(user_ids):
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+
+    def invalidate():
+        invalidate_access_maps(user_ids)
+        revocations.revoke_users_access(user_ids)
+
+    sharding.on_commit(invalidate)
+
+
+def _resolve_location(value, locations):
+    if not value:
+        return None
+    try:
+        location = locations['id'].get(uuid.UUID(str(value)))
+    except ValueError:
+        location = locations['name'].get(str(value).lower())
+    return location
+
+
+def onboard_staff(business, entries):
+    """
+    Creates or reactivates staff members of a business in bulk.
+
+    Users are matched by email and created (with an unusable password, to
+    be set through password reset) when missing. A user's staff profile is
+    created, or reactivated when it belongs to this business. Users who
+    are or were staff of another business on this shard are skipped, as
+    their profile and its tips stay with that business, and so are users
+    whose account was deactivated, which only an admin can undo.
+
+    Args:
+        business (Business): Business to add staff to
+        entries (list): Dicts with 'email' and optionally 'display_name',
+            'position', 'location' (id or name) and 'employee_id'
+
+    Returns:
+        OnboardingResult: Created and reactivated profiles, and skipped emails with reasons
+    """
+    User = get_user_model()
+    result = OnboardingResult()
+    all_locations = list(Location.objects.using(business._state.db).filter(business=business))
+    locations = {
+        'id': {location.pk: location for location in all_locations},
+        'name': {location.name.lower(): location for location in all_locations},
+    }
+
+    valid = {}
+    for entry in entries:
+        email = (entry.get('email') or '').strip().lower()
+        position = (entry.get('position') or 'OTHER').upper()
+        location = _resolve_location(entry.get('location'), locations)
+        if not email:
+            continue
+        if email in valid:
+            result.skipped[email] = "Duplicate email"
+        elif position not in POSITIONS:
+            result.skipped[email] = f"Unknown position {position}"
+        elif entry.get('location') and location is None:
+            result.skipped[email] = f"Unknown location {entry['location']}"
+        else:
+            valid[email] = {
+                'display_name': entry.get('display_name') or email.split('@')[0],
+                'position': position,
+                'location': location,
+                'employee_id': entry.get('employee_id') or None,
+            }
+    if not valid:
+        return result
+
+    shard = business._state.db
+    with sharding.use_shard(shard), sharding.atomic(), transaction.atomic():
+        users = {
+            user.email.lower(): user
+            for user in User.objects.annotate(email_lower=Lower('email')).filter(email_lower__in=list(valid))
+        }
+        new_users = []
+        for email in valid:
+            if email not in users:
+                user = User(email=email, username=email.split('@')[0], role='STAFF')
+                user.set_unusable_password()
+                new_users.append(user)
+        User.objects.bulk_create(new_users)
+        users.update((user.email, user) for user in new_users)
+        result.created_users = new_users
+
+        profiles = {
+            profile.user_id: profile
+            for profile in StaffProfile.objects.select_for_update().filter(
+                user__in=[user.pk for user in users.values()]
+            )
+        }
+        active_elsewhere = {
+            user_id
+            for alias in sharding.get_shards() if alias != shard
+            for user_id in StaffProfile.objects.using(alias).filter(
+                user__in=[user.pk for user in users.values()], is_active=True,
+            ).values_list('user_id', flat=True)
+        }
+        to_create = []
+        to_update = []
+        for email, fields in valid.items():
+            user = users[email]
+            profile = profiles.get(user.pk)
+            if not user.is_active:
+                result.skipped[email] = "User account is deactivated"
+                continue
+            if user.pk in active_elsewhere:
+                result.skipped[email] = "Active staff member of another business"
+                continue
+            if profile is None:
+                to_create.append(StaffProfile(user=user, business=business, **fields))
+                continue
+            if profile.business_id != business.pk:
+                # A user has one profile per shard, and tips are scoped to a
+                # business through it, so it cannot move with them
+                if profile.is_active:
+                    result.skipped[email] = "Active staff member of another business"
+                else:
+                    result.skipped[email] = "Former staff member of another business"
+                continue
+            profile.is_active = True
+            profile.left_at = None
+            for name, value in fields.items():
+                setattr(profile, name, value)
+            to_update.append(profile)
+
+        StaffProfile.objects.bulk_create(to_create)
+        StaffProfile.objects.bulk_update(
+            to_update,
+            ['location', 'display_name', 'position', 'employee_id', 'is_active', 'left_at'],
+        )
+        result.created = to_create
+        result.reactivated = to_update
+        _after_commit_invalidate(profile.user_id for profile in to_create + to_update)
+    return result
+
+
+def deactivate_profiles(profile_ids, now=None):
+    """
+    Deactivates staff profiles and expires all their QR codes with two UPDATEs.
+
+    Works on the current shard.
+
+    Args:
+        profile_ids (iterable): StaffProfile ids
+        now (datetime, optional): Recorded as left_at; defaults to the current time
+
+    Returns:
+        int: Number of profiles deactivated
+    """
+    now = now or timezone.now()
+    profile_ids = list(profile_ids)
+    with sharding.atomic():
+        profiles = StaffProfile.objects.filter(pk__in=profile_ids, is_active=True)
+        user_ids = list(profiles.select_for_update().values_list('user_id', flat=True))
+        deactivated = profiles.update(is_active=False, left_at=now)
+        StaffQRCode.objects.filter(staff_profile_id__in=profile_ids, is_active=True).update(
+            is_active=False,
+        )
+        _after_commit_invalidate(user_ids)
+    return deactivated
+
+
+def offboard_staff(business, emails):
+    """
+    Deactivates a business's staff members by email, expiring their QR codes.
+
+    Args:
+        business (Business): Business the staff leave
+        emails (iterable): Emails of the users to offboard
+
+    Returns:
+        int: Number of staff members offboarded
+    """
+    emails = [email.strip().lower() for email in emails if email.strip()]
+    # Users are on the default database, so they cannot be joined to profiles
+    user_ids = list(
+        get_user_model().objects
+        .annotate(email_lower=Lower('email'))
+        .filter(email_lower__in=emails)
+        .values_list('pk', flat=True)
+    )
+    with sharding.use_shard(business._state.db):
+        return deactivate_profiles(
+            StaffProfile.objects
+            .filter(business=business, user__in=user_ids)
+            .values_list('pk', flat=True)
+        )
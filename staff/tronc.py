@@ -0,0 +1,340 @@
+"""
+Tronc: splitting a business's pooled tips among its staff.
+
+A period's succeeded tips form pools. Tips taken through a QR code with
+a shift_id are pooled per shift and shared by the staff who worked that
+shift (StaffShift rows with the same shift_id); all other tips, and
+shift pools nobody recorded hours for, form the general pool, shared by
+everyone who worked in the period. Within a pool each person's share is
+proportional to hours worked times their position's weight.
+
+Shares are computed with NumPy in integer pennies: hours are counted in
+hundredths and weights in thousandths, so every share is an exact
+integer quotient plus a remainder, and the pennies left over in a pool
+go one each to the largest remainders (ties by staff profile id). Each
+pool is paid out exactly, and the same tips, shifts and weights always
+give the same result. Loading is one query each for tips and shifts,
+and the shares are written with bulk_create.
+"""
+import csv
+import datetime
+import uuid
+from decimal import Decimal, InvalidOperation
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+
+from tips.models import Tip
+
+from .models import StaffProfile, StaffShift, TroncDistribution, TroncShare
+
+HOURS_SCALE = 100
+WEIGHT_SCALE = 1000
+
+SHIFT_CSV_FIELDS = ('staff', 'date', 'hours', 'shift_id')
+
+
+class TroncError(Exception):
+    pass
+
+
+def allocate(pool_pennies, pool_of, points):
+    """
+    Splits integer pools among participants in proportion to their points.
+
+    Args:
+        pool_pennies (np.ndarray): Pennies in each pool (int64)
+        pool_of (np.ndarray): Pool index of each participant
+        points (np.ndarray): Points of each participant (int64, >= 0);
+            participants are ranked by position for leftover pennies
+
+    Returns:
+        np.ndarray: Pennies for each participant; each pool with points
+            is paid out exactly, pools without points pay nothing
+    """
+    pool_pennies = np.asarray(pool_pennies, dtype=np.int64)
+    pool_of = np.asarray(pool_of, dtype=np.int64)
+    points = np.asarray(points, dtype=np.int64)
+    pool_points = np.zeros(len(pool_pennies), dtype=np.int64)
+    np.add.at(pool_points, pool_of, points)
+
+    denominator = pool_points[pool_of]
+    paid = denominator > 0
+    product = pool_pennies[pool_of] * points
+    shares = np.zeros(len(points), dtype=np.int64)
+    remainders = np.zeros(len(points), dtype=np.int64)
+    shares[paid] = product[paid] // denominator[paid]
+    remainders[paid] = product[paid] % denominator[paid]
+
+    allocated = np.zeros(len(pool_pennies), dtype=np.int64)
+    np.add.at(allocated, pool_of, shares)
+    leftover = np.where(pool_points > 0, pool_pennies - allocated, 0)
+
+    # Within each pool, largest remainder first, then input order
+    order = np.lexsort((np.arange(len(points)), -remainders, pool_of))
+    sorted_pools = pool_of[order]
+    first = np.searchsorted(sorted_pools, sorted_pools, side='left')
+    rank = np.arange(len(points)) - first
+    shares[order] += rank < leftover[sorted_pools]
+    return shares
+
+
+def get_position_weights(overrides=None):
+    weights = {position: 1.0 for position, _ in StaffProfile.POSITION_CHOICES}
+    weights.update(settings.TRONC_POSITION_WEIGHTS)
+    weights.update(overrides or {})
+    return weights
+
+
+def _period_bounds(start, end, tz):
+    return (
+        datetime.datetime.combine(start, datetime.time.min, tzinfo=tz),
+        datetime.datetime.combine(end + datetime.timedelta(days=1), datetime.time.min, tzinfo=tz),
+    )
+
+
+def _to_pennies(amount):
+    return int((amount * 100).to_integral_value())
+
+
+def compute_distribution(business, start, end, currency, weights):
+    """
+    Computes the tronc shares of a business for a period, without saving.
+
+    Args:
+        business (Business): Business whose tips are pooled
+        start (date): First day of the period, in the business's timezone
+        end (date): Last day of the period
+        currency (str): Only tips in this currency are pooled
+        weights (dict): Position -> weight
+
+    Returns:
+        dict: pool_total (Decimal), total_hours (Decimal) and shares, a
+            list of (staff_profile_id, hours, weight, amount) tuples ordered
+            by staff profile id
+
+    Raises:
+        TroncError: If there are tips to share but no hours worked
+    """
+    db = business._state.db
+    period_start, period_end = _period_bounds(start, end, business.tzinfo)
+    pools = dict(
+        Tip.objects.using(db)
+        .filter(
+            staff_profile__business=business,
+            payment_status='SUCCEEDED',
+            currency=currency,
+            succeeded_at__gte=period_start,
+            succeeded_at__lt=period_end,
+        )
+        .order_by()
+        .values_list('qr_code__shift_id')
+        .annotate(total=Sum('amount'))
+    )
+    shifts = list(
+        StaffShift.objects.using(db)
+        .filter(business=business, date__gte=start, date__lte=end, hours__gt=0)
+        .order_by()
+        .values_list('staff_profile_id', 'staff_profile__position', 'shift_id', 'hours')
+    )
+    # Summed in pennies: SQLite sums decimals as floats
+    pool_total = Decimal(sum(map(_to_pennies, pools.values()))) / 100
+    if not shifts:
+        if pool_total:
+            raise TroncError(f"No hours worked between {start} and {end} to share {currency} {pool_total} over")
+        return {'pool_total': pool_total, 'total_hours': Decimal('0.00'), 'shares': []}
+
+    # Staff in id order, so ties between remainders break the same way every run
+    staff_ids = sorted({row[0] for row in shifts}, key=str)
+    staff_index = {staff_id: i for i, staff_id in enumerate(staff_ids)}
+    positions = {row[0]: row[1] for row in shifts}
+    staff_weights = np.array(
+        [round(weights.get(positions[staff_id], 1.0) * WEIGHT_SCALE) for staff_id in staff_ids],
+        dtype=np.int64,
+    )
+
+    row_staff = np.array([staff_index[row[0]] for row in shifts], dtype=np.int64)
+    row_hours = np.array([int(row[3] * HOURS_SCALE) for row in shifts], dtype=np.int64)
+    staff_hours = np.bincount(row_staff, weights=row_hours, minlength=len(staff_ids)).astype(np.int64)
+
+    # Pool 0 is the general pool; shift pools follow, for shifts with hours
+    worked_shifts = {row[2] for row in shifts if row[2]}
+    shift_pools = sorted(shift_id for shift_id in pools if shift_id in worked_shifts)
+    pool_index = {shift_id: i + 1 for i, shift_id in enumerate(shift_pools)}
+    pool_pennies = np.zeros(len(shift_pools) + 1, dtype=np.int64)
+    for shift_id, total in pools.items():
+        pool_pennies[pool_index.get(shift_id, 0)] += _to_pennies(total)
+
+    # Everyone is in the general pool with all their hours, and in each
+    # shift pool with that shift's hours
+    in_shift = np.array([row[2] in pool_index for row in shifts], dtype=bool)
+    shift_of = np.array([pool_index.get(row[2], 0) for row in shifts], dtype=np.int64)
+    pair_keys = shift_of[in_shift] * len(staff_ids) + row_staff[in_shift]
+    pairs, pair_of = np.unique(pair_keys, return_inverse=True)
+    pair_hours = np.bincount(pair_of, weights=row_hours[in_shift], minlength=len(pairs)).astype(np.int64)
+    pair_pool, pair_staff = np.divmod(pairs, len(staff_ids))
+
+    participant_staff = np.concatenate([np.arange(len(staff_ids)), pair_staff])
+    participant_pool = np.concatenate([np.zeros(len(staff_ids), dtype=np.int64), pair_pool])
+    participant_hours = np.concatenate([staff_hours, pair_hours])
+    # Points stay far below int64 overflow: a million pounds in pennies
+    # times 744 hours in hundredths times a weight of 10 in thousandths
+    pennies = allocate(pool_pennies, participant_pool, participant_hours * staff_weights[participant_staff])
+    staff_pennies = np.zeros(len(staff_ids), dtype=np.int64)
+    np.add.at(staff_pennies, participant_staff, pennies)
+
+    shares = [
+        (
+            staff_id,
+            Decimal(int(staff_hours[i])) / HOURS_SCALE,
+            Decimal(int(staff_weights[i])) / WEIGHT_SCALE,
+            Decimal(int(staff_pennies[i])) / 100,
+        )
+        for i, staff_id in enumerate(staff_ids)
+    ]
+    return {
+        'pool_total': pool_total,
+        'total_hours': Decimal(int(staff_hours.sum())) / HOURS_SCALE,
+        'shares': shares,
+    }
+
+
+def distribute(business, start, end, currency=None, weights=None, replace=False, batch_size=1000):
+    """
+    Computes and saves the tronc distribution of a business for a period.
+
+    Args:
+        business (Business): Business whose tips are pooled
+        start (date): First day of the period
+        end (date): Last day of the period
+        currency (str, optional): Defaults to the business's currency
+        weights (dict, optional): Position weights overriding TRONC_POSITION_WEIGHTS
+        replace (bool): Replace an existing distribution for the same
+            period and currency instead of failing
+        batch_size (int): Shares written per INSERT
+
+    Returns:
+        TroncDistribution: The saved distribution
+
+    Raises:
+        TroncError: If the period is already distributed and replace is
+            False, or there are tips but no hours
+    """
+    currency = currency or business.currency
+    weights = get_position_weights(weights)
+    result = compute_distribution(business, start, end, currency, weights)
+    db = business._state.db
+    with transaction.atomic(using=db):
+        existing = TroncDistribution.objects.using(db).filter(
+            business=business, period_start=start, period_end=end, currency=currency,
+        )
+        if existing.exists():
+            if not replace:
+                raise TroncError(f"{business} already has a {currency} distribution for {start} to {end}")
+            existing.delete()
+        distribution = TroncDistribution.objects.using(db).create(
+            business=business,
+            period_start=start,
+            period_end=end,
+            currency=currency,
+            pool_total=result['pool_total'],
+            total_hours=result['total_hours'],
+            position_weights=weights,
+            staff_count=len(result['shares']),
+        )
+        TroncShare.objects.using(db).bulk_create(
+            [
+                TroncShare(
+                    distribution=distribution,
+                    staff_profile_id=staff_profile_id,
+                    hours=hours,
+                    weight=weight,
+                    amount=amount,
+                )
+                for staff_profile_id, hours, weight, amount in result['shares']
+            ],
+            batch_size=batch_size,
+        )
+    return distribution
+
+
+def read_shifts_csv(file):
+    """
+    Reads shift hours from a CSV file with a header row.
+
+    Columns are staff (an employee id or staff profile id), date
+    (YYYY-MM-DD), hours and optionally shift_id.
+
+    Returns:
+        list: One dict per row
+
+    Raises:
+        ValueError: If a column is missing or a value is invalid
+    """
+    reader = csv.DictReader(file)
+    missing = {'staff', 'date', 'hours'} - set(reader.fieldnames or ())
+    if missing:
+        raise ValueError(f"CSV is missing columns: {', '.join(sorted(missing))}")
+    entries = []
+    for line, row in enumerate(reader, start=2):
+        entry = {field: (row.get(field) or '').strip() for field in SHIFT_CSV_FIELDS}
+        try:
+            entry['date'] = datetime.date.fromisoformat(entry['date'])
+            entry['hours'] = Decimal(entry['hours'])
+        except (ValueError, InvalidOperation):
+            raise ValueError(f"Line {line}: invalid date or hours")
+        if entry['hours'] < 0:
+            raise ValueError(f"Line {line}: negative hours")
+        entries.append(entry)
+    return entries
+
+
+def import_shifts(business, entries, batch_size=1000):
+    """
+    Replaces a business's shifts on the days covered by ``entries``.
+
+    Re-importing a corrected file for the same days therefore never
+    counts hours twice.
+
+    Args:
+        business (Business): Business the staff belong to
+        entries (list): Dicts from read_shifts_csv()
+        batch_size (int): Shifts written per INSERT
+
+    Returns:
+        tuple: (number of shifts imported, {staff value: reason} for skipped rows)
+    """
+    db = business._state.db
+    profiles = list(
+        StaffProfile.objects.using(db).filter(business=business).values_list('pk', 'employee_id')
+    )
+    by_employee_id = {employee_id: pk for pk, employee_id in profiles if employee_id}
+    by_id = {str(pk): pk for pk, _ in profiles}
+
+    shifts = []
+    skipped = {}
+    for entry in entries:
+        staff_profile_id = by_employee_id.get(entry['staff'])
+        if staff_profile_id is None:
+            try:
+                staff_profile_id = by_id.get(str(uuid.UUID(entry['staff'])))
+            except ValueError:
+                pass
+        if staff_profile_id is None:
+            skipped[entry['staff']] = "Unknown staff member"
+            continue
+        shifts.append(StaffShift(
+            business=business,
+            staff_profile_id=staff_profile_id,
+            shift_id=entry['shift_id'] or None,
+            date=entry['date'],
+            hours=entry['hours'],
+        ))
+
+    dates = {entry['date'] for entry in entries}
+    with transaction.atomic(using=db):
+        StaffShift.objects.using(db).filter(business=business, date__in=dates)._raw_delete(db)
+        StaffShift.objects.using(db).bulk_create(shifts, batch_size=batch_size)
+    return len(shifts), skipped
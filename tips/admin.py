@@ -1,3 +1,61 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 
-# Register your models here.
+from core.pagination import EstimatedCountPaginator
+from payments.client import StripeError, cancel_payment_intent, capture_payment_intent
+
+from .models import Tip
+
+
+@admin.register(Tip)
+class TipAdmin(admin.ModelAdmin):
+    list_display = (
+        "__str__",
+        "payment_status",
+        "risk_status",
+        "location",
+        "created_at",
+    )
+    list_filter = (
+        "payment_status",
+        "risk_status",
+        "currency",
+    )
+    list_select_related = ("staff_profile", "location")
+    search_fields = ("payment_intent_id", "customer_email")
+    ordering = ("-created_at",)
+    raw_id_fields = ("staff_profile", "qr_code", "location")
+    readonly_fields = ("created_at", "succeeded_at", "user_agent")
+    exclude = ("agent", "legacy_user_agent")
+
+    actions = ("capture_held_payments", "cancel_held_payments")
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_display()
+
+    def _review_held(self, request, queryset, stripe_call, risk_status):
+        # The tip itself changes when Stripe's webhook for the intent arrives
+        done = 0
+        for tip in queryset.filter(risk_status='HELD', payment_status='PENDING'):
+            try:
+                stripe_call(tip.payment_intent_id)
+            except StripeError as e:
+                self.message_user(request, f"{tip.payment_intent_id}: {e}", messages.ERROR)
+                continue
+            if risk_status is not None:
+                type(tip).objects.using(tip._state.db).filter(pk=tip.pk).update(risk_status=risk_status)
+            done += 1
+        return done
+
+    @admin.action(description="Capture selected held payments")
+    def capture_held_payments(self, request, queryset):
+        done = self._review_held(request, queryset, capture_payment_intent, 'RELEASED')
+        self.message_user(request, f"Captured {done} held payments.")
+
+    @admin.action(description="Cancel selected held payments")
+    def cancel_held_payments(self, request, queryset):
+        # Cancelled intents fail their tips through the webhook; they stay HELD
+        done = self._review_held(request, queryset, cancel_payment_intent, None)
+        self.message_user(request, f"Cancelled {done} held payments.")
@@ -0,0 +1,68 @@
+from django.utils.functional import cached_property
+from rest_framework import generics
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.permissions import IsAuthenticated
+
+from analytics.cache import get_summary_version
+from analytics.queries import get_tip_count
+from core.api import ConditionalCacheMixin, get_uuid_param
+from core.pagination import KeysetPagination
+from core.sharding import shard_for_business, use_shard
+
+from .models import Tip
+from .serializers import TipSerializer
+
+
+class TipListView(ConditionalCacheMixin, generics.ListAPIView):
+    """
+    Lists succeeded and refunded tips, newest first.
+
+    Owners pass ``business`` (and optionally ``staff_profile`` or
+    ``location``) to list a business's tips; staff get their own tips.
+    """
+
+    serializer_class = TipSerializer
+    pagination_class = KeysetPagination
+    permission_classes = [IsAuthenticated]
+
+    @cached_property
+    def scope(self):
+        """
+        Returns (business_id, Tip filters) for the current request.
+        """
+        user = self.request.user
+        business_id = get_uuid_param(self.request, 'business')
+        if business_id is not None:
+            if user.role != 'OWNER' or not user.has_business_access(business_id):
+                raise PermissionDenied
+            filters = {'staff_profile__business_id': business_id}
+            for name in ('staff_profile', 'location'):
+                value = get_uuid_param(self.request, name)
+                if value is not None:
+                    filters[f'{name}_id'] = value
+            return business_id, filters
+
+        membership = user.get_staff_membership()
+        if membership is None:
+            raise PermissionDenied("Only staff members have their own tips.")
+        staff_profile_id, business_id = membership
+        return business_id, {'staff_profile_id': staff_profile_id}
+
+    def get_data_version(self):
+        return get_summary_version(self.scope[0])
+
+    def get_queryset(self):
+        # Staff requests carry no business id for ShardMiddleware to route by
+        return Tip.objects.using(shard_for_business(self.scope[0])).with_display().filter(
+            payment_status__in=['SUCCEEDED', 'REFUNDED'],
+            **self.scope[1],
+        )
+
+    def get_approximate_count(self, queryset):
+        business_id, filters = self.scope
+        with use_shard(shard_for_business(business_id)):
+            return get_tip_count(
+                business_id,
+                staff_profile_id=filters.get('staff_profile_id'),
+                location_id=filters.get('location_id'),
+            )
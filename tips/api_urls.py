@@ -0,0 +1,6 @@
+from django.urls import path
+from .api import TipListView
+
+urlpatterns = [
+    path("tips/", TipListView.as_view(), name="api_tip_list"),
+]
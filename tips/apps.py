@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class TipsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "tips"
+
+    def ready(self):
+        from . import live  # noqa: F401
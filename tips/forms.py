@@ -0,0 +1,54 @@
+from decimal import Decimal
+
+from django import forms
+from django.conf import settings
+from django.core import signing
+from django.core.validators import RegexValidator
+
+FORM_TOKEN_SALT = 'tips.TipForm'
+
+
+def make_form_token(qr_token):
+    """
+    Returns a signed, timestamped token tying a tip form to its QR code.
+    """
+    return signing.TimestampSigner(salt=FORM_TOKEN_SALT).sign(qr_token)
+
+
+class TipForm(forms.Form):
+    amount = forms.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        min_value=Decimal('1.00'),
+        max_value=Decimal('500.00'),
+    )
+    customer_name = forms.CharField(max_length=200, required=False)
+    customer_email = forms.EmailField(required=False, help_text="We'll email you a receipt")
+    tip_message = forms.CharField(widget=forms.Textarea, max_length=500, required=False)
+    # Generated by the page once per load so a resubmitted payment reuses
+    # the same PaymentIntent; the page itself is cached and shared
+    idempotency_key = forms.CharField(
+        widget=forms.HiddenInput,
+        max_length=64,
+        validators=[RegexValidator(r'^[A-Za-z0-9_-]+$')],
+    )
+    # Stands in for the CSRF token, which would need a cookie
+    form_token = forms.CharField(widget=forms.HiddenInput)
+
+    def __init__(self, *args, qr_token=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.qr_token = qr_token
+
+    def clean_form_token(self):
+        value = self.cleaned_data['form_token']
+        try:
+            qr_token = signing.TimestampSigner(salt=FORM_TOKEN_SALT).unsign(
+                value, max_age=settings.TIP_FORM_TOKEN_MAX_AGE,
+            )
+        except signing.SignatureExpired:
+            raise forms.ValidationError("This page has expired, please scan the QR code again.")
+        except signing.BadSignature:
+            raise forms.ValidationError("Invalid form.")
+        if qr_token != self.qr_token:
+            raise forms.ValidationError("Invalid form.")
+        return value
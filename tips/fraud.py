@@ -0,0 +1,254 @@
+"""
+Online detection of card testing and scan spikes.
+
+Card testing shows up as bursts of small tips from one address, usually
+spread over many QR codes; scripted scanning shows up as a staff
+member's scan rate jumping far above its usual level. The detector
+watches the scan and tip streams for both with fixed-size sketches kept
+in process memory, so recording an event and judging a tip are a few
+dictionary and list operations under a lock, with no queries:
+
+* small tips per address: a count-min sketch over a sliding window (the
+  current window plus a weighted share of the previous one, as in the
+  cache rate limiter), so memory does not grow with the number of
+  addresses;
+* distinct QR codes tipped per address: a small HyperLogLog per address
+  for the current and previous window;
+* scans per staff member: short- and long-term exponentially weighted
+  moving average rates, compared on each event.
+
+The last two keep at most FRAUD_MAX_TRACKED_KEYS entries each.
+
+A tip hitting both address signals is held (see Tip.risk_status);
+hitting one of them, or coming during a scan spike, flags it. Each
+process sees only its own traffic, like the local rate limiter, so
+thresholds are per process.
+"""
+import hashlib
+import logging
+import math
+import threading
+import time
+from collections import namedtuple
+from decimal import Decimal
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+Verdict = namedtuple('Verdict', ['action', 'reasons'])
+
+CLEAR = Verdict('CLEAR', ())
+
+# HyperLogLog precision: 2**6 one-byte registers per address, ~13% error
+HLL_PRECISION = 6
+
+# 2 ** -rank for every possible register value
+_INVERSE_POWERS = [2.0 ** -rank for rank in range(65)]
+
+SCAN_SHORT_SECONDS = 60
+SCAN_LONG_SECONDS = 60 * 60
+
+
+class CountMinSketch:
+    """
+    Approximate per-key counts in ``depth`` rows of ``width`` counters.
+
+    Estimates never undercount; they overcount by at most a small share
+    of the total added, with high probability.
+    """
+
+    def __init__(self, width, depth):
+        self.width = width
+        self.depth = depth
+        self.rows = [[0] * width for _ in range(depth)]
+
+    def _columns(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+        h1 = int.from_bytes(digest[:4], 'little')
+        h2 = int.from_bytes(digest[4:], 'little') | 1
+        # Double hashing gives the independent-enough row hashes
+        return [(h1 + i * h2) % self.width for i in range(self.depth)]
+
+    def add(self, key, count=1):
+        for row, column in zip(self.rows, self._columns(key)):
+            row[column] += count
+
+    def estimate(self, key):
+        return min(row[column] for row, column in zip(self.rows, self._columns(key)))
+
+    def clear(self):
+        for row in self.rows:
+            row[:] = [0] * self.width
+
+
+class HyperLogLog:
+    """
+    Approximate count of distinct items in 2**precision registers.
+    """
+
+    def __init__(self, precision=HLL_PRECISION):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, item):
+        value = int.from_bytes(hashlib.blake2b(item.encode(), digest_size=8).digest(), 'little')
+        index = value & ((1 << self.precision) - 1)
+        rest = value >> self.precision
+        bits = 64 - self.precision
+        rank = bits - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def estimate(self, *others):
+        """
+        Estimates the distinct items added here and to ``others``.
+        """
+        registers = self.registers
+        for other in others:
+            registers = bytes(map(max, registers, other.registers))
+        m = len(registers)
+        alpha = 0.7213 / (1 + 1.079 / m) if m >= 128 else {16: 0.673, 32: 0.697, 64: 0.709}[m]
+        raw = alpha * m * m / sum(map(_INVERSE_POWERS.__getitem__, registers))
+        zeros = registers.count(0)
+        if raw <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            return m * math.log(m / zeros)
+        return raw
+
+
+def _decay(rate, elapsed, seconds):
+    return rate * math.exp(-elapsed / seconds)
+
+
+class FraudDetector:
+    """
+    Sketches of recent scans and tips in this process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._window = None
+            self._small_tips = CountMinSketch(settings.FRAUD_SKETCH_WIDTH, settings.FRAUD_SKETCH_DEPTH)
+            self._previous_small_tips = CountMinSketch(settings.FRAUD_SKETCH_WIDTH, settings.FRAUD_SKETCH_DEPTH)
+            # address -> (window, HyperLogLog of this window, of the previous one)
+            self._qr_codes = {}
+            # staff profile id -> (short rate, long rate, last event time)
+            self._scan_rates = {}
+
+    def _rotate(self, now):
+        # Moves to the current window; returns how far into it we are (0-1)
+        period = settings.FRAUD_WINDOW_SECONDS
+        window = int(now // period)
+        if window != self._window:
+            if self._window is not None and window == self._window + 1:
+                self._small_tips, self._previous_small_tips = self._previous_small_tips, self._small_tips
+                self._small_tips.clear()
+            else:
+                self._small_tips.clear()
+                self._previous_small_tips.clear()
+            self._window = window
+        return (now % period) / period
+
+    def _qr_sketches(self, ip_address):
+        entry = self._qr_codes.get(ip_address)
+        if entry is not None and entry[0] == self._window:
+            return entry
+        if entry is not None and entry[0] == self._window - 1:
+            entry = (self._window, HyperLogLog(), entry[1])
+        else:
+            entry = (self._window, HyperLogLog(), HyperLogLog())
+            if len(self._qr_codes) >= settings.FRAUD_MAX_TRACKED_KEYS:
+                self._sweep()
+        self._qr_codes[ip_address] = entry
+        return entry
+
+    def _sweep(self):
+        # Addresses not seen in this or the last window have empty sketches
+        self._qr_codes = {
+            ip_address: entry for ip_address, entry in self._qr_codes.items()
+            if entry[0] >= self._window - 1
+        }
+        # Still full: drop the older half, in insertion order
+        if len(self._qr_codes) >= settings.FRAUD_MAX_TRACKED_KEYS:
+            keep = list(self._qr_codes.items())[len(self._qr_codes) // 2:]
+            self._qr_codes = dict(keep)
+
+    def _scan_spike(self, staff_profile_id, now, scanned=False):
+        short, long, last = self._scan_rates.get(staff_profile_id, (0.0, 0.0, now))
+        elapsed = max(now - last, 0)
+        short = _decay(short, elapsed, SCAN_SHORT_SECONDS)
+        long = _decay(long, elapsed, SCAN_LONG_SECONDS)
+        if scanned:
+            short += 1 / SCAN_SHORT_SECONDS
+            long += 1 / SCAN_LONG_SECONDS
+            if len(self._scan_rates) >= settings.FRAUD_MAX_TRACKED_KEYS and staff_profile_id not in self._scan_rates:
+                self._scan_rates.clear()
+            self._scan_rates[staff_profile_id] = (short, long, now)
+        per_minute = short * 60
+        return (
+            per_minute >= settings.FRAUD_SCAN_SPIKE_MIN_PER_MINUTE
+            and short >= settings.FRAUD_SCAN_SPIKE_FACTOR * long
+        )
+
+    def record_scan(self, staff_profile_id, now=None):
+        """
+        Records a QR scan for a staff member.
+
+        Returns:
+            bool: True if the staff member's scan rate is spiking
+        """
+        now = now if now is not None else time.time()
+        with self._lock:
+            spiking = self._scan_spike(str(staff_profile_id), now, scanned=True)
+        if spiking:
+            logger.warning("Scan spike for staff profile %s", staff_profile_id)
+        return spiking
+
+    def assess_tip(self, ip_address, qr_token, staff_profile_id, amount, now=None):
+        """
+        Records a tip attempt and judges it against recent activity.
+
+        Args:
+            ip_address (str): Client address
+            qr_token (str): QR code tipped through
+            staff_profile_id: Staff member tipped
+            amount (Decimal): Tip amount
+            now (float, optional): Event time, for testing
+
+        Returns:
+            Verdict: ('CLEAR' | 'FLAGGED' | 'HELD', reasons)
+        """
+        now = now if now is not None else time.time()
+        reasons = []
+        with self._lock:
+            elapsed = self._rotate(now)
+            if amount <= Decimal(settings.FRAUD_SMALL_TIP_AMOUNT):
+                self._small_tips.add(ip_address)
+            small_tips = (
+                self._previous_small_tips.estimate(ip_address) * (1 - elapsed)
+                + self._small_tips.estimate(ip_address)
+            )
+            _, qr_codes, previous_qr_codes = self._qr_sketches(ip_address)
+            qr_codes.add(qr_token)
+            distinct_qr_codes = qr_codes.estimate(previous_qr_codes)
+            scan_spike = self._scan_spike(str(staff_profile_id), now)
+
+        if small_tips > settings.FRAUD_SMALL_TIPS_PER_ADDRESS:
+            reasons.append('small-tip-burst')
+        if distinct_qr_codes > settings.FRAUD_QR_CODES_PER_ADDRESS:
+            reasons.append('many-qr-codes')
+        if scan_spike:
+            reasons.append('scan-spike')
+        if not reasons:
+            return CLEAR
+        action = 'HELD' if {'small-tip-burst', 'many-qr-codes'} <= set(reasons) else 'FLAGGED'
+        logger.warning("Tip from %s via %s %s: %s", ip_address, qr_token, action.lower(), ', '.join(reasons))
+        return Verdict(action, tuple(reasons))
+
+
+detector = FraudDetector()
@@ -0,0 +1,177 @@
+"""
+In-process fan-out of succeeded tips to live feed viewers.
+
+The webhook processor publishes each succeeded tip once; the hub
+serializes it once per topic and hands the same string to every
+subscriber queue on that topic, so N screens cost one producer event.
+Topics are ('business', id) and ('location', id).
+
+Each subscriber has a bounded queue. A viewer that cannot keep up loses
+its oldest queued events rather than slowing the producer or growing
+memory; every event carries the running totals, so the next event it
+does receive brings its screen up to date.
+"""
+import asyncio
+import datetime
+import json
+import threading
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Sum
+from django.dispatch import receiver
+from django.utils import timezone
+
+from analytics.models import HourlyTipSummary
+
+from .signals import tip_succeeded
+
+
+def format_event(event, data):
+    """
+    Formats a server-sent event frame.
+    """
+    return f"event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n"
+
+
+class Subscription:
+    """
+    A single viewer's bounded queue of pending SSE frames.
+
+    Only touched from the event loop it was created on.
+    """
+
+    def __init__(self, topic, maxsize):
+        self.topic = topic
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+        self.dropped = 0
+
+    def push(self, frame):
+        if self.queue.full():
+            # Slow viewer: discard the oldest frame instead of blocking the producer
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(frame)
+
+
+class LiveTipHub:
+    """
+    Thread-safe pub/sub hub keeping today's running totals per topic.
+
+    Totals are only kept for topics with subscribers; they are seeded from
+    the hourly rollups after the first subscription and then updated from
+    published tips. Until seeded, events carry no totals.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+        self._totals = {}
+
+    def subscribe(self, topic, maxsize=None):
+        """
+        Registers a subscriber. Must be called from a running event loop.
+        """
+        subscription = Subscription(topic, maxsize or settings.LIVE_FEED_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers[topic].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.topic)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.topic]
+                    self._totals.pop(subscription.topic, None)
+
+    def get_totals(self, topic):
+        """
+        Returns today's totals for a topic, seeding them from the database if needed.
+
+        Returns:
+            dict: Currency code -> {'total_tips': Decimal, 'tip_count': int}
+        """
+        today = timezone.localdate()
+        with self._lock:
+            cached = self._totals.get(topic)
+            if cached is not None and cached[0] == today:
+                return dict(cached[1])
+
+        totals = _load_totals_today(topic, today)
+        with self._lock:
+            cached = self._totals.setdefault(topic, (today, totals))
+            return dict(cached[1])
+
+    def publish(self, topic, tip_data):
+        """
+        Sends a tip to every subscriber of a topic. Safe to call from any thread.
+        """
+        with self._lock:
+            subscribers = list(self._subscribers.get(topic, ()))
+            if not subscribers:
+                return
+            totals = None
+            cached = self._totals.get(topic)
+            if cached is not None:
+                today = timezone.localdate()
+                if cached[0] != today:
+                    cached = self._totals[topic] = (today, {})
+                totals = cached[1]
+                current = totals.get(tip_data['currency'], {'total_tips': Decimal('0'), 'tip_count': 0})
+                totals[tip_data['currency']] = {
+                    'total_tips': current['total_tips'] + tip_data['amount'],
+                    'tip_count': current['tip_count'] + 1,
+                }
+            frame = format_event('tip', {'tip': tip_data, 'totals': totals})
+
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.push, frame)
+            except RuntimeError:
+                # The viewer's event loop has closed without unsubscribing
+                self.unsubscribe(subscription)
+
+    def publish_tip(self, tip):
+        tip_data = {
+            'id': tip.pk,
+            'staff_profile_id': tip.staff_profile_id,
+            'staff_name': tip.staff_profile.display_name,
+            'location_id': tip.location_id,
+            'amount': tip.amount,
+            'currency': tip.currency,
+            'succeeded_at': tip.succeeded_at,
+        }
+        self.publish(('business', tip.staff_profile.business_id), tip_data)
+        if tip.location_id is not None:
+            self.publish(('location', tip.location_id), tip_data)
+
+
+def _load_totals_today(topic, today):
+    kind, object_id = topic
+    start = timezone.make_aware(datetime.datetime.combine(today, datetime.time.min))
+    rows = (
+        HourlyTipSummary.objects
+        .filter(**{f'{kind}_id': object_id, 'hour__gte': start})
+        .values('currency')
+        .annotate(total_tips=Sum('total_tips'), tip_count=Sum('tip_count'))
+        .order_by()
+    )
+    return {
+        row['currency']: {'total_tips': row['total_tips'], 'tip_count': row['tip_count']}
+        for row in rows
+    }
+
+
+hub = LiveTipHub()
+
+
+@receiver(tip_succeeded)
+def publish_succeeded_tip(sender, tip, **kwargs):
+    # Only show tips whose status change actually committed
+    transaction.on_commit(lambda: hub.publish_tip(tip), using=tip._state.db)
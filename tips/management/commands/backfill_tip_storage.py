@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand
+
+from core import sharding
+from tips.models import METADATA_KEY_ALIASES, Tip, UserAgent
+
+
+class Command(BaseCommand):
+    help = "Moves legacy tip user agents to the interned table and compacts tip metadata."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help="Tips updated per transaction (default: %(default)s)",
+        )
+
+    def handle(self, *args, **options):
+        for alias in sharding.get_shards():
+            with sharding.use_shard(alias):
+                self.backfill_shard(options['batch_size'])
+
+    def backfill_shard(self, batch_size):
+        agents = self.backfill(
+            Tip.objects.exclude(legacy_user_agent=''),
+            ['pk', 'legacy_user_agent'],
+            self.intern_user_agent,
+            ['agent', 'legacy_user_agent'],
+            batch_size,
+        )
+        self.stdout.write(f"Interned user agents for {agents} tips.")
+        compacted = self.backfill(
+            Tip.objects.filter(metadata__has_any_keys=list(METADATA_KEY_ALIASES)),
+            ['pk', 'metadata'],
+            self.compact_metadata,
+            ['metadata'],
+            batch_size,
+        )
+        self.stdout.write(f"Compacted metadata for {compacted} tips.")
+
+    @staticmethod
+    def intern_user_agent(tip):
+        tip.agent_id = UserAgent.objects.intern(tip.legacy_user_agent)
+        tip.legacy_user_agent = ''
+
+    @staticmethod
+    def compact_metadata(tip):
+        # Loading expanded the keys; bulk_update writes them back under their aliases
+        pass
+
+    @staticmethod
+    def backfill(queryset, fields, update, update_fields, batch_size):
+        # Walks the matching tips in primary key order, rewriting one batch per transaction
+        queryset = queryset.only(*fields).order_by('pk')
+        last_pk = None
+        total = 0
+        while True:
+            batch_queryset = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+            tips = list(batch_queryset[:batch_size])
+            if not tips:
+                return total
+            with sharding.atomic():
+                for tip in tips:
+                    update(tip)
+                Tip.objects.bulk_update(tips, update_fields)
+            last_pk = tips[-1].pk
+            total += len(tips)
@@ -0,0 +1,33 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.sharding import for_each_shard
+from tips.receipts import queue_tip_receipts
+
+
+class Command(BaseCommand):
+    help = "Queues one coalesced receipt email per customer for their succeeded tips."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help="Keep checking for due receipts instead of exiting",
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=settings.EMAIL_OUTBOX_POLL_SECONDS,
+            help="Seconds between checks with --loop (default: %(default)s)",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            queued = sum(for_each_shard(queue_tip_receipts)())
+            if queued or not options['loop']:
+                self.stdout.write(f"Queued {queued} receipt emails.")
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,114 @@
+# Generated by Django 5.2.9 on 2026-10-19 17:26
+
+import django.core.validators
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ("businesses", "0001_initial"),
+        ("staff", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Tip",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                (
+                    "customer_name",
+                    models.CharField(blank=True, max_length=200, null=True),
+                ),
+                (
+                    "customer_email",
+                    models.EmailField(blank=True, max_length=254, null=True),
+                ),
+                (
+                    "amount",
+                    models.DecimalField(
+                        decimal_places=2,
+                        max_digits=10,
+                        validators=[django.core.validators.MinValueValidator(0.01)],
+                    ),
+                ),
+                ("currency", models.CharField(default="GBP", max_length=3)),
+                ("payment_intent_id", models.CharField(max_length=255, unique=True)),
+                (
+                    "payment_status",
+                    models.CharField(
+                        choices=[
+                            ("PENDING", "Pending"),
+                            ("SUCCEEDED", "Succeeded"),
+                            ("FAILED", "Failed"),
+                            ("REFUNDED", "Refunded"),
+                        ],
+                        db_index=True,
+                        default="PENDING",
+                        max_length=20,
+                    ),
+                ),
+                ("idempotency_key", models.CharField(max_length=255, unique=True)),
+                ("tip_message", models.TextField(blank=True, null=True)),
+                ("ip_address", models.GenericIPAddressField()),
+                ("user_agent", models.TextField()),
+                ("created_at", models.DateTimeField(auto_now_add=True, db_index=True)),
+                ("succeeded_at", models.DateTimeField(blank=True, null=True)),
+                ("metadata", models.JSONField(default=dict)),
+                (
+                    "location",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="tips",
+                        to="businesses.location",
+                    ),
+                ),
+                (
+                    "qr_code",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="tips",
+                        to="staff.staffqrcode",
+                    ),
+                ),
+                (
+                    "staff_profile",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="tips",
+                        to="staff.staffprofile",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Tip",
+                "verbose_name_plural": "Tips",
+                "indexes": [
+                    models.Index(
+                        fields=["staff_profile", "created_at"],
+                        name="tips_tip_staff_p_aa1328_idx",
+                    ),
+                    models.Index(
+                        fields=["payment_intent_id"], name="tips_tip_payment_f38b1a_idx"
+                    ),
+                    models.Index(
+                        fields=["idempotency_key"], name="tips_tip_idempot_18a7cb_idx"
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.9 on 2026-10-19 17:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("businesses", "0001_initial"),
+        ("staff", "0001_initial"),
+        ("tips", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="tip",
+            name="receipt_queued_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="tip",
+            index=models.Index(
+                condition=models.Q(
+                    ("customer_email__isnull", False),
+                    ("payment_status", "SUCCEEDED"),
+                    ("receipt_queued_at__isnull", True),
+                ),
+                fields=["succeeded_at"],
+                name="tip_pending_receipt_idx",
+            ),
+        ),
+    ]
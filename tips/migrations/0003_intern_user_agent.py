@@ -0,0 +1,70 @@
+# Generated by Django 5.2.9 on 2026-10-19 17:48
+
+import core.fields
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tips", "0002_tip_receipt_queued_at"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UserAgent",
+            fields=[
+                ("id", models.AutoField(primary_key=True, serialize=False)),
+                ("value_hash", models.CharField(max_length=64, unique=True)),
+                ("value", models.TextField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "verbose_name": "User Agent",
+                "verbose_name_plural": "User Agents",
+            },
+        ),
+        # Keeps the existing column; backfill_tip_storage empties it row by row
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RenameField(
+                    model_name="tip",
+                    old_name="user_agent",
+                    new_name="legacy_user_agent",
+                ),
+                migrations.AlterField(
+                    model_name="tip",
+                    name="legacy_user_agent",
+                    field=models.TextField(
+                        blank=True, db_column="user_agent", default=""
+                    ),
+                ),
+            ],
+        ),
+        migrations.AlterField(
+            model_name="tip",
+            name="metadata",
+            field=core.fields.CompactJSONField(
+                aliases={
+                    "accept_language": "l",
+                    "qr_type": "q",
+                    "referrer": "r",
+                    "shift_id": "s",
+                },
+                default=dict,
+                encoder=core.fields.CompactJSONEncoder,
+            ),
+        ),
+        migrations.AddField(
+            model_name="tip",
+            name="agent",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="+",
+                to="tips.useragent",
+            ),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tips", "0003_intern_user_agent"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="tip",
+            name="agent",
+            field=models.ForeignKey(
+                blank=True,
+                db_constraint=False,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="+",
+                to="tips.useragent",
+            ),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:15
+
+import core.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("businesses", "0004_cross_shard_user_fks"),
+        ("staff", "0002_cross_shard_user_fks"),
+        ("tips", "0004_cross_shard_agent_fk"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="tip",
+            name="risk_status",
+            field=models.CharField(
+                choices=[
+                    ("CLEAR", "Clear"),
+                    ("FLAGGED", "Flagged"),
+                    ("HELD", "Held for review"),
+                    ("RELEASED", "Released after review"),
+                ],
+                default="CLEAR",
+                max_length=20,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="tip",
+            name="metadata",
+            field=core.fields.CompactJSONField(
+                aliases={
+                    "accept_language": "l",
+                    "qr_type": "q",
+                    "referrer": "r",
+                    "risk_reasons": "k",
+                    "shift_id": "s",
+                },
+                default=dict,
+                encoder=core.fields.CompactJSONEncoder,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="tip",
+            index=models.Index(
+                condition=models.Q(("risk_status", "CLEAR"), _negated=True),
+                fields=["created_at"],
+                name="tip_risk_review_idx",
+            ),
+        ),
+    ]
@@ -1,9 +1,113 @@
 from django.db import models
 
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
 from django.core.validators import MinValueValidator
+from django.utils import timezone
+from collections import OrderedDict
+import hashlib
+import threading
 import uuid
 
+from core.fields import CompactJSONField
+from core.querysets import DisplayQuerySet, ShardedQuerySet
+from core.sharding import use_shard
+
+from .signals import tip_succeeded
+
+
+class UserAgentManager(models.Manager):
+    """
+    Interns user agent strings, caching both directions in process memory.
+
+    A handful of user agents cover almost every tip, so after warm-up
+    interning and reading them back run no queries.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        self._ids = OrderedDict()
+        self._values = OrderedDict()
+
+    def _remember(self, pk, value_hash, value):
+        with self._lock:
+            self._ids[value_hash] = pk
+            self._values[pk] = value
+            self._ids.move_to_end(value_hash)
+            self._values.move_to_end(pk)
+            while len(self._ids) > settings.USER_AGENT_CACHE_SIZE:
+                self._ids.popitem(last=False)
+            while len(self._values) > settings.USER_AGENT_CACHE_SIZE:
+                self._values.popitem(last=False)
+
+    def intern(self, value):
+        """
+        Returns the id of the UserAgent row for a string, creating it if needed.
+        """
+        value_hash = hashlib.sha256(value.encode()).hexdigest()
+        with self._lock:
+            pk = self._ids.get(value_hash)
+            if pk is not None:
+                self._ids.move_to_end(value_hash)
+                return pk
+        agent, created = self.get_or_create(value_hash=value_hash, defaults={'value': value})
+        if created:
+            # A row created in a transaction that rolls back must not be cached
+            transaction.on_commit(lambda: self._remember(agent.pk, value_hash, value))
+        else:
+            self._remember(agent.pk, value_hash, value)
+        return agent.pk
+
+    def get_value(self, pk):
+        """
+        Returns the user agent string for an id.
+        """
+        with self._lock:
+            value = self._values.get(pk)
+            if value is not None:
+                self._values.move_to_end(pk)
+                return value
+        value_hash, value = self.filter(pk=pk).values_list('value_hash', 'value').get()
+        self._remember(pk, value_hash, value)
+        return value
+
+
+class UserAgent(models.Model):
+    """
+    Distinct user agent strings, referenced by tips
+    """
+    id = models.AutoField(primary_key=True)
+    value_hash = models.CharField(max_length=64, unique=True)
+    value = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = UserAgentManager()
+
+    class Meta:
+        verbose_name = 'User Agent'
+        verbose_name_plural = 'User Agents'
+
+    def __str__(self):
+        return self.value
+
+
+class TipQuerySet(ShardedQuerySet, DisplayQuerySet):
+    display_related = {
+        'staff_profile': ('display_name',),
+        'location': ('name', 'city'),
+    }
+
+
+# Short names stored for common Tip.metadata keys
+METADATA_KEY_ALIASES = {
+    'qr_type': 'q',
+    'shift_id': 's',
+    'accept_language': 'l',
+    'referrer': 'r',
+    'risk_reasons': 'k',
+}
+
 
 class Tip(models.Model):
     """
@@ -19,7 +123,7 @@ class Tip(models.Model):
     
     # Fields
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    staff_profile = models.ForeignKey('StaffProfile', on_delete=models.PROTECT, related_name='tips')
+    staff_profile = models.ForeignKey('staff.StaffProfile', on_delete=models.PROTECT, related_name='tips')
     customer_name = models.CharField(max_length=200, null=True, blank=True)
     customer_email = models.EmailField(null=True, blank=True)
     amount = models.DecimalField(
@@ -28,7 +132,7 @@ class Tip(models.Model):
         validators=[MinValueValidator(0.01)]
     )
     currency = models.CharField(max_length=3, default='GBP')
-    qr_code = models.ForeignKey('StaffQRCode', on_delete=models.PROTECT, related_name='tips')
+    qr_code = models.ForeignKey('staff.StaffQRCode', on_delete=models.PROTECT, related_name='tips')
     payment_intent_id = models.CharField(max_length=255, unique=True)
     payment_status = models.CharField(
         max_length=20, 
@@ -37,13 +141,28 @@ class Tip(models.Model):
         db_index=True
     )
     idempotency_key = models.CharField(max_length=255, unique=True)
+    RISK_STATUS_CHOICES = [
+        ('CLEAR', 'Clear'),
+        ('FLAGGED', 'Flagged'),
+        ('HELD', 'Held for review'),
+        ('RELEASED', 'Released after review'),
+    ]
+    # Set by tips.fraud when the tip is created; held payments are only
+    # authorised until captured from the admin, reasons are in metadata
+    risk_status = models.CharField(max_length=20, choices=RISK_STATUS_CHOICES, default='CLEAR')
     tip_message = models.TextField(null=True, blank=True)
     ip_address = models.GenericIPAddressField()
-    user_agent = models.TextField()
-    location = models.ForeignKey('Location', on_delete=models.SET_NULL, null=True, blank=True, related_name='tips')
+    # Interned; read and write through the user_agent property
+    agent = models.ForeignKey('tips.UserAgent', on_delete=models.PROTECT, null=True, blank=True, related_name='+', db_constraint=False)
+    # Rows written before interning, until backfill_tip_storage moves them to agent
+    legacy_user_agent = models.TextField(blank=True, default='', db_column='user_agent')
+    location = models.ForeignKey('businesses.Location', on_delete=models.SET_NULL, null=True, blank=True, related_name='tips')
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     succeeded_at = models.DateTimeField(null=True, blank=True)
-    metadata = models.JSONField(default=dict)
+    receipt_queued_at = models.DateTimeField(null=True, blank=True)
+    metadata = CompactJSONField(default=dict, aliases=METADATA_KEY_ALIASES)
+    
+    objects = TipQuerySet.as_manager()
     
     class Meta:
         verbose_name = 'Tip'
@@ -52,18 +171,45 @@ class Tip(models.Model):
             models.Index(fields=['staff_profile', 'created_at']),
             models.Index(fields=['payment_intent_id']),
             models.Index(fields=['idempotency_key']),
+            # Only tips still owed a receipt are indexed, so the receipt worker's scan stays small
+            models.Index(
+                fields=['succeeded_at'],
+                condition=models.Q(
+                    payment_status='SUCCEEDED',
+                    customer_email__isnull=False,
+                    receipt_queued_at__isnull=True,
+                ),
+                name='tip_pending_receipt_idx',
+            ),
+            # The review queue: only flagged and held tips are indexed
+            models.Index(
+                fields=['created_at'],
+                condition=~models.Q(risk_status='CLEAR'),
+                name='tip_risk_review_idx',
+            ),
         ]
     
     def __str__(self):
         return f"Tip of {self.currency} {self.amount} to {self.staff_profile.display_name}"
     
+    @property
+    def user_agent(self):
+        if self.agent_id is not None:
+            return UserAgent.objects.get_value(self.agent_id)
+        return self.legacy_user_agent
+
+    @user_agent.setter
+    def user_agent(self, value):
+        self.agent_id = UserAgent.objects.intern(value) if value else None
+        self.legacy_user_agent = ''
+
     def save(self, *args, **kwargs):
         """
         Override save to enforce immutability rules.
         Only allows updates to payment_status field on existing records.
         """
-        if self.pk:  # If this is an update
-            original = Tip.objects.get(pk=self.pk)
+        if not self._state.adding:  # If this is an update
+            original = Tip.objects.using(self._state.db).get(pk=self.pk)
             # Check if immutable fields have been changed
             immutable_fields = ['amount', 'staff_profile_id', 'payment_intent_id']
             for field in immutable_fields:
@@ -82,7 +228,21 @@ class Tip(models.Model):
         Returns:
             bool: True if status updated successfully, False if invalid state transition
         """
-        pass
+        now = timezone.now()
+        # Summaries and other receivers write to the tip's shard, in its transaction
+        with use_shard(self._state.db), transaction.atomic(using=self._state.db):
+            # Conditional update so a duplicate webhook can never count a tip twice
+            updated = Tip.objects.using(self._state.db).filter(pk=self.pk, payment_status='PENDING').update(
+                payment_status='SUCCEEDED',
+                succeeded_at=now,
+            )
+            if not updated:
+                return False
+            self.payment_status = 'SUCCEEDED'
+            self.succeeded_at = now
+            # Rollups are updated in the same transaction as the status change
+            tip_succeeded.send(sender=Tip, tip=self)
+        return True
     
     def mark_as_failed(self):
         """
@@ -95,7 +255,13 @@ class Tip(models.Model):
         Returns:
             bool: True if status updated successfully, False if invalid state transition
         """
-        pass
+        updated = Tip.objects.using(self._state.db).filter(pk=self.pk, payment_status='PENDING').update(
+            payment_status='FAILED',
+        )
+        if not updated:
+            return False
+        self.payment_status = 'FAILED'
+        return True
     
     def can_be_refunded(self):
         """
@@ -111,9 +277,10 @@ class Tip(models.Model):
             tuple: (bool, str) - (can_refund, reason)
                    Returns (True, None) if refundable, (False, reason) if not
         """
-        pass
+        from payments.refunds import check_refund_eligibility
+        return check_refund_eligibility([self.pk])[self.pk]
     
-    def create_refund(self):
+    def create_refund(self, reason='REQUESTED_BY_CUSTOMER'):
         """
         Creates a refund record for this tip (if implemented).
         
@@ -124,6 +291,13 @@ class Tip(models.Model):
         - Updating payment_status to REFUNDED
         
         Returns:
-            Refund or None: The created refund instance, or None if refund fails
+            Refund or None: The created refund instance, which may still be
+                PENDING, or None if refund fails
         """
-        pass
\ No newline at end of file
+        from payments.refunds import refund_tips
+        refunds, _ = refund_tips([self.pk], reason)
+        if not refunds or refunds[0].status == 'FAILED':
+            return None
+        if refunds[0].status == 'SUCCEEDED':
+            self.payment_status = 'REFUNDED'
+        return refunds[0]
\ No newline at end of file
@@ -0,0 +1,110 @@
+"""
+Receipt emails for succeeded tips.
+
+Receipts are generated by a worker rather than by the webhook that marks
+a tip as succeeded, so payment processing does no email work at all. The
+worker waits until a customer's oldest unreceipted tip is
+TIP_RECEIPT_COALESCE_SECONDS old and then queues one email covering all
+of their unreceipted tips, so a group tipping several staff members gets
+a single receipt. Delivery goes through the outbox (core.outbox).
+"""
+import datetime
+import functools
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.template.loader import get_template
+from django.utils import timezone
+
+from core import sharding
+from core.models import OutboundEmail
+
+from .models import Tip
+
+
+@functools.lru_cache(maxsize=None)
+def get_receipt_template():
+    # Compiled once per process, whatever the template loader's caching
+    return get_template('emails/tip_receipt.txt')
+
+
+def pending_receipts():
+    """
+    Returns succeeded tips that have a customer email but no receipt yet.
+    """
+    return Tip.objects.filter(
+        payment_status='SUCCEEDED',
+        customer_email__isnull=False,
+        receipt_queued_at__isnull=True,
+    ).exclude(customer_email='')
+
+
+def render_receipt(tips):
+    """
+    Renders one receipt email body covering a customer's tips.
+    """
+    totals = defaultdict(int)
+    for tip in tips:
+        totals[tip.currency] += tip.amount
+    return get_receipt_template().render({
+        'customer_name': tips[0].customer_name,
+        'tips': tips,
+        'totals': sorted(totals.items()),
+    })
+
+
+def queue_tip_receipts(now=None, max_recipients=None):
+    """
+    Queues one coalesced receipt per customer whose coalescing window has closed.
+
+    Works on the current shard; callers queue each shard's receipts in turn.
+
+    Args:
+        now (datetime, optional): Current time, for testing
+        max_recipients (int, optional): Stop after this many customers
+
+    Returns:
+        int: Number of receipt emails queued
+    """
+    now = now or timezone.now()
+    cutoff = now - datetime.timedelta(seconds=settings.TIP_RECEIPT_COALESCE_SECONDS)
+    recipients = (
+        pending_receipts()
+        .filter(succeeded_at__lte=cutoff)
+        .order_by()
+        .values_list('customer_email', flat=True)
+        .distinct()
+    )
+    recipients = list(recipients[:max_recipients] if max_recipients else recipients)
+    if not recipients:
+        return 0
+
+    tips_by_recipient = defaultdict(list)
+    # Emails (default database) commit before the tips' shard, so a failure
+    # between the two can repeat a receipt but never lose one
+    with sharding.atomic(), transaction.atomic():
+        # Skipping locked rows keeps concurrent workers from sending a receipt twice
+        tips = (
+            pending_receipts()
+            .filter(customer_email__in=recipients)
+            .select_related('staff_profile__business')
+            .select_for_update(skip_locked=True, of=('self',))
+            .order_by('succeeded_at')
+        )
+        for tip in tips:
+            tips_by_recipient[tip.customer_email].append(tip)
+
+        OutboundEmail.objects.bulk_create([
+            OutboundEmail(
+                kind='RECEIPT',
+                to_email=recipient,
+                subject="Your TIP.ME receipt",
+                body=render_receipt(recipient_tips),
+            )
+            for recipient, recipient_tips in tips_by_recipient.items()
+        ])
+        Tip.objects.filter(
+            pk__in=[tip.pk for recipient_tips in tips_by_recipient.values() for tip in recipient_tips]
+        ).update(receipt_queued_at=now)
+    return len(tips_by_recipient)
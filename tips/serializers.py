@@ -0,0 +1,26 @@
+from rest_framework import serializers
+
+from core.api import DynamicFieldsMixin
+
+from .models import Tip
+
+
+class TipSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    staff_name = serializers.CharField(source='staff_profile.display_name', read_only=True)
+
+    class Meta:
+        model = Tip
+        fields = (
+            "id",
+            "staff_profile",
+            "staff_name",
+            "location",
+            "amount",
+            "currency",
+            "payment_status",
+            "customer_name",
+            "tip_message",
+            "created_at",
+            "succeeded_at",
+        )
+        read_only_fields = fields
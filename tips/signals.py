@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+# Sent once when a tip transitions from PENDING to SUCCEEDED.
+# Receivers get the updated ``tip`` instance.
+tip_succeeded = Signal()
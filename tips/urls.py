@@ -0,0 +1,9 @@
+from django.urls import path
+from .views import create_tip, live_tip_feed, scan_qr_code
+
+urlpatterns = [
+    path("t/<str:token>/", scan_qr_code, name="scan_qr_code"),
+    path("t/<str:token>/pay/", create_tip, name="create_tip"),
+    path("live/<uuid:business_id>/", live_tip_feed, name="live_tip_feed"),
+    path("live/<uuid:business_id>/<uuid:location_id>/", live_tip_feed, name="live_location_tip_feed"),
+]
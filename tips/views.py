@@ -1,3 +1,238 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+
+from businesses.models import Location
+from core.currencies import SUPPORTED_CURRENCIES, to_minor_units
+from core.ratelimit import Rule, client_ip, ratelimit
+from core.sharding import qr_token_shard
+from payments.client import StripeError, create_payment_intent
+from staff.models import StaffQRCode
+
+from .forms import TipForm, make_form_token
+from .fraud import CLEAR, detector
+from .live import format_event, hub
+from .models import Tip
+
+# QR token -> business id, learned from lookups so the per-business limit
+# can be checked before touching the database on later requests
+_qr_businesses = {}
+QR_BUSINESS_CACHE_SIZE = 10_000
+
+
+def _remember_business(token, business_id):
+    if len(_qr_businesses) >= QR_BUSINESS_CACHE_SIZE:
+        _qr_businesses.clear()
+    _qr_businesses[token] = business_id
+
+
+def qr_token(request, token, **kwargs):
+    return token
+
+
+def qr_business(request, token, **kwargs):
+    return _qr_businesses.get(token)
+
+
+SCAN_RULES = (
+    Rule('scan-ip', settings.RATELIMIT_SCAN_PER_IP, client_ip),
+    Rule('scan-token', settings.RATELIMIT_SCAN_PER_TOKEN, qr_token),
+    Rule('scan-business', settings.RATELIMIT_SCAN_PER_BUSINESS, qr_business),
+)
+
+TIP_RULES = (
+    Rule('tip-ip', settings.RATELIMIT_TIP_PER_IP, client_ip),
+    Rule('tip-token', settings.RATELIMIT_TIP_PER_TOKEN, qr_token),
+    Rule('tip-business', settings.RATELIMIT_TIP_PER_BUSINESS, qr_business),
+)
+
+
+async def _event_stream(subscription, totals):
+    try:
+        yield f"retry: {settings.LIVE_FEED_RETRY_MS}\n"
+        yield format_event('totals', {'totals': totals})
+        while True:
+            try:
+                frame = await asyncio.wait_for(
+                    subscription.queue.get(), settings.LIVE_FEED_HEARTBEAT_SECONDS,
+                )
+            except asyncio.TimeoutError:
+                # Comment frame keeps proxies and the browser from timing out
+                yield ": heartbeat\n\n"
+                continue
+            yield frame
+    finally:
+        hub.unsubscribe(subscription)
+
+
+async def live_tip_feed(request, business_id, location_id=None):
+    """
+    Streams succeeded tips and today's running totals as server-sent events.
+
+    Serves one business, or one of its locations when location_id is given.
+    Requires an authenticated user with access to the business.
+    """
+    user = await request.auser()
+    if not user.is_authenticated:
+        raise PermissionDenied
+    if not await sync_to_async(user.has_business_access)(business_id):
+        raise PermissionDenied
+
+    if location_id is None:
+        topic = ('business', business_id)
+    else:
+        if not await Location.objects.filter(pk=location_id, business_id=business_id).aexists():
+            raise Http404
+        topic = ('location', location_id)
+
+    # Subscribe before seeding totals so no tip falls between the two
+    subscription = hub.subscribe(topic)
+    try:
+        totals = await sync_to_async(hub.get_totals)(topic)
+    except BaseException:
+        hub.unsubscribe(subscription)
+        raise
+
+    response = StreamingHttpResponse(_event_stream(subscription, totals), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def _get_valid_qr_code(token):
+    """
+    Returns (qr_code, error) for a public token; raises Http404 if unknown.
+    """
+    qr_code = (
+        StaffQRCode.objects
+        .select_related('staff_profile__business', 'staff_profile__location')
+        .filter(token=token)
+        .first()
+    )
+    if qr_code is None:
+        raise Http404
+    _remember_business(token, qr_code.staff_profile.business_id)
+    is_valid, error = qr_code.validate()
+    if is_valid and not qr_code.staff_profile.is_active:
+        is_valid, error = False, "This staff member is no longer accepting tips."
+    return qr_code, None if is_valid else error
+
+
+@require_GET
+@ratelimit(*SCAN_RULES)
+@qr_token_shard
+def scan_qr_code(request, token):
+    """
+    Landing page for a scanned QR code, showing the tip form.
+
+    Served without a session or CSRF cookie; the rendered page is cached
+    per QR code for TIP_PAGE_CACHE_SECONDS.
+    """
+    qr_code, error = _get_valid_qr_code(token)
+    if error is None and not qr_code.increment_scan():
+        error = "This QR code has reached its scan limit."
+    if error is None and settings.FRAUD_DETECTION_ENABLED:
+        detector.record_scan(qr_code.staff_profile_id)
+    if error is not None:
+        return render(request, 'tips/qr_invalid.html', {'error': error}, status=410)
+    form = TipForm(initial={'form_token': make_form_token(token)})
+    return render(request, 'tips/tip_form.html', {
+        'qr_code': qr_code,
+        'staff_profile': qr_code.staff_profile,
+        'form': form,
+        'stripe_publishable_key': settings.STRIPE_PUBLISHABLE_KEY,
+        'cache_seconds': settings.TIP_PAGE_CACHE_SECONDS,
+    })
+
+
+@csrf_exempt
+@require_POST
+@ratelimit(*TIP_RULES)
+@qr_token_shard
+def create_tip(request, token):
+    """
+    Creates a PENDING tip and its PaymentIntent for the tip form.
+
+    Returns JSON with the intent's client secret for the browser to confirm
+    the payment; the tip succeeds or fails when Stripe's webhook arrives.
+    Submitting the same form twice returns the same tip and intent.
+
+    Exempt from CSRF checks: the form carries a signed token issued with
+    the page instead, and the request has no session to protect.
+    """
+    qr_code, error = _get_valid_qr_code(token)
+    if error is not None:
+        return JsonResponse({'error': error}, status=410)
+    form = TipForm(request.POST, qr_token=token)
+    if not form.is_valid():
+        if 'form_token' in form.errors:
+            return JsonResponse({'error': form.errors['form_token'][0]}, status=400)
+        return JsonResponse({'errors': form.errors}, status=400)
+
+    data = form.cleaned_data
+    staff_profile = qr_code.staff_profile
+    tip = Tip.objects.filter(idempotency_key=data['idempotency_key']).first()
+    if tip is not None:
+        # A resubmitted form keeps the first request's amount and verdict, so
+        # Stripe sees the same request again and returns the same intent
+        amount, currency, hold = tip.amount, tip.currency, tip.risk_status == 'HELD'
+    else:
+        amount = data['amount']
+        location = staff_profile.location
+        currency = (location and location.currency) or staff_profile.business.currency
+        if currency not in SUPPORTED_CURRENCIES:
+            # Amounts go to Stripe in hundredths, wrong for this currency
+            return JsonResponse({'error': "Tips cannot be taken in this currency."}, status=400)
+        verdict = CLEAR
+        if settings.FRAUD_DETECTION_ENABLED:
+            verdict = detector.assess_tip(client_ip(request), token, staff_profile.pk, amount)
+        hold = verdict.action == 'HELD'
+    try:
+        intent = create_payment_intent(
+            to_minor_units(amount),
+            currency,
+            idempotency_key=data['idempotency_key'],
+            metadata={
+                'staff_profile_id': staff_profile.pk,
+                'qr_code_id': qr_code.pk,
+                'business_id': staff_profile.business_id,
+            },
+            destination=staff_profile.business.stripe_account_id,
+            # Held tips are only authorised until reviewed
+            capture=not hold,
+        )
+    except StripeError:
+        return JsonResponse({'error': "Payment could not be started, please try again."}, status=502)
 
-# Create your views here.
+    if tip is None:
+        tip, _ = Tip.objects.get_or_create(
+            idempotency_key=data['idempotency_key'],
+            defaults={
+                'staff_profile': staff_profile,
+                'qr_code': qr_code,
+                'location_id': staff_profile.location_id,
+                'amount': amount,
+                'currency': currency,
+                'payment_intent_id': intent['id'],
+                'customer_name': data['customer_name'] or None,
+                'customer_email': data['customer_email'] or None,
+                'tip_message': data['tip_message'] or None,
+                'risk_status': verdict.action,
+                'ip_address': client_ip(request),
+                'user_agent': request.META.get('HTTP_USER_AGENT', ''),
+                'metadata': {
+                    'qr_type': qr_code.qr_type,
+                    'shift_id': qr_code.shift_id,
+                    'accept_language': request.META.get('HTTP_ACCEPT_LANGUAGE', '')[:64] or None,
+                    'referrer': request.META.get('HTTP_REFERER', '')[:200] or None,
+                    'risk_reasons': list(verdict.reasons) or None,
+                },
+            },
+        )
+    return JsonResponse({'tip_id': tip.pk, 'client_secret': intent['client_secret']})